@@ -33,18 +33,86 @@ class Settings(BaseSettings):
     # Storage settings (hand scan pipeline)
     jobs_dir: str = "./data/jobs"
 
+    # Job retention / garbage collection (hand scan pipeline)
+    jobs_drop_frames_on_complete: bool = True
+    jobs_ttl_seconds: int = 7 * 24 * 60 * 60
+    jobs_max_disk_mb: int = 0  # 0 disables the disk-usage high-water mark
+    jobs_disk_low_water_ratio: float = 0.9
+    jobs_gc_interval_seconds: float = 60.0
+    jobs_gc_batch_size: int = 64
+    jobs_upload_ttl_seconds: int = 24 * 60 * 60  # idle uploads never finalized are deleted
+
+    # Crash recovery (hand scan pipeline)
+    jobs_resume_on_startup: bool = True
+    jobs_max_attempts: int = 3
+    jobs_checkpoint_fsync: bool = False
+
+    # Multi-worker job claiming (hand scan pipeline)
+    jobs_lease_ttl_seconds: float = 30.0
+    jobs_lease_heartbeat_seconds: float = 10.0
+    jobs_worker_poll_seconds: float = 5.0
+
     # Model settings
     model_path: str = "./models"
-    max_image_size_mb: int = 10
+    max_image_size_mb: int = 10  # per uploaded frame
+    max_scan_upload_mb: int = 200  # all frames of one scan
+    max_scan_frames: int = 500  # per scan: upload session frames or frames decoded from a clip
+    upload_chunk_size_kb: int = 256
 
     # Persistence / sharing
     database_url: str = f"sqlite:///{(_DEFAULT_DATA_DIR / 'hand_modeler.db').as_posix()}"
+    database_async_url: str = ""  # "" derives it from database_url (aiosqlite / asyncpg)
+    database_profile: str = "default"  # "compat", "default" or "production" (app/db/profiles.py)
+    database_profile_overrides: dict[str, int | float | str | bool | None] = {}
+    database_read_url: str = ""  # optional replica for read-only endpoints
+    database_read_profile: str = ""  # "" uses database_profile
 
     # Object storage (local disk by default)
+    storage_backend: str = "local"  # "local" or "s3"
     storage_dir: str = str(_DEFAULT_STORAGE_DIR)
     storage_signing_secret: str = "insecure-development-secret"
+    storage_signing_keys: dict[str, str] = {}  # key id -> secret, for rotation
+    storage_signing_key_id: str = ""  # signs new URLs; "" uses storage_signing_secret
     signed_url_ttl_seconds: int = 15 * 60
+    signed_url_bucket_seconds: int = 5 * 60  # URLs are identical within a bucket
     max_model_size_mb: int = 50
+    storage_buffer_size_kb: int = 1024  # read/write chunk for staging and local writes
+    storage_fsync: str = "none"  # "none", "file" (object data) or "full" (data + directory)
+
+    # Sharing retention (sessions, hand models and their blobs); a TTL of 0 disables a rule
+    sharing_confirmed_model_ttl_seconds: int = 7 * 24 * 60 * 60  # since confirmed_at
+    sharing_stale_model_ttl_seconds: int = 30 * 24 * 60 * 60  # unconfirmed, since created_at
+    sharing_unpaired_session_ttl_seconds: int = 24 * 60 * 60
+    sharing_idle_session_ttl_seconds: int = 30 * 24 * 60 * 60  # no models, upload or confirm
+    sharing_blob_grace_seconds: int = 0  # keep unreferenced blobs this long
+    sharing_orphan_grace_seconds: int = 60 * 60  # never sweep objects younger than this
+    sharing_gc_interval_seconds: float = 300.0
+    sharing_gc_batch_size: int = 200
+
+    # Delivery marks (retrieved_at / confirmed_at), written behind in batches
+    delivery_marks_flush_interval_seconds: float = 1.0  # 0 writes each mark in its request
+    delivery_marks_max_pending: int = 500  # the request that fills the buffer flushes it
+
+    # Membership cache (user existence and session members, per process; app/db/membership.py)
+    membership_cache_ttl_seconds: float = 60.0  # 0 disables the cache
+    membership_cache_max_entries: int = 10_000  # per map (users, sessions)
+
+    # Session events pushed over WebSocket (app/events)
+    session_events_broker: str = "memory"  # "memory" (one process) or "sqlite" (many workers)
+    session_events_path: str = str(_DEFAULT_DATA_DIR / "session_events.db")  # sqlite broker
+    session_events_poll_seconds: float = 0.1  # sqlite broker: change feed read interval
+    session_events_retention_seconds: float = 300.0  # sqlite broker: feed rows kept this long
+    session_events_max_pending: int = 64  # per WebSocket; a slower client loses the oldest
+    session_poll_max_wait_seconds: float = 30.0  # upper bound of /sessions/{id}/poll?wait=
+
+    # S3-compatible object storage (STORAGE_BACKEND=s3)
+    s3_endpoint_url: str = ""
+    s3_bucket: str = ""
+    s3_region: str = "us-east-1"
+    s3_access_key_id: str = ""
+    s3_secret_access_key: str = ""
+    s3_part_size_mb: int = 8  # multipart threshold and part size; S3 requires >= 5
+    s3_max_connections: int = 16
 
     class Config:
         """Pydantic config."""
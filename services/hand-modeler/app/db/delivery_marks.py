@@ -0,0 +1,193 @@
+"""Write-behind for ``retrieved_at`` and ``confirmed_at``.
+
+Viewing and confirming a model used to commit a one-row UPDATE inside the request,
+so repeated views under load contended on SQLite's write lock. Marks are buffered
+in memory instead, and written in batches:
+
+- every ``delivery_marks_flush_interval_seconds``, by a background task;
+- at once, by the request that fills the buffer to ``delivery_marks_max_pending``;
+- on shutdown.
+
+A flush UPDATEs only rows whose column is still NULL, so marks are idempotent and
+the first mark of a model wins, however often it is flushed. Marks are written in
+the order they were recorded, in one transaction per batch, and only one batch is
+in flight at a time, so batches commit in order. A failed batch is put back ahead
+of newer marks.
+
+Until a mark is written, every response that shows a model's marks overlays the
+buffered ones (:meth:`DeliveryMarkBuffer.overlay`), so readers see a view or
+confirm at once and in the order it happened.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime
+from typing import Final, Literal, Protocol, TypeVar
+
+from sqlalchemy import Update, bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.models import HandModel
+
+logger = logging.getLogger(__name__)
+
+DeliveryField = Literal["retrieved_at", "confirmed_at"]
+
+FIELDS: Final[tuple[DeliveryField, ...]] = ("retrieved_at", "confirmed_at")
+
+
+class _Marked(Protocol):
+    id: str
+    retrieved_at: datetime | None
+    confirmed_at: datetime | None
+
+
+MarkedT = TypeVar("MarkedT", bound=_Marked)
+
+
+def _mark_statement(field: DeliveryField) -> Update:
+    # Core, so a list of parameters runs as one executemany.
+    table = HandModel.__table__
+    return (
+        update(table)
+        .where(table.c.id == bindparam("model_id"), table.c[field].is_(None))
+        .values({field: bindparam("at")})
+    )
+
+
+class DeliveryMarkBuffer:
+    def __init__(self, *, flush_interval_seconds: float, max_pending: int) -> None:
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending: OrderedDict[tuple[DeliveryField, str], datetime] = OrderedDict()
+        self._in_flight: OrderedDict[tuple[DeliveryField, str], datetime] | None = None
+        self.flushed = 0
+
+    @classmethod
+    def from_settings(cls) -> DeliveryMarkBuffer:
+        return cls(
+            flush_interval_seconds=settings.delivery_marks_flush_interval_seconds,
+            max_pending=settings.delivery_marks_max_pending,
+        )
+
+    def mark(self, field: DeliveryField, hand_model_id: str, at: datetime) -> datetime:
+        """Record ``field`` for a model; returns the timestamp that will be written.
+
+        That is ``at``, unless the model already has an unwritten mark.
+        """
+
+        key = (field, hand_model_id)
+        with self._lock:
+            existing = self._lookup(key)
+            if existing is not None:
+                return existing
+            self._pending[key] = at
+            return at
+
+    def pending(self, field: DeliveryField, hand_model_id: str) -> datetime | None:
+        """An unwritten mark, to show until the row has it."""
+
+        with self._lock:
+            return self._lookup((field, hand_model_id))
+
+    def overlay(self, model: MarkedT) -> MarkedT:
+        """Fill ``model``'s unset marks with unwritten ones; returns ``model``.
+
+        For responses (not ORM rows): the row itself is only updated by a flush.
+        """
+
+        with self._lock:
+            for field in FIELDS:
+                if getattr(model, field) is None:
+                    setattr(model, field, self._lookup((field, model.id)))
+        return model
+
+    def _lookup(self, key: tuple[DeliveryField, str]) -> datetime | None:
+        if self._in_flight is not None and key in self._in_flight:
+            return self._in_flight[key]
+        return self._pending.get(key)
+
+    def should_flush(self) -> bool:
+        """Whether the caller should flush now rather than leave it to the interval."""
+
+        with self._lock:
+            return bool(self._pending) and (
+                self.flush_interval_seconds <= 0 or len(self._pending) >= self.max_pending
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._in_flight or ())
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write the buffered marks in one transaction; returns how many were written.
+
+        Returns 0 without waiting if another flush is in flight; its successor
+        picks up whatever was recorded meanwhile.
+        """
+
+        with self._lock:
+            if self._in_flight is not None or not self._pending:
+                return 0
+            batch, self._pending = self._pending, OrderedDict()
+            self._in_flight = batch
+        try:
+            # Grouped per column, in recorded order; the transaction makes the batch atomic.
+            for field in FIELDS:
+                rows = [
+                    {"model_id": model_id, "at": at}
+                    for (marked, model_id), at in batch.items()
+                    if marked == field
+                ]
+                if rows:
+                    await db.execute(_mark_statement(field), rows)
+            await db.commit()
+        except BaseException:
+            with self._lock:
+                # Back in front of newer marks; for the same model the older one wins.
+                batch.update((key, at) for key, at in self._pending.items() if key not in batch)
+                self._pending, self._in_flight = batch, None
+            raise
+        with self._lock:
+            self._in_flight = None
+            self.flushed += len(batch)
+        return len(batch)
+
+
+delivery_marks = DeliveryMarkBuffer.from_settings()
+
+
+async def flush_delivery_marks(
+    session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]],
+    buffer: DeliveryMarkBuffer | None = None,
+) -> int:
+    if buffer is None:
+        buffer = delivery_marks
+    if not len(buffer):
+        return 0
+    async with session_factory() as db:
+        return await buffer.flush(db)
+
+
+async def run_delivery_mark_flush_loop(
+    session_factory: Callable[[], AbstractAsyncContextManager[AsyncSession]],
+    *,
+    interval_seconds: float,
+    buffer: DeliveryMarkBuffer | None = None,
+) -> None:
+    """Flush buffered delivery marks forever, every ``interval_seconds``."""
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await flush_delivery_marks(session_factory, buffer)
+        except Exception:  # pragma: no cover
+            logger.exception("Flushing delivery marks failed")
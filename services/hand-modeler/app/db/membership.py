@@ -0,0 +1,162 @@
+"""In-process cache of user existence and session membership.
+
+Sharing requests authorize against the same few rows over and over: a user exists,
+and belongs to a session. Both rarely change, so a hit skips the lookup.
+
+- Entries expire after ``membership_cache_ttl_seconds``, and each map keeps at most
+  ``membership_cache_max_entries`` (least recently used entries are evicted).
+- Only positive facts are cached. A request the cache cannot allow (unknown user,
+  not a member) is checked against the database, so a partner who joined through
+  another process is never turned away.
+- ``create_user``, ``join_session`` and session deletion invalidate their entries.
+  Other processes still serve a deleted session's members until the TTL expires,
+  so an upload also checks that its session still exists in the inserting
+  transaction.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from app.config import settings
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@dataclass(frozen=True, slots=True)
+class SessionMembers:
+    inviter_user_id: str
+    partner_user_id: str | None
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in (self.inviter_user_id, self.partner_user_id)
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded LRU map whose entries expire ``ttl_seconds`` after they were set."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: K, value: V) -> None:
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, keys: Iterable[K]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+class MembershipCache:
+    """User existence and session members, shared by the sharing routers."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.users: TTLCache[str, bool] = TTLCache(
+            ttl_seconds=ttl_seconds, max_entries=max_entries, clock=clock
+        )
+        self.sessions: TTLCache[str, SessionMembers] = TTLCache(
+            ttl_seconds=ttl_seconds, max_entries=max_entries, clock=clock
+        )
+
+    @classmethod
+    def from_settings(cls) -> MembershipCache:
+        return cls(
+            ttl_seconds=settings.membership_cache_ttl_seconds,
+            max_entries=settings.membership_cache_max_entries,
+        )
+
+    def user_exists(self, user_id: str) -> bool:
+        """``True`` if ``user_id`` is known to exist; ``False`` means "ask the database"."""
+
+        return self.users.get(user_id) is not None
+
+    def is_member(self, session_id: str, user_id: str) -> bool:
+        """``True`` if ``user_id`` is known to belong to the session."""
+
+        members = self.sessions.get(session_id)
+        return members is not None and user_id in members
+
+    def remember_user(self, user_id: str) -> None:
+        self.users.set(user_id, True)
+
+    def remember_session(
+        self, session_id: str, *, inviter_user_id: str, partner_user_id: str | None
+    ) -> None:
+        self.sessions.set(session_id, SessionMembers(inviter_user_id, partner_user_id))
+
+    def invalidate_user(self, user_id: str) -> None:
+        self.users.discard([user_id])
+
+    def invalidate_sessions(self, session_ids: Iterable[str]) -> None:
+        self.sessions.discard(session_ids)
+
+    def snapshot(self) -> dict[str, dict[str, object]]:
+        return {"users": self.users.snapshot(), "sessions": self.sessions.snapshot()}
+
+    def reset(self) -> None:
+        self.users.clear()
+        self.sessions.clear()
+
+
+membership_cache = MembershipCache.from_settings()
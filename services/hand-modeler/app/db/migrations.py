@@ -0,0 +1,121 @@
+"""In-place upgrades for databases created by earlier versions.
+
+``create_all`` only creates missing tables. :func:`migrate` adds the columns and
+indexes introduced since, drops the indexes they supersede, and backfills derived
+data; every step is idempotent, so it runs on each startup (from ``init_db``). To
+backfill a large database ahead of a deploy instead:
+
+    python -m app.db.migrations
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Final
+
+from sqlalchemy import exists, inspect, select, update
+from sqlalchemy.engine import Engine
+
+from app.db.base import Base
+from app.db.models import HandModel
+from app.db.models import Session as PairSession
+from app.db.queries import latest_hand_model_id
+
+logger = logging.getLogger(__name__)
+
+# Columns added to existing tables: (table, column). Their DDL comes from the models.
+ADDED_COLUMNS: Final[tuple[tuple[str, str], ...]] = (
+    ("sessions", "latest_hand_model_id"),
+    ("sessions", "last_activity_at"),
+)
+
+# Indexes replaced by wider ones: (table, index).
+DROPPED_INDEXES: Final[tuple[tuple[str, str], ...]] = (
+    ("hand_models", "ix_hand_models_session_id"),
+    ("hand_models", "ix_hand_models_session_id_created_at"),
+    ("hand_models", "ix_hand_models_owner_user_id"),
+)
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    inspector = inspect(engine)
+    for table_name, column_name in ADDED_COLUMNS:
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        if column_name in existing:
+            continue
+        column = Base.metadata.tables[table_name].c[column_name]
+        ddl = column.type.compile(dialect=engine.dialect)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}")
+        logger.info("Added column %s.%s", table_name, column_name)
+
+
+def _add_missing_indexes(engine: Engine) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _drop_superseded_indexes(engine: Engine) -> None:
+    inspector = inspect(engine)
+    for table_name, index_name in DROPPED_INDEXES:
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        if index_name not in existing:
+            continue
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP INDEX {index_name}")
+        logger.info("Dropped index %s", index_name)
+
+
+def backfill_latest_hand_models(engine: Engine, *, batch_size: int = 1000) -> int:
+    """Set ``latest_hand_model_id`` for sessions with models but no pointer.
+
+    Walks sessions in primary-key order, ``batch_size`` per transaction, so writers
+    are never blocked for long. Returns the number of sessions updated.
+    """
+
+    updated = 0
+    after = ""
+    while True:
+        with engine.begin() as connection:
+            session_ids = list(
+                connection.execute(
+                    select(PairSession.id)
+                    .where(
+                        PairSession.id > after,
+                        PairSession.latest_hand_model_id.is_(None),
+                        exists().where(HandModel.session_id == PairSession.id),
+                    )
+                    .order_by(PairSession.id)
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not session_ids:
+                return updated
+            connection.execute(
+                update(PairSession)
+                .where(
+                    PairSession.id.in_(session_ids),
+                    PairSession.latest_hand_model_id.is_(None),
+                )
+                .values(latest_hand_model_id=latest_hand_model_id(PairSession.id))
+            )
+        updated += len(session_ids)
+        after = session_ids[-1]
+
+
+def migrate(engine: Engine, *, batch_size: int = 1000) -> None:
+    _add_missing_columns(engine)
+    _add_missing_indexes(engine)
+    _drop_superseded_indexes(engine)
+    backfilled = backfill_latest_hand_models(engine, batch_size=batch_size)
+    if backfilled:
+        logger.info("Backfilled the latest hand model of %d sessions", backfilled)
+
+
+if __name__ == "__main__":
+    from app.db.session import engine as app_engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=app_engine)
+    migrate(app_engine)
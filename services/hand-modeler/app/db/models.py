@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -48,6 +48,16 @@ class Session(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
     paired_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
+    # Denormalized newest hand model, so polling is a primary-key read. Advanced in the
+    # upload's transaction and repointed when retention deletes it. No foreign key:
+    # hand_models already references sessions.
+    latest_hand_model_id: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
+    # Newest upload or confirm among the models retention has deleted, so an empty
+    # session is only idle once that activity is old too.
+    last_activity_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
     inviter: Mapped[User] = relationship(
         "User", foreign_keys=[inviter_user_id], back_populates="invited_sessions"
     )
@@ -64,10 +74,16 @@ class HandModel(Base):
     """A generated GLB hand model stored in object storage."""
 
     __tablename__ = "hand_models"
+    __table_args__ = (
+        # Newest-first history pages per session and per owner: the (created_at, id)
+        # keyset cursor is a range scan. Also serve lookups by session or owner alone.
+        Index("ix_hand_models_session_id_created_at_id", "session_id", "created_at", "id"),
+        Index("ix_hand_models_owner_user_id_created_at_id", "owner_user_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
-    session_id: Mapped[str] = mapped_column(ForeignKey("sessions.id"), index=True)
-    owner_user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), index=True)
+    session_id: Mapped[str] = mapped_column(ForeignKey("sessions.id"))
+    owner_user_id: Mapped[str] = mapped_column(ForeignKey("users.id"))
 
     storage_key: Mapped[str] = mapped_column(String(512), nullable=False)
     file_size_bytes: Mapped[int] = mapped_column(Integer, default=0)
@@ -81,3 +97,27 @@ class HandModel(Base):
 
     session: Mapped[Session] = relationship("Session", back_populates="hand_models")
     owner: Mapped[User] = relationship("User")
+
+
+class StorageBlob(Base):
+    """A content-addressed object shared by every hand model with the same bytes.
+
+    ``ref_count`` counts the hand models whose ``storage_key`` is ``key``. A blob
+    whose count dropped to zero is deleted in two steps (``deleting`` is set first),
+    so an upload of the same bytes never ends up pointing at a deleted object.
+    """
+
+    __tablename__ = "storage_blobs"
+
+    key: Mapped[str] = mapped_column(String(512), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    content_type: Mapped[str] = mapped_column(String(128), default="model/gltf-binary")
+
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)
+    deleting: Mapped[bool] = mapped_column(Boolean, default=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+    released_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
+    )
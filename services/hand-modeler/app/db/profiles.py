@@ -0,0 +1,184 @@
+"""Named engine profiles: connection pooling, SQLite pragmas and statement caching.
+
+``DATABASE_PROFILE`` picks one of :data:`ENGINE_PROFILES`, and
+``DATABASE_PROFILE_OVERRIDES`` adjusts individual fields of it. The same profile
+configures the sync and async engines. SQLite pragmas are applied to every new
+connection and are ignored for other databases.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass
+from typing import Final
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+SQLITE_JOURNAL_MODES: Final[frozenset[str]] = frozenset(
+    {"", "delete", "truncate", "persist", "memory", "wal", "off"}
+)
+SQLITE_SYNCHRONOUS: Final[frozenset[str]] = frozenset({"", "off", "normal", "full", "extra"})
+
+# Connect argument that sizes each driver's per-connection prepared statement cache.
+_STATEMENT_CACHE_ARGS: Final[dict[str, str]] = {
+    "pysqlite": "cached_statements",
+    "aiosqlite": "cached_statements",
+    "asyncpg": "prepared_statement_cache_size",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class EngineProfile:
+    """Engine settings; ``None`` or ``""`` leaves SQLAlchemy's or the driver's default."""
+
+    # Pooling (ignored for in-memory SQLite, which keeps a single connection).
+    pool_size: int | None = None
+    max_overflow: int | None = None
+    pool_timeout: float | None = None
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+
+    # SQLite pragmas.
+    sqlite_journal_mode: str = ""
+    sqlite_synchronous: str = ""
+    sqlite_busy_timeout_ms: int | None = None
+    sqlite_mmap_size_bytes: int | None = None
+    sqlite_cache_size_kb: int | None = None
+
+    # Statement caching: SQLAlchemy's compiled-SQL cache per engine, and the
+    # driver's prepared statement cache per connection.
+    query_cache_size: int = 500
+    statement_cache_size: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.sqlite_journal_mode.lower() not in SQLITE_JOURNAL_MODES:
+            raise ValueError(f"Unknown SQLite journal mode {self.sqlite_journal_mode!r}")
+        if self.sqlite_synchronous.lower() not in SQLITE_SYNCHRONOUS:
+            raise ValueError(f"Unknown SQLite synchronous mode {self.sqlite_synchronous!r}")
+
+    def with_overrides(self, overrides: dict[str, object]) -> EngineProfile:
+        """Return a copy with ``overrides`` applied.
+
+        Raises:
+            ValueError: for names that are not profile fields.
+        """
+
+        known = {f.name for f in dataclasses.fields(self)}
+        unknown = sorted(set(overrides) - known)
+        if unknown:
+            raise ValueError(f"Unknown engine profile fields: {', '.join(unknown)}")
+        return dataclasses.replace(self, **overrides)  # type: ignore[arg-type]
+
+
+ENGINE_PROFILES: Final[dict[str, EngineProfile]] = {
+    # SQLAlchemy and driver defaults, as before profiles existed.
+    "compat": EngineProfile(),
+    # Local development and tests: WAL so polling readers never wait for a writer,
+    # and a busy timeout instead of immediate "database is locked" errors.
+    "default": EngineProfile(
+        sqlite_journal_mode="wal",
+        sqlite_synchronous="normal",
+        sqlite_busy_timeout_ms=5000,
+    ),
+    # Many concurrent requests: a larger pool, connections checked before use and
+    # recycled before server-side timeouts, and memory-mapped SQLite reads.
+    "production": EngineProfile(
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=10.0,
+        pool_recycle=30 * 60,
+        pool_pre_ping=True,
+        sqlite_journal_mode="wal",
+        sqlite_synchronous="normal",
+        sqlite_busy_timeout_ms=15000,
+        sqlite_mmap_size_bytes=256 * 1024 * 1024,
+        sqlite_cache_size_kb=64 * 1024,
+        query_cache_size=1200,
+        statement_cache_size=256,
+    ),
+}
+
+
+def get_engine_profile(name: str, overrides: dict[str, object] | None = None) -> EngineProfile:
+    """Look up a named profile and apply ``overrides``.
+
+    Raises:
+        ValueError: for unknown profile names or override fields.
+    """
+
+    try:
+        profile = ENGINE_PROFILES[name]
+    except KeyError:
+        known = ", ".join(sorted(ENGINE_PROFILES))
+        raise ValueError(f"Unknown database profile {name!r} (expected one of {known})") from None
+    return profile.with_overrides(overrides) if overrides else profile
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, profile: EngineProfile) -> dict[str, object]:
+    """Keyword arguments for ``create_engine``/``create_async_engine``."""
+
+    parsed = make_url(url)
+    options: dict[str, object] = {
+        "pool_pre_ping": profile.pool_pre_ping,
+        "pool_recycle": profile.pool_recycle,
+        "query_cache_size": profile.query_cache_size,
+    }
+    if not _is_memory_sqlite(url):
+        for name in ("pool_size", "max_overflow", "pool_timeout"):
+            value = getattr(profile, name)
+            if value is not None:
+                options[name] = value
+
+    connect_args: dict[str, object] = {}
+    if parsed.get_backend_name() == "sqlite" and parsed.get_driver_name() == "pysqlite":
+        connect_args["check_same_thread"] = False
+    cache_arg = _STATEMENT_CACHE_ARGS.get(parsed.get_driver_name())
+    if cache_arg is not None and profile.statement_cache_size is not None:
+        connect_args[cache_arg] = profile.statement_cache_size
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def sqlite_pragmas(profile: EngineProfile) -> list[str]:
+    pragmas = []
+    if profile.sqlite_journal_mode:
+        pragmas.append(f"PRAGMA journal_mode={profile.sqlite_journal_mode.upper()}")
+    if profile.sqlite_synchronous:
+        pragmas.append(f"PRAGMA synchronous={profile.sqlite_synchronous.upper()}")
+    if profile.sqlite_busy_timeout_ms is not None:
+        pragmas.append(f"PRAGMA busy_timeout={int(profile.sqlite_busy_timeout_ms)}")
+    if profile.sqlite_mmap_size_bytes is not None:
+        pragmas.append(f"PRAGMA mmap_size={int(profile.sqlite_mmap_size_bytes)}")
+    if profile.sqlite_cache_size_kb is not None:
+        # Negative values are KiB rather than pages.
+        pragmas.append(f"PRAGMA cache_size=-{int(profile.sqlite_cache_size_kb)}")
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine: Engine, profile: EngineProfile) -> None:
+    """Run the profile's pragmas on each new connection of a SQLite ``engine``.
+
+    For an ``AsyncEngine``, pass its ``sync_engine``.
+    """
+
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(profile)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection: object, _record: object) -> None:
+        cursor = dbapi_connection.cursor()  # type: ignore[attr-defined]
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,270 @@
+"""Single-round-trip queries for the sharing routes.
+
+Each request used to look up the user, the session and the model one query at a
+time. These helpers fetch everything a route needs to authorize and answer in one
+statement; the routers turn missing rows into HTTP errors.
+
+History pages (:func:`session_hand_models`, :func:`user_hand_models`) are newest
+first, resumed after a ``(created_at, id)`` cursor instead of an ``OFFSET``, so a deep
+page costs the same range scan as the first.
+
+``sessions.latest_hand_model_id`` points at each session's newest model. Uploads
+advance it (:func:`advance_latest_hand_model`) and retention repoints it
+(:func:`repoint_latest_hand_models`) in the same transaction as the model change.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import (
+    ColumnElement,
+    RowMapping,
+    ScalarSelect,
+    Update,
+    and_,
+    bindparam,
+    exists,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+
+
+@dataclass(frozen=True, slots=True)
+class HandModelLookup:
+    model: HandModel
+    session: PairSession | None
+    user_exists: bool
+
+
+@dataclass(frozen=True, slots=True)
+class HandModelCursor:
+    """Position after the last model of a page, in ``(created_at, id)`` order."""
+
+    created_at: datetime
+    id: str
+
+    def encode(self) -> str:
+        raw = f"{self.created_at.isoformat()}|{self.id}".encode()
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> HandModelCursor:
+        """Parse :meth:`encode` output; raises ``ValueError`` if malformed."""
+
+        try:
+            raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+            created_at, _, model_id = raw.partition("|")
+            cursor = cls(created_at=datetime.fromisoformat(created_at), id=model_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+        if not model_id:
+            raise ValueError("Invalid cursor")
+        return cursor
+
+
+@dataclass(frozen=True, slots=True)
+class HandModelPage:
+    # ``hand_models`` columns, not ORM objects: pages are converted in bulk.
+    rows: list[RowMapping]
+    next_cursor: HandModelCursor | None
+
+
+def latest_hand_model_id(session_id: object) -> ScalarSelect[str]:
+    """Correlated subquery for the id of the newest model of ``session_id``.
+
+    Served by the ``(session_id, created_at, id)`` index. Used to (re)compute
+    ``latest_hand_model_id``; reads follow the pointer instead.
+    """
+
+    return (
+        select(HandModel.id)
+        .where(HandModel.session_id == session_id)
+        .order_by(HandModel.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def session_for_user(
+    db: AsyncSession, *, session_id: str, user_id: str
+) -> tuple[bool, PairSession | None]:
+    """Return whether ``user_id`` exists, and the session (if any)."""
+
+    row = (
+        await db.execute(
+            select(User.id, PairSession)
+            .outerjoin(PairSession, PairSession.id == session_id)
+            .where(User.id == user_id)
+        )
+    ).first()
+    if row is None:
+        return False, None
+    return True, row[1]
+
+
+async def session_exists(db: AsyncSession, session_id: str) -> bool:
+    return bool(await db.scalar(select(exists().where(PairSession.id == session_id))))
+
+
+async def session_with_latest_model(
+    db: AsyncSession, session_id: str
+) -> tuple[PairSession, HandModel | None] | None:
+    """Return the session and its newest hand model, or ``None`` without a session.
+
+    Two primary-key reads, through ``latest_hand_model_id``.
+    """
+
+    row = (
+        await db.execute(
+            select(PairSession, HandModel)
+            .outerjoin(HandModel, HandModel.id == PairSession.latest_hand_model_id)
+            .where(PairSession.id == session_id)
+        )
+    ).first()
+    if row is None:
+        return None
+    return row[0], row[1]
+
+
+async def hand_model_with_session(
+    db: AsyncSession, hand_model_id: str, *, user_id: str | None = None
+) -> HandModelLookup | None:
+    """Return a model with its session and whether ``user_id`` exists.
+
+    ``user_exists`` is ``True`` when no ``user_id`` is given.
+    """
+
+    user_exists = (
+        exists().where(User.id == user_id) if user_id is not None else literal(True)
+    ).label("user_exists")
+    row = (
+        await db.execute(
+            select(HandModel, PairSession, user_exists)
+            .outerjoin(PairSession, PairSession.id == HandModel.session_id)
+            .where(HandModel.id == hand_model_id)
+        )
+    ).first()
+    if row is None:
+        return None
+    return HandModelLookup(model=row[0], session=row[1], user_exists=bool(row[2]))
+
+
+async def _hand_model_history(
+    db: AsyncSession,
+    *,
+    parent_id: ColumnElement[str],
+    foreign_key: ColumnElement[str],
+    key: str,
+    after: HandModelCursor | None,
+    limit: int,
+) -> HandModelPage | None:
+    """Page through the models whose ``foreign_key`` is ``key``, or ``None`` without a parent.
+
+    One statement: the parent row, outer joined to the page, so an empty page still
+    tells a missing parent apart.
+    """
+
+    on = [foreign_key == parent_id]
+    if after is not None:
+        position = tuple_(HandModel.created_at, HandModel.id)
+        on.append(
+            position
+            < tuple_(
+                bindparam("after_created_at", after.created_at, type_=HandModel.created_at.type),
+                bindparam("after_id", after.id, type_=HandModel.id.type),
+            )
+        )
+    rows = (
+        (
+            await db.execute(
+                select(parent_id.label("parent_id"), *HandModel.__table__.c)
+                .outerjoin(HandModel, and_(*on))
+                .where(parent_id == key)
+                .order_by(HandModel.created_at.desc(), HandModel.id.desc())
+                .limit(limit + 1)
+            )
+        )
+        .mappings()
+        .all()
+    )
+    if not rows:
+        return None
+    if rows[0]["id"] is None:
+        return HandModelPage(rows=[], next_cursor=None)
+    if len(rows) <= limit:
+        return HandModelPage(rows=list(rows), next_cursor=None)
+    last = rows[limit - 1]
+    return HandModelPage(
+        rows=list(rows[:limit]),
+        next_cursor=HandModelCursor(created_at=last["created_at"], id=last["id"]),
+    )
+
+
+async def session_hand_models(
+    db: AsyncSession, session_id: str, *, after: HandModelCursor | None = None, limit: int
+) -> HandModelPage | None:
+    """A page of the session's models, newest first; ``None`` without a session."""
+
+    return await _hand_model_history(
+        db,
+        parent_id=PairSession.id,
+        foreign_key=HandModel.session_id,
+        key=session_id,
+        after=after,
+        limit=limit,
+    )
+
+
+async def user_hand_models(
+    db: AsyncSession, user_id: str, *, after: HandModelCursor | None = None, limit: int
+) -> HandModelPage | None:
+    """A page of the models ``user_id`` uploaded, newest first; ``None`` without a user."""
+
+    return await _hand_model_history(
+        db,
+        parent_id=User.id,
+        foreign_key=HandModel.owner_user_id,
+        key=user_id,
+        after=after,
+        limit=limit,
+    )
+
+
+def advance_latest_hand_model(model: HandModel) -> Update:
+    """Point ``model``'s session at it, unless the session has a newer model.
+
+    Execute in the transaction that inserts ``model``; a concurrent upload with a
+    later ``created_at`` keeps the pointer.
+    """
+
+    newer = exists().where(
+        HandModel.id == PairSession.latest_hand_model_id,
+        HandModel.created_at > model.created_at,
+    )
+    return (
+        update(PairSession)
+        .where(PairSession.id == model.session_id, ~newer)
+        .values(latest_hand_model_id=model.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def repoint_latest_hand_models(removed_ids: list[str]) -> Update:
+    """Repoint sessions whose latest model was one of ``removed_ids`` (already deleted)."""
+
+    return (
+        update(PairSession)
+        .where(PairSession.latest_hand_model_id.in_(removed_ids))
+        .values(latest_hand_model_id=latest_hand_model_id(PairSession.id))
+        .execution_options(synchronize_session=False)
+    )
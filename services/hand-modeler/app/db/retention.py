@@ -0,0 +1,333 @@
+"""Retention for pairing sessions, shared hand models and their storage blobs.
+
+Sharing data would otherwise grow forever. Each bounded pass:
+
+- expires hand models confirmed more than a TTL ago, and unconfirmed ones that
+  are older than a (longer) stale TTL
+- expires sessions that were never paired, and paired sessions with no models
+  left and no upload or confirm within a TTL, together with any models they still
+  hold (deleting a model records its last activity on the session)
+- deletes blobs that are no longer referenced (and finishes deletions that were
+  interrupted after the ``deleting`` flag was set)
+- sweeps a slice of the object store for orphans: objects no blob row or hand
+  model points at, e.g. left behind by a crash between writing and committing
+
+Rows are deleted in batches of ``batch_size``. A model's row and its blob
+reference go in the same transaction, so a blob is only deleted once no row can
+reach it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Final
+
+from sqlalchemy import and_, bindparam, delete, exists, func, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.db.membership import membership_cache
+from app.db.models import HandModel, StorageBlob
+from app.db.models import Session as PairSession
+from app.db.queries import repoint_latest_hand_models
+from app.storage import StorageBackend, delete_blob_if_unreferenced, release_blob
+
+logger = logging.getLogger(__name__)
+
+# Key prefixes the orphan sweep walks: blobs, pre-dedup per-model keys, and staging
+# leftovers (local backend only).
+ORPHAN_PREFIXES: Final[tuple[str, ...]] = ("blobs/", "hand-models/", ".staging/")
+
+
+@dataclass(frozen=True, slots=True)
+class SharingRetentionPolicy:
+    confirmed_model_ttl_seconds: int = 7 * 24 * 60 * 60
+    stale_model_ttl_seconds: int = 30 * 24 * 60 * 60
+    unpaired_session_ttl_seconds: int = 24 * 60 * 60
+    idle_session_ttl_seconds: int = 30 * 24 * 60 * 60
+    blob_grace_seconds: int = 0
+    orphan_grace_seconds: int = 60 * 60
+    batch_size: int = 200
+
+    @classmethod
+    def from_settings(cls) -> SharingRetentionPolicy:
+        return cls(
+            confirmed_model_ttl_seconds=settings.sharing_confirmed_model_ttl_seconds,
+            stale_model_ttl_seconds=settings.sharing_stale_model_ttl_seconds,
+            unpaired_session_ttl_seconds=settings.sharing_unpaired_session_ttl_seconds,
+            idle_session_ttl_seconds=settings.sharing_idle_session_ttl_seconds,
+            blob_grace_seconds=settings.sharing_blob_grace_seconds,
+            orphan_grace_seconds=settings.sharing_orphan_grace_seconds,
+            batch_size=settings.sharing_gc_batch_size,
+        )
+
+
+@dataclass(slots=True)
+class SharingRetentionReport:
+    """What a single pass (or the process so far) removed."""
+
+    models_expired: int = 0
+    sessions_expired: int = 0
+    blobs_deleted: int = 0
+    orphans_deleted: int = 0
+    reclaimed_bytes: int = 0
+
+    def add(self, other: SharingRetentionReport) -> None:
+        self.models_expired += other.models_expired
+        self.sessions_expired += other.sessions_expired
+        self.blobs_deleted += other.blobs_deleted
+        self.orphans_deleted += other.orphans_deleted
+        self.reclaimed_bytes += other.reclaimed_bytes
+
+
+def _record_session_activity(db: Session, model_ids: Sequence[str]) -> None:
+    """Keep the newest upload or confirm of models about to be deleted on their sessions."""
+
+    activity = db.execute(
+        select(
+            HandModel.session_id,
+            func.max(func.coalesce(HandModel.confirmed_at, HandModel.created_at)),
+        )
+        .where(HandModel.id.in_(model_ids))
+        .group_by(HandModel.session_id)
+    ).all()
+    if not activity:
+        return
+    table = PairSession.__table__
+    db.execute(
+        update(table)
+        .where(
+            table.c.id == bindparam("pair_session_id"),
+            or_(table.c.last_activity_at.is_(None), table.c.last_activity_at < bindparam("at")),
+        )
+        .values(last_activity_at=bindparam("at")),
+        [{"pair_session_id": session_id, "at": at} for session_id, at in activity],
+    )
+
+
+@dataclass
+class SharingRetention:
+    """Incremental retention for the sharing tables and the object store."""
+
+    session_factory: Callable[[], Session]
+    backend: StorageBackend
+    policy: SharingRetentionPolicy = field(default_factory=SharingRetentionPolicy)
+
+    totals: SharingRetentionReport = field(default_factory=SharingRetentionReport, init=False)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sweep_prefix = 0
+        self._sweep_after: str | None = None
+
+    def run_once(self, *, now: datetime | None = None) -> SharingRetentionReport:
+        """Run one pass; each step handles at most ``batch_size`` rows or objects."""
+
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        report = SharingRetentionReport()
+        with self.session_factory() as db:
+            self._expire_models(db, now, report)
+            self._expire_sessions(db, now, report)
+            self._delete_released_blobs(db, now, report)
+            self._sweep_orphans(db, now, report)
+
+        with self._lock:
+            self.totals.add(report)
+        return report
+
+    def _expire_models(self, db: Session, now: datetime, report: SharingRetentionReport) -> None:
+        rules = []
+        if self.policy.confirmed_model_ttl_seconds > 0:
+            cutoff = now - timedelta(seconds=self.policy.confirmed_model_ttl_seconds)
+            rules.append(HandModel.confirmed_at <= cutoff)
+        if self.policy.stale_model_ttl_seconds > 0:
+            cutoff = now - timedelta(seconds=self.policy.stale_model_ttl_seconds)
+            rules.append(and_(HandModel.confirmed_at.is_(None), HandModel.created_at <= cutoff))
+        if not rules:
+            return
+
+        rows = db.execute(
+            select(HandModel.id, HandModel.storage_key)
+            .where(or_(*rules))
+            .order_by(HandModel.created_at)
+            .limit(self.policy.batch_size)
+        ).all()
+        report.models_expired += self._delete_models(db, rows, now, report)
+
+    def _expire_sessions(self, db: Session, now: datetime, report: SharingRetentionReport) -> None:
+        rules = []
+        if self.policy.unpaired_session_ttl_seconds > 0:
+            cutoff = now - timedelta(seconds=self.policy.unpaired_session_ttl_seconds)
+            rules.append(
+                and_(PairSession.partner_user_id.is_(None), PairSession.created_at <= cutoff)
+            )
+        if self.policy.idle_session_ttl_seconds > 0:
+            cutoff = now - timedelta(seconds=self.policy.idle_session_ttl_seconds)
+            has_models = exists().where(HandModel.session_id == PairSession.id)
+            rules.append(
+                and_(
+                    PairSession.paired_at <= cutoff,
+                    or_(
+                        PairSession.last_activity_at.is_(None),
+                        PairSession.last_activity_at <= cutoff,
+                    ),
+                    ~has_models,
+                )
+            )
+        if not rules:
+            return
+
+        session_ids = list(
+            db.execute(
+                select(PairSession.id)
+                .where(or_(*rules))
+                .order_by(PairSession.created_at)
+                .limit(self.policy.batch_size)
+            ).scalars()
+        )
+        if not session_ids:
+            return
+
+        rows = db.execute(
+            select(HandModel.id, HandModel.storage_key).where(HandModel.session_id.in_(session_ids))
+        ).all()
+        report.models_expired += self._delete_models(db, rows, now, report, session_ids=session_ids)
+        report.sessions_expired += len(session_ids)
+
+    def _delete_models(
+        self,
+        db: Session,
+        rows: Sequence[tuple[str, str]],
+        now: datetime,
+        report: SharingRetentionReport,
+        *,
+        session_ids: Sequence[str] = (),
+    ) -> int:
+        """Delete model rows (and sessions) and drop their blob references in one commit.
+
+        Sessions that keep other models get their latest-model pointer repointed.
+        """
+
+        if not rows and not session_ids:
+            return 0
+
+        unmanaged: list[str] = []
+        for _, storage_key in rows:
+            if not release_blob(db, storage_key, now=now):
+                # A pre-dedup key owned by this model alone.
+                unmanaged.append(storage_key)
+        if rows:
+            model_ids = [model_id for model_id, _ in rows]
+            _record_session_activity(db, model_ids)
+            db.execute(
+                delete(HandModel)
+                .where(HandModel.id.in_(model_ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(repoint_latest_hand_models(model_ids))
+        if session_ids:
+            db.execute(
+                delete(PairSession)
+                .where(PairSession.id.in_(session_ids))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        membership_cache.invalidate_sessions(session_ids)
+
+        for key in unmanaged:
+            info = self.backend.head(key)
+            self.backend.delete(key)
+            report.reclaimed_bytes += info.size if info is not None else 0
+        return len(rows)
+
+    def _delete_released_blobs(
+        self, db: Session, now: datetime, report: SharingRetentionReport
+    ) -> None:
+        cutoff = now - timedelta(seconds=self.policy.blob_grace_seconds)
+        blobs = db.execute(
+            select(StorageBlob.key, StorageBlob.size_bytes)
+            .where(
+                or_(
+                    and_(StorageBlob.ref_count == 0, StorageBlob.released_at <= cutoff),
+                    # Interrupted deletions are finished regardless of the grace period.
+                    StorageBlob.deleting.is_(True),
+                )
+            )
+            .order_by(StorageBlob.released_at)
+            .limit(self.policy.batch_size)
+        ).all()
+        for key, size_bytes in blobs:
+            if delete_blob_if_unreferenced(db, self.backend, key):
+                report.blobs_deleted += 1
+                report.reclaimed_bytes += size_bytes
+
+    def _sweep_orphans(self, db: Session, now: datetime, report: SharingRetentionReport) -> None:
+        """Examine the next ``batch_size`` objects of the store, resuming where the last
+        pass stopped, and delete those nothing references."""
+
+        prefix = ORPHAN_PREFIXES[self._sweep_prefix]
+        objects = self.backend.list_objects(
+            prefix, start_after=self._sweep_after, limit=self.policy.batch_size
+        )
+        if len(objects) < self.policy.batch_size:
+            # This prefix is done; the next pass starts on the next one.
+            self._sweep_prefix = (self._sweep_prefix + 1) % len(ORPHAN_PREFIXES)
+            self._sweep_after = None
+        else:
+            self._sweep_after = objects[-1].key
+        if not objects:
+            return
+
+        keys = [info.key for info in objects]
+        referenced = set(
+            db.execute(select(StorageBlob.key).where(StorageBlob.key.in_(keys))).scalars()
+        )
+        referenced.update(
+            db.execute(
+                select(HandModel.storage_key).where(HandModel.storage_key.in_(keys))
+            ).scalars()
+        )
+        db.rollback()
+
+        cutoff = now - timedelta(seconds=self.policy.orphan_grace_seconds)
+        for info in objects:
+            if info.key in referenced:
+                continue
+            # Young objects may belong to an upload that has not committed yet.
+            if info.last_modified is None or info.last_modified > cutoff:
+                continue
+            self.backend.delete(info.key)
+            report.orphans_deleted += 1
+            report.reclaimed_bytes += info.size
+
+
+async def run_sharing_retention_loop(
+    retention: SharingRetention, *, interval_seconds: float
+) -> None:
+    """Run retention passes forever, off the event loop, every ``interval_seconds``."""
+
+    while True:
+        try:
+            report = await run_in_threadpool(retention.run_once)
+        except Exception:  # pragma: no cover
+            logger.exception("Sharing retention pass failed")
+        else:
+            if report.reclaimed_bytes or report.models_expired or report.sessions_expired:
+                logger.info(
+                    "Sharing retention reclaimed %d bytes (models=%d, sessions=%d, "
+                    "blobs=%d, orphans=%d)",
+                    report.reclaimed_bytes,
+                    report.models_expired,
+                    report.sessions_expired,
+                    report.blobs_deleted,
+                    report.orphans_deleted,
+                )
+        await asyncio.sleep(interval_seconds)
@@ -1,28 +1,100 @@
-"""Database session and initialization."""
+"""Database engines, sessions and initialization.
+
+Request handlers use an :class:`~sqlalchemy.ext.asyncio.AsyncSession` (``get_db``),
+so a slow query never blocks the event loop. The synchronous engine remains for
+schema setup and for background work that already runs in worker threads
+(retention, the job store).
+
+Engines are configured by the ``DATABASE_PROFILE`` (see :mod:`app.db.profiles`).
+With ``DATABASE_READ_URL`` set, read-only endpoints query a replica through
+``get_read_db``; otherwise it uses the primary.
+"""
 
 from __future__ import annotations
 
-from collections.abc import Generator
+from collections.abc import AsyncIterator
+from typing import Final
 
 from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
 from app.db.base import Base
+from app.db.profiles import (
+    EngineProfile,
+    apply_sqlite_pragmas,
+    engine_options,
+    get_engine_profile,
+)
+
+# Async driver used for each backend when DATABASE_ASYNC_URL is not set.
+ASYNC_DRIVERS: Final[dict[str, str]] = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` with its driver replaced by the backend's async driver.
+
+    Raises:
+        ValueError: if there is no known async driver for the backend.
+    """
+
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend!r}; set DATABASE_ASYNC_URL")
+    driver = ASYNC_DRIVERS[backend]
+    if parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def create_sync_engine(url: str, profile: EngineProfile) -> Engine:
+    engine = create_engine(url, **engine_options(url, profile))
+    apply_sqlite_pragmas(engine, profile)
+    return engine
+
 
+def create_profiled_async_engine(url: str, profile: EngineProfile) -> AsyncEngine:
+    engine = create_async_engine(url, **engine_options(url, profile))
+    apply_sqlite_pragmas(engine.sync_engine, profile)
+    return engine
 
-def _create_engine() -> Engine:
-    connect_args: dict[str, object] = {}
-    if settings.database_url.startswith("sqlite"):
-        connect_args = {"check_same_thread": False}
 
-    return create_engine(settings.database_url, connect_args=connect_args)
+def _async_sessionmaker(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=bind, autoflush=False, autocommit=False, expire_on_commit=False)
 
 
-engine = _create_engine()
+engine_profile = get_engine_profile(settings.database_profile, settings.database_profile_overrides)
+
+engine = create_sync_engine(settings.database_url, engine_profile)
+async_engine = create_profiled_async_engine(
+    settings.database_async_url or async_database_url(settings.database_url), engine_profile
+)
+
+if settings.database_read_url:
+    read_profile = get_engine_profile(
+        settings.database_read_profile or settings.database_profile,
+        settings.database_profile_overrides,
+    )
+    read_async_engine = create_profiled_async_engine(
+        async_database_url(settings.database_read_url), read_profile
+    )
+else:
+    read_async_engine = async_engine
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+AsyncSessionLocal = _async_sessionmaker(async_engine)
+ReadSessionLocal = _async_sessionmaker(read_async_engine)
 
 
 def init_db() -> None:
@@ -30,15 +102,30 @@ def init_db() -> None:
 
     # Import models to register them with SQLAlchemy metadata.
     from app.db import models  # noqa: F401
+    from app.db.migrations import migrate
 
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
 
 
-def get_db() -> Generator[Session, None, None]:
-    """FastAPI dependency that provides a DB session."""
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that provides an async DB session."""
 
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that provides a session for read-only queries.
+
+    It may be served by a replica that lags the primary; writes must use ``get_db``.
+    """
+
+    async with ReadSessionLocal() as db:
+        yield db
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
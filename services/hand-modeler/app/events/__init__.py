@@ -0,0 +1,53 @@
+"""Session events: brokers that push "something changed" to subscribed clients.
+
+Uploads publish a ``hand_model`` event once their transaction commits, and the
+``/sessions/{id}/events`` WebSocket forwards them, so partners need not poll.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+
+from app.config import settings
+from app.events.base import Broker, BrokerError, SessionEvent, Subscription
+from app.events.memory import InProcessBroker
+from app.events.sqlite import SQLiteBroker
+
+__all__ = [
+    "Broker",
+    "BrokerError",
+    "InProcessBroker",
+    "SQLiteBroker",
+    "SessionEvent",
+    "Subscription",
+    "get_broker",
+]
+
+
+@lru_cache(maxsize=4)
+def _build_broker(
+    kind: str, path: str, poll_seconds: float, retention_seconds: float, max_pending: int
+) -> Broker:
+    if kind == "memory":
+        return InProcessBroker(max_pending=max_pending)
+    if kind == "sqlite":
+        return SQLiteBroker(
+            Path(path),
+            poll_seconds=poll_seconds,
+            retention_seconds=retention_seconds,
+            max_pending=max_pending,
+        )
+    raise ValueError(f"Unknown session events broker: {kind}")
+
+
+def get_broker() -> Broker:
+    """FastAPI dependency returning the configured broker (one per process)."""
+
+    return _build_broker(
+        settings.session_events_broker,
+        settings.session_events_path,
+        settings.session_events_poll_seconds,
+        settings.session_events_retention_seconds,
+        settings.session_events_max_pending,
+    )
@@ -0,0 +1,79 @@
+"""Session event broker interface."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass, field
+from typing import Any, Protocol, runtime_checkable
+
+
+class BrokerError(RuntimeError):
+    """Raised when a broker cannot publish or deliver events."""
+
+
+@dataclass(frozen=True, slots=True)
+class SessionEvent:
+    """Something that happened in a pairing session, e.g. ``"hand_model"`` after an upload."""
+
+    session_id: str
+    type: str
+    data: dict[str, Any] = field(default_factory=dict)
+
+    def to_message(self) -> dict[str, Any]:
+        return {"type": self.type, "session_id": self.session_id, **self.data}
+
+
+class Subscription:
+    """Events for one session, delivered to one consumer.
+
+    Holds at most ``max_pending`` undelivered events; a consumer that falls further
+    behind loses the oldest ones (each event is a "something new" hint, and the
+    session can always be re-read).
+    """
+
+    def __init__(self, session_id: str, *, max_pending: int) -> None:
+        self.session_id = session_id
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[SessionEvent] = asyncio.Queue(maxsize=max(max_pending, 1))
+
+    def deliver(self, event: SessionEvent) -> None:
+        """Queue ``event``; safe to call from any thread or event loop."""
+
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: SessionEvent) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    async def get(self) -> SessionEvent:
+        return await self._queue.get()
+
+    def __aiter__(self) -> AsyncIterator[SessionEvent]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[SessionEvent]:
+        while True:
+            yield await self._queue.get()
+
+
+@runtime_checkable
+class Broker(Protocol):
+    """Fans session events out to the consumers subscribed to that session.
+
+    ``publish`` is called after the change it announces has committed. Delivery is
+    best effort: a consumer that was not subscribed at the time misses the event.
+    """
+
+    async def publish(self, event: SessionEvent) -> None:
+        ...
+
+    def subscribe(self, session_id: str) -> AbstractAsyncContextManager[Subscription]:
+        ...
+
+    def close(self) -> None:
+        ...
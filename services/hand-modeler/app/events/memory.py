@@ -0,0 +1,52 @@
+"""In-process session event broker (a single worker)."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from app.events.base import SessionEvent, Subscription
+
+
+class InProcessBroker:
+    """Delivers events to the subscribers of this process only.
+
+    Also the local fan-out of :class:`~app.events.sqlite.SQLiteBroker`.
+    """
+
+    def __init__(self, *, max_pending: int = 64) -> None:
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = {}
+
+    async def publish(self, event: SessionEvent) -> None:
+        self.deliver(event)
+
+    def deliver(self, event: SessionEvent) -> None:
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(event.session_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    @asynccontextmanager
+    async def subscribe(self, session_id: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription(session_id, max_pending=self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                remaining = self._subscribers.get(session_id)
+                if remaining is not None:
+                    remaining.discard(subscription)
+                    if not remaining:
+                        del self._subscribers[session_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def close(self) -> None:
+        pass
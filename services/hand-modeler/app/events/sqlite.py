@@ -0,0 +1,136 @@
+"""Session event broker shared by the workers of one host, through a SQLite change feed.
+
+Publishing appends a row to ``session_events`` in a small WAL-mode database next to
+the app's data. Each process runs one feed thread, started by its first subscriber,
+that reads the rows after the last one it saw every ``poll_seconds`` and hands them
+to its local subscribers. Many WebSocket clients thus cost one indexed read per
+process per interval, instead of a poll request each. Rows older than
+``retention_seconds`` are pruned by publishers.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, closing
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from app.events.base import BrokerError, SessionEvent, Subscription
+from app.events.memory import InProcessBroker
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+_READ_BATCH = 500
+_PRUNE_EVERY = 100  # publishes
+
+
+class SQLiteBroker:
+    """Broker for several processes sharing ``path`` (one host, or a shared volume)."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        poll_seconds: float = 0.1,
+        retention_seconds: float = 300.0,
+        max_pending: int = 64,
+    ) -> None:
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._local = InProcessBroker(max_pending=max_pending)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._feed: threading.Thread | None = None
+        self._publishes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    async def publish(self, event: SessionEvent) -> None:
+        await run_in_threadpool(self._append, event)
+
+    def _append(self, event: SessionEvent) -> None:
+        now = time.time()
+        with self._lock:
+            self._publishes += 1
+            prune = self._publishes % _PRUNE_EVERY == 0
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute(
+                    "INSERT INTO session_events (session_id, type, data, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (event.session_id, event.type, json.dumps(event.data), now),
+                )
+                if prune:
+                    connection.execute(
+                        "DELETE FROM session_events WHERE created_at < ?",
+                        (now - self.retention_seconds,),
+                    )
+        except sqlite3.Error as exc:
+            raise BrokerError(f"Could not publish to {self.path}: {exc}") from exc
+
+    @asynccontextmanager
+    async def subscribe(self, session_id: str) -> AsyncIterator[Subscription]:
+        # Starting the feed reads the database; keep it off the event loop.
+        await run_in_threadpool(self._ensure_feed)
+        async with self._local.subscribe(session_id) as subscription:
+            yield subscription
+
+    def _ensure_feed(self) -> None:
+        with self._lock:
+            if self._feed is not None and self._feed.is_alive():
+                return
+            # Start after the newest row: subscribers only see events from now on.
+            with closing(self._connect()) as connection:
+                last_id = connection.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM session_events"
+                ).fetchone()[0]
+            self._stop.clear()
+            self._feed = threading.Thread(
+                target=self._follow, args=(last_id,), name="session-events-feed", daemon=True
+            )
+            self._feed.start()
+
+    def _follow(self, last_id: int) -> None:
+        with closing(self._connect()) as connection:
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    rows = connection.execute(
+                        "SELECT id, session_id, type, data FROM session_events"
+                        " WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, _READ_BATCH),
+                    ).fetchall()
+                except sqlite3.Error:
+                    logger.exception("Reading the session event feed failed")
+                    continue
+                for row_id, session_id, event_type, data in rows:
+                    last_id = row_id
+                    self._local.deliver(
+                        SessionEvent(session_id=session_id, type=event_type, data=json.loads(data))
+                    )
+
+    def close(self) -> None:
+        self._stop.set()
+        feed, self._feed = self._feed, None
+        if feed is not None:
+            feed.join(timeout=5.0)
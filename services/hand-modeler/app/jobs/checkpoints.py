@@ -0,0 +1,124 @@
+"""Per-frame landmark checkpoints for resumable hand scan jobs.
+
+Detected landmarks are appended to ``landmarks.ckpt`` in the job directory as soon as
+each frame is processed. If the process dies mid-job, a resumed run only detects the
+frames that have no checkpoint yet.
+
+File layout (little-endian)::
+
+    header: b"HLCK" | u16 version
+    record: u32 frame_index | u16 landmark_count | count * (f32 x, f32 y, f32 z, f32 confidence)
+
+A missing confidence is stored as NaN. A truncated trailing record (crash during a
+write) is ignored on load.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO, Final
+
+from app.jobs.store import get_job_dir
+from app.services.hands.detector import Landmark
+
+CHECKPOINT_FILENAME: Final[str] = "landmarks.ckpt"
+
+_MAGIC: Final[bytes] = b"HLCK"
+_VERSION: Final[int] = 1
+_HEADER = struct.Struct("<4sH")
+_RECORD_HEADER = struct.Struct("<IH")
+_LANDMARK = struct.Struct("<4f")
+
+
+def get_checkpoint_path(jobs_dir: Path, job_id: str) -> Path:
+    return get_job_dir(jobs_dir, job_id) / CHECKPOINT_FILENAME
+
+
+def encode_frame(frame_index: int, landmarks: list[Landmark]) -> bytes:
+    parts = [_RECORD_HEADER.pack(frame_index, len(landmarks))]
+    for lm in landmarks:
+        confidence = math.nan if lm.confidence is None else lm.confidence
+        parts.append(_LANDMARK.pack(lm.x, lm.y, lm.z, confidence))
+    return b"".join(parts)
+
+
+def _parse(data: bytes) -> tuple[dict[int, list[Landmark]], int]:
+    """Parse checkpoint bytes, returning the frames and the length of the valid prefix."""
+
+    if len(data) < _HEADER.size:
+        return {}, 0
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        return {}, 0
+
+    frames: dict[int, list[Landmark]] = {}
+    offset = _HEADER.size
+    while offset + _RECORD_HEADER.size <= len(data):
+        frame_index, count = _RECORD_HEADER.unpack_from(data, offset)
+        end = offset + _RECORD_HEADER.size + count * _LANDMARK.size
+        if end > len(data):
+            break
+
+        landmarks: list[Landmark] = []
+        for x, y, z, confidence in _LANDMARK.iter_unpack(data[offset + _RECORD_HEADER.size : end]):
+            landmarks.append(
+                Landmark(
+                    x=x,
+                    y=y,
+                    z=z,
+                    confidence=None if math.isnan(confidence) else confidence,
+                )
+            )
+        frames[frame_index] = landmarks
+        offset = end
+
+    return frames, offset
+
+
+def load_checkpoints(jobs_dir: Path, job_id: str) -> dict[int, list[Landmark]]:
+    """Load all complete checkpoint records for a job, keyed by frame index."""
+
+    try:
+        data = get_checkpoint_path(jobs_dir, job_id).read_bytes()
+    except FileNotFoundError:
+        return {}
+
+    frames, _ = _parse(data)
+    return frames
+
+
+class CheckpointWriter:
+    """Appends per-frame landmark records to a job's checkpoint file."""
+
+    def __init__(self, jobs_dir: Path, job_id: str, *, fsync: bool = False) -> None:
+        path = get_checkpoint_path(jobs_dir, job_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Drop a torn trailing record (or an unreadable file) before appending.
+        valid_length = _parse(path.read_bytes())[1] if path.exists() else 0
+
+        self._fsync = fsync
+        self._file: BinaryIO = path.open("r+b" if path.exists() else "wb")
+        self._file.truncate(valid_length)
+        self._file.seek(valid_length)
+        if valid_length == 0:
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+            self._file.flush()
+
+    def append(self, frame_index: int, landmarks: list[Landmark]) -> None:
+        self._file.write(encode_frame(frame_index, landmarks))
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> CheckpointWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
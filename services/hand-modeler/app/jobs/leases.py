@@ -0,0 +1,231 @@
+"""File leases for claiming hand scan jobs across worker processes.
+
+A worker owns a job while it holds ``<job_dir>/lease``. The protocol only relies on
+operations that are atomic on local filesystems and NFS alike:
+
+- **claim**: create the lease file with ``O_CREAT | O_EXCL``; only one worker wins.
+- **heartbeat**: the owner bumps the lease file's mtime through an open descriptor
+  after checking that the file still carries its own random token. If the lease was
+  taken over, the owner sees that it was lost and must stop writing to the job.
+- **takeover**: a lease whose mtime is older than its TTL is considered abandoned.
+  A contender atomically renames it aside (only one rename can succeed), then
+  claims the job with ``O_EXCL`` as usual. If the renamed lease turns out to have
+  been refreshed in the meantime it is hard-linked back into place.
+
+Expiry compares mtimes against the local clock, so hosts sharing a volume need
+roughly synchronized clocks (well within the lease TTL).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Final
+from uuid import uuid4
+
+from app.jobs.store import get_job_dir
+
+LEASE_FILENAME: Final[str] = "lease"
+
+WORKER_ID: Final[str] = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a worker's lease was taken over by another worker."""
+
+
+def get_lease_path(jobs_dir: Path, job_id: str) -> Path:
+    return get_job_dir(jobs_dir, job_id) / LEASE_FILENAME
+
+
+def read_lease_owner(jobs_dir: Path, job_id: str) -> str | None:
+    try:
+        data = json.loads(get_lease_path(jobs_dir, job_id).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    owner = data.get("owner")
+    return owner if isinstance(owner, str) else None
+
+
+def lease_is_expired(jobs_dir: Path, job_id: str, ttl_seconds: float) -> bool:
+    try:
+        mtime = get_lease_path(jobs_dir, job_id).stat().st_mtime
+    except FileNotFoundError:
+        return True
+    return time.time() - mtime > ttl_seconds
+
+
+class JobLease:
+    """A held lease on a single job.
+
+    Use :meth:`try_acquire` to claim a job, :meth:`heartbeat` (or
+    :meth:`start_heartbeat`) while working on it, and :meth:`release` when done.
+    """
+
+    def __init__(self, jobs_dir: Path, job_id: str, owner: str, token: str) -> None:
+        self.jobs_dir = jobs_dir
+        self.job_id = job_id
+        self.owner = owner
+        self._token = token
+        self._lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def try_acquire(
+        cls,
+        jobs_dir: Path,
+        job_id: str,
+        *,
+        ttl_seconds: float,
+        owner: str = WORKER_ID,
+    ) -> JobLease | None:
+        """Claim ``job_id``, taking over an expired lease if needed.
+
+        Returns:
+            The lease, or ``None`` if another live worker holds the job.
+        """
+
+        path = get_lease_path(jobs_dir, job_id)
+        if not path.parent.exists():
+            return None
+
+        lease = cls._create(path, jobs_dir, job_id, owner)
+        if lease is not None:
+            return lease
+
+        if not lease_is_expired(jobs_dir, job_id, ttl_seconds):
+            return None
+
+        reaped = path.with_name(f"{LEASE_FILENAME}.reaped.{uuid4().hex}")
+        try:
+            path.rename(reaped)
+        except FileNotFoundError:
+            # Someone else reaped (or released) it first; race for the fresh claim.
+            return cls._create(path, jobs_dir, job_id, owner)
+
+        try:
+            if time.time() - reaped.stat().st_mtime <= ttl_seconds:
+                # The owner heartbeated between our expiry check and the rename.
+                try:
+                    os.link(reaped, path)
+                except FileExistsError:
+                    pass
+                return None
+        finally:
+            reaped.unlink(missing_ok=True)
+
+        return cls._create(path, jobs_dir, job_id, owner)
+
+    @classmethod
+    def _create(cls, path: Path, jobs_dir: Path, job_id: str, owner: str) -> JobLease | None:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+
+        token = uuid4().hex
+        try:
+            payload = {"owner": owner, "token": token, "acquired_at": time.time()}
+            os.write(fd, json.dumps(payload).encode("utf-8"))
+        finally:
+            os.close(fd)
+        return cls(jobs_dir, job_id, owner, token)
+
+    @staticmethod
+    def _token_of(fd: int) -> str | None:
+        try:
+            data = json.loads(os.pread(fd, 4096, 0).decode("utf-8"))
+        except ValueError:
+            return None
+        token = data.get("token") if isinstance(data, dict) else None
+        return token if isinstance(token, str) else None
+
+    @property
+    def path(self) -> Path:
+        return get_lease_path(self.jobs_dir, self.job_id)
+
+    @property
+    def lost(self) -> bool:
+        return self._lost.is_set()
+
+    def heartbeat(self) -> None:
+        """Refresh the lease.
+
+        Raises:
+            LeaseLostError: if the lease file no longer belongs to this worker.
+        """
+
+        if self.lost:
+            raise LeaseLostError(f"Lease on job {self.job_id} was lost")
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            self._lost.set()
+            raise LeaseLostError(f"Lease on job {self.job_id} was lost") from None
+
+        try:
+            if self._token_of(fd) != self._token:
+                self._lost.set()
+                raise LeaseLostError(f"Lease on job {self.job_id} was taken over")
+            os.utime(fd)
+        finally:
+            os.close(fd)
+
+    def ensure_held(self) -> None:
+        """Raise :class:`LeaseLostError` if a background heartbeat noticed a takeover."""
+
+        if self.lost:
+            raise LeaseLostError(f"Lease on job {self.job_id} was lost")
+
+    def start_heartbeat(self, interval_seconds: float) -> None:
+        """Heartbeat from a daemon thread until :meth:`release` is called."""
+
+        if self._thread is not None:
+            return
+
+        def _run() -> None:
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.heartbeat()
+                except LeaseLostError:
+                    return
+
+        self._thread = threading.Thread(
+            target=_run, name=f"lease-heartbeat-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+
+    def release(self) -> None:
+        """Stop heartbeating and delete the lease file if it is still ours."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self.lost:
+            return
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                if self._token_of(fd) == self._token:
+                    self.path.unlink(missing_ok=True)
+            finally:
+                os.close(fd)
+        self._lost.set()
+
+    def __enter__(self) -> JobLease:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
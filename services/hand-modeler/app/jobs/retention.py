@@ -0,0 +1,305 @@
+"""Retention and disk garbage collection for the hand scan job store.
+
+Every scan leaves a directory under ``settings.jobs_dir``. This module keeps that
+directory bounded:
+
+- raw frames are dropped as soon as a job completes (configurable)
+- finished jobs are deleted once they are older than a TTL
+- when finished jobs use more than a high-water mark, the oldest are evicted first
+- uploads left ``uploading`` (abandoned sessions, or a crash before a scan was
+  queued) are deleted once idle for longer than a TTL
+
+Finished jobs are tracked in an in-memory index that the job processor feeds as
+jobs finish, so a GC pass never walks the whole jobs directory. Jobs that were
+already on disk when the process started are picked up by an incremental scan that
+only looks at ``batch_size`` entries per pass. Uploads are tracked the same way: they
+are registered when they start, or found by the startup scan.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.jobs import store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RetentionPolicy:
+    drop_frames_on_complete: bool = True
+    ttl_seconds: int = 7 * 24 * 60 * 60
+    max_disk_bytes: int = 0
+    low_water_ratio: float = 0.9
+    batch_size: int = 64
+    upload_ttl_seconds: int = 24 * 60 * 60
+
+    @classmethod
+    def from_settings(cls) -> RetentionPolicy:
+        return cls(
+            drop_frames_on_complete=settings.jobs_drop_frames_on_complete,
+            ttl_seconds=settings.jobs_ttl_seconds,
+            max_disk_bytes=settings.jobs_max_disk_mb * 1024 * 1024,
+            low_water_ratio=settings.jobs_disk_low_water_ratio,
+            batch_size=settings.jobs_gc_batch_size,
+            upload_ttl_seconds=settings.jobs_upload_ttl_seconds,
+        )
+
+
+@dataclass(slots=True)
+class RetentionReport:
+    """What a single GC pass (or the process so far) reclaimed."""
+
+    frames_purged: int = 0
+    jobs_expired: int = 0
+    jobs_evicted: int = 0
+    uploads_expired: int = 0
+    reclaimed_bytes: int = 0
+
+    def add(self, other: RetentionReport) -> None:
+        self.frames_purged += other.frames_purged
+        self.jobs_expired += other.jobs_expired
+        self.jobs_evicted += other.jobs_evicted
+        self.uploads_expired += other.uploads_expired
+        self.reclaimed_bytes += other.reclaimed_bytes
+
+
+@dataclass(slots=True)
+class _IndexedJob:
+    finished_at: float
+    size_bytes: int
+
+
+@dataclass
+class JobRetention:
+    """Incremental retention manager for a single jobs directory."""
+
+    jobs_dir: Path
+    policy: RetentionPolicy = field(default_factory=RetentionPolicy)
+
+    totals: RetentionReport = field(default_factory=RetentionReport, init=False)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: dict[str, _IndexedJob] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._indexed_bytes = 0
+        # Jobs still ``uploading``, with when they were last seen active.
+        self._uploads: dict[str, float] = {}
+        self._bootstrap: Iterator[os.DirEntry[str]] | None = None
+        self._bootstrap_done = False
+
+    @property
+    def indexed_bytes(self) -> int:
+        """Bytes used by finished jobs known to the index."""
+
+        return self._indexed_bytes
+
+    @property
+    def bootstrap_done(self) -> bool:
+        return self._bootstrap_done
+
+    def __contains__(self, job_id: object) -> bool:
+        return job_id in self._jobs
+
+    def on_job_finished(self, job_id: str) -> RetentionReport:
+        """Register a job that reached a terminal state.
+
+        Completed jobs have their frames dropped right away when the policy says so.
+        """
+
+        report = self._register(job_id)
+        with self._lock:
+            self.totals.add(report)
+        return report
+
+    def on_upload_started(self, job_id: str) -> None:
+        """Track a job created ``uploading``, so it is deleted if never finalized."""
+
+        with self._lock:
+            self._uploads[job_id] = store.utc_now().timestamp()
+
+    def _register(self, job_id: str) -> RetentionReport:
+        report = RetentionReport()
+        record = store.read_job_record(self.jobs_dir, job_id)
+        if record is not None and record.status == "uploading":
+            with self._lock:
+                self._uploads[job_id] = store.last_upload_activity(self.jobs_dir, record)
+            return report
+        if record is None or record.status not in store.TERMINAL_STATUSES:
+            return report
+
+        if (
+            self.policy.drop_frames_on_complete
+            and record.status == "completed"
+            and not record.frames_purged
+        ):
+            report.frames_purged = 1
+            report.reclaimed_bytes = store.purge_frames(self.jobs_dir, job_id)
+
+        finished_at = (record.finished_at or record.updated_at).timestamp()
+        self._index(job_id, finished_at, store.job_dir_size(self.jobs_dir, job_id))
+        return report
+
+    def run_once(self, *, now: float | None = None) -> RetentionReport:
+        """Run one bounded GC pass.
+
+        A pass advances the startup scan by at most ``batch_size`` entries, then
+        expires and evicts at most ``batch_size`` jobs.
+        """
+
+        report = RetentionReport()
+        self._advance_bootstrap(report)
+
+        if now is None:
+            now = store.utc_now().timestamp()
+
+        budget = self.policy.batch_size
+        expire_before = now - self.policy.ttl_seconds
+        while budget > 0:
+            oldest = self._peek_oldest()
+            if oldest is None or oldest[0] > expire_before:
+                break
+            report.jobs_expired += 1
+            report.reclaimed_bytes += self._delete(oldest[1])
+            budget -= 1
+
+        budget = self._expire_uploads(report, now - self.policy.upload_ttl_seconds, budget)
+
+        if self.policy.max_disk_bytes > 0 and self._indexed_bytes > self.policy.max_disk_bytes:
+            low_water = int(self.policy.max_disk_bytes * self.policy.low_water_ratio)
+            while budget > 0 and self._indexed_bytes > low_water:
+                oldest = self._peek_oldest()
+                if oldest is None:
+                    break
+                report.jobs_evicted += 1
+                report.reclaimed_bytes += self._delete(oldest[1])
+                budget -= 1
+
+        with self._lock:
+            self.totals.add(report)
+        return report
+
+    def _expire_uploads(self, report: RetentionReport, idle_before: float, budget: int) -> int:
+        with self._lock:
+            candidates = [job_id for job_id, seen in self._uploads.items() if seen <= idle_before]
+
+        for job_id in candidates[:budget]:
+            record = store.read_job_record(self.jobs_dir, job_id)
+            if record is None or record.status != "uploading":
+                # Finalized (terminal jobs reach the index through on_job_finished) or gone.
+                with self._lock:
+                    self._uploads.pop(job_id, None)
+                continue
+
+            active_at = store.last_upload_activity(self.jobs_dir, record)
+            with self._lock:
+                if active_at > idle_before:
+                    self._uploads[job_id] = active_at
+                    continue
+                self._uploads.pop(job_id, None)
+            report.uploads_expired += 1
+            report.reclaimed_bytes += store.delete_job(self.jobs_dir, job_id)
+            budget -= 1
+        return budget
+
+    def _index(self, job_id: str, finished_at: float, size_bytes: int) -> None:
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            if previous is not None:
+                self._indexed_bytes -= previous.size_bytes
+            self._jobs[job_id] = _IndexedJob(finished_at=finished_at, size_bytes=size_bytes)
+            self._indexed_bytes += size_bytes
+            heapq.heappush(self._heap, (finished_at, job_id))
+
+    def _peek_oldest(self) -> tuple[float, str] | None:
+        with self._lock:
+            while self._heap:
+                finished_at, job_id = self._heap[0]
+                entry = self._jobs.get(job_id)
+                if entry is not None and entry.finished_at == finished_at:
+                    return finished_at, job_id
+                # Stale heap entry (job re-indexed or already deleted).
+                heapq.heappop(self._heap)
+            return None
+
+    def _delete(self, job_id: str) -> int:
+        with self._lock:
+            entry = self._jobs.pop(job_id, None)
+            if entry is not None:
+                self._indexed_bytes -= entry.size_bytes
+        return store.delete_job(self.jobs_dir, job_id)
+
+    def _advance_bootstrap(self, report: RetentionReport) -> None:
+        if self._bootstrap_done:
+            return
+
+        if self._bootstrap is None:
+            try:
+                self._bootstrap = os.scandir(self.jobs_dir)
+            except FileNotFoundError:
+                self._bootstrap_done = True
+                return
+
+        for _ in range(self.policy.batch_size):
+            entry = next(self._bootstrap, None)
+            while entry is not None and entry.name in store.INDEX_DIRNAMES:
+                entry = next(self._bootstrap, None)
+            if entry is None:
+                self._bootstrap_done = True
+                self._bootstrap = None
+                return
+            if entry.name in self._jobs or entry.name in self._uploads:
+                continue
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            report.add(self._register(entry.name))
+
+
+_retention_by_dir: dict[Path, JobRetention] = {}
+_retention_lock = threading.Lock()
+
+
+def get_job_retention(jobs_dir: Path) -> JobRetention:
+    """Return the process-wide retention manager for ``jobs_dir``."""
+
+    key = jobs_dir.resolve()
+    with _retention_lock:
+        retention = _retention_by_dir.get(key)
+        if retention is None:
+            retention = JobRetention(jobs_dir=jobs_dir, policy=RetentionPolicy.from_settings())
+            _retention_by_dir[key] = retention
+        return retention
+
+
+async def run_retention_loop(jobs_dir: Path, *, interval_seconds: float) -> None:
+    """Run GC passes forever, off the event loop, every ``interval_seconds``."""
+
+    retention = get_job_retention(jobs_dir)
+    while True:
+        try:
+            report = await run_in_threadpool(retention.run_once)
+        except Exception:  # pragma: no cover
+            logger.exception("Job retention pass failed")
+        else:
+            if report.reclaimed_bytes:
+                logger.info(
+                    "Job retention reclaimed %d bytes "
+                    "(frames purged=%d, expired=%d, evicted=%d, uploads expired=%d)",
+                    report.reclaimed_bytes,
+                    report.frames_purged,
+                    report.jobs_expired,
+                    report.jobs_evicted,
+                    report.uploads_expired,
+                )
+        await asyncio.sleep(interval_seconds)
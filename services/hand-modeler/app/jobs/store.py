@@ -1,7 +1,13 @@
 """Lightweight file-backed job store.
 
-This service is currently designed to run as a single-process FastAPI app. Jobs are
-persisted to disk so that results can be fetched later without an external database.
+Jobs are persisted to disk so that results can be fetched later without an external
+database. Several worker processes (or hosts on a shared volume) can use the same
+jobs directory; ``app.jobs.leases`` coordinates which worker processes which job.
+
+Unfinished jobs are indexed by empty marker files under ``<jobs_dir>/_queue`` so
+workers can find claimable work without scanning every job directory. Scan
+submissions are deduplicated through ``<jobs_dir>/_dedup/<key>`` files holding the
+job id that owns each content hash.
 
 If the project adopts Celery/Redis or a DB-backed queue, this module can be replaced
 behind the same interface.
@@ -9,14 +15,28 @@ behind the same interface.
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import shutil
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Literal, cast
+from typing import BinaryIO, Literal, cast
+from uuid import uuid4
 
 from pydantic import BaseModel, Field
 
-JobStatus = Literal["queued", "processing", "completed", "failed"]
+JobStatus = Literal["uploading", "queued", "processing", "completed", "failed"]
+
+TERMINAL_STATUSES: frozenset[str] = frozenset({"completed", "failed"})
+CLAIMABLE_STATUSES: frozenset[str] = frozenset({"queued", "processing"})
+
+QUEUE_DIRNAME = "_queue"
+DEDUP_DIRNAME = "_dedup"
+INDEX_DIRNAMES: frozenset[str] = frozenset({QUEUE_DIRNAME, DEDUP_DIRNAME})
+FRAME_PREFIX = "frame_"
+PARTIAL_SUFFIX = ".part"
 
 
 def utc_now() -> datetime:
@@ -29,13 +49,29 @@ class HandScanJobRecord(BaseModel):
 
     created_at: datetime = Field(default_factory=utc_now)
     updated_at: datetime = Field(default_factory=utc_now)
+    finished_at: datetime | None = None
 
     frame_files: list[str] = Field(default_factory=list)
+    frames_purged: bool = False
+
+    # Single-file scan input (zip/MJPEG/video) decoded lazily instead of frame_files.
+    source_file: str | None = None
+    source_kind: str | None = None
+
+    # Key under ``_dedup`` that points at this job, if the submission was deduplicated.
+    dedup_key: str | None = None
 
     metadata_file: str | None = None
     glb_file: str | None = None
+    glb_sha256: str | None = None
 
     error: str | None = None
+    attempts: int = 0
+    resumed_frames: int = 0
+
+    frame_count: int | None = None
+    stage_timings_ms: dict[str, float] = Field(default_factory=dict)
+    stage_calls: dict[str, int] = Field(default_factory=dict)
 
 
 def get_job_dir(jobs_dir: Path, job_id: str) -> Path:
@@ -51,7 +87,7 @@ def write_job_record(jobs_dir: Path, record: HandScanJobRecord) -> None:
     job_dir.mkdir(parents=True, exist_ok=True)
 
     path = get_job_record_path(jobs_dir, record.job_id)
-    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path = path.with_suffix(f".json.{os.getpid()}.tmp")
     tmp_path.write_text(record.model_dump_json(indent=2), encoding="utf-8")
     tmp_path.replace(path)
 
@@ -64,24 +100,67 @@ def read_job_record(jobs_dir: Path, job_id: str) -> HandScanJobRecord | None:
     return HandScanJobRecord.model_validate_json(path.read_text(encoding="utf-8"))
 
 
-def create_job(jobs_dir: Path, job_id: str, frame_files: list[str]) -> HandScanJobRecord:
+def _queue_marker_path(jobs_dir: Path, job_id: str) -> Path:
+    return jobs_dir / QUEUE_DIRNAME / job_id
+
+
+def _mark_unfinished(jobs_dir: Path, job_id: str) -> None:
+    marker = _queue_marker_path(jobs_dir, job_id)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch(exist_ok=True)
+
+
+def _unmark_unfinished(jobs_dir: Path, job_id: str) -> None:
+    _queue_marker_path(jobs_dir, job_id).unlink(missing_ok=True)
+
+
+def create_job(
+    jobs_dir: Path,
+    job_id: str,
+    frame_files: list[str],
+    *,
+    status: JobStatus = "queued",
+    source_file: str | None = None,
+    source_kind: str | None = None,
+    dedup_key: str | None = None,
+) -> HandScanJobRecord:
     record = HandScanJobRecord(
         job_id=job_id,
-        status="queued",
+        status=status,
         frame_files=frame_files,
+        source_file=source_file,
+        source_kind=source_kind,
+        dedup_key=dedup_key,
     )
     write_job_record(jobs_dir, record)
+    if status in CLAIMABLE_STATUSES:
+        _mark_unfinished(jobs_dir, job_id)
     return record
 
 
+def _merge_job_fields(record: HandScanJobRecord, fields: dict[str, object]) -> None:
+    # ``None`` means "leave as is"; no field can be reset to None through update_job.
+    for name, value in fields.items():
+        if value is not None:
+            setattr(record, name, value)
+
+
 def update_job(
     jobs_dir: Path,
     job_id: str,
     *,
     status: JobStatus | None = None,
+    frame_files: list[str] | None = None,
     metadata_file: str | None = None,
     glb_file: str | None = None,
+    glb_sha256: str | None = None,
     error: str | None = None,
+    frames_purged: bool | None = None,
+    frame_count: int | None = None,
+    stage_timings_ms: dict[str, float] | None = None,
+    stage_calls: dict[str, int] | None = None,
+    attempts: int | None = None,
+    resumed_frames: int | None = None,
 ) -> HandScanJobRecord:
     record = read_job_record(jobs_dir, job_id)
     if record is None:
@@ -89,19 +168,160 @@ def update_job(
 
     if status is not None:
         record.status = status
-    if metadata_file is not None:
-        record.metadata_file = metadata_file
-    if glb_file is not None:
-        record.glb_file = glb_file
-    if error is not None:
-        record.error = error
-
+        if status in TERMINAL_STATUSES:
+            record.finished_at = utc_now()
+    _merge_job_fields(
+        record,
+        {
+            "frame_files": frame_files,
+            "metadata_file": metadata_file,
+            "glb_file": glb_file,
+            "glb_sha256": glb_sha256,
+            "error": error,
+            "frames_purged": frames_purged,
+            "frame_count": frame_count,
+            "stage_timings_ms": stage_timings_ms,
+            "stage_calls": stage_calls,
+            "attempts": attempts,
+            "resumed_frames": resumed_frames,
+        },
+    )
     record.updated_at = utc_now()
 
     write_job_record(jobs_dir, record)
+    if record.status in TERMINAL_STATUSES:
+        _unmark_unfinished(jobs_dir, job_id)
+    elif status in CLAIMABLE_STATUSES:
+        _mark_unfinished(jobs_dir, job_id)
     return record
 
 
+def last_upload_activity(jobs_dir: Path, record: HandScanJobRecord) -> float:
+    """When an ``uploading`` job last changed: its record, or the last frame to land."""
+
+    active_at = record.updated_at.timestamp()
+    try:
+        frames_dir = get_job_dir(jobs_dir, record.job_id) / "frames"
+        active_at = max(active_at, frames_dir.stat().st_mtime)
+    except FileNotFoundError:
+        pass
+    return active_at
+
+
+def find_unfinished_jobs(jobs_dir: Path, *, full_scan: bool = False) -> list[HandScanJobRecord]:
+    """Return jobs left ``queued`` or ``processing``, oldest first.
+
+    Jobs still ``uploading`` are not returned; they become claimable once finalized.
+
+    By default only the ``_queue`` index is consulted. ``full_scan`` walks every job
+    directory instead and rebuilds the index; it is meant for a one-off startup pass
+    over jobs written before the index existed.
+    """
+
+    if full_scan:
+        candidates = jobs_dir
+    else:
+        candidates = jobs_dir / QUEUE_DIRNAME
+
+    try:
+        entries = list(os.scandir(candidates))
+    except FileNotFoundError:
+        return []
+
+    records: list[HandScanJobRecord] = []
+    for entry in entries:
+        if entry.name in INDEX_DIRNAMES:
+            continue
+        try:
+            record = read_job_record(jobs_dir, entry.name)
+        except ValueError:
+            continue
+
+        if record is None or record.status not in CLAIMABLE_STATUSES:
+            if not full_scan:
+                _unmark_unfinished(jobs_dir, entry.name)
+            continue
+
+        if full_scan:
+            _mark_unfinished(jobs_dir, record.job_id)
+        records.append(record)
+
+    records.sort(key=lambda r: r.created_at)
+    return records
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when an uploaded frame exceeds its size budget while being streamed."""
+
+
+def write_frame_stream(
+    path: Path,
+    src: BinaryIO,
+    *,
+    max_bytes: int,
+    chunk_size: int = 256 * 1024,
+    hasher: hashlib._Hash | None = None,
+) -> int:
+    """Copy ``src`` to ``path`` in chunks, stopping as soon as ``max_bytes`` is exceeded.
+
+    Memory use is bounded by ``chunk_size``. The data is written to a temporary
+    sibling and renamed into place, so readers never see a partial frame. If
+    ``hasher`` is given it is fed every chunk as it is written.
+
+    Returns:
+        Number of bytes written.
+
+    Raises:
+        FrameTooLargeError: if the stream is larger than ``max_bytes``.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}{PARTIAL_SUFFIX}")
+
+    size = 0
+    try:
+        with tmp_path.open("wb") as f:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FrameTooLargeError(f"Frame exceeds {max_bytes} bytes")
+                f.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return size
+
+
+def get_frame_path(jobs_dir: Path, job_id: str, index: int, suffix: str) -> Path:
+    return get_job_dir(jobs_dir, job_id) / "frames" / f"{FRAME_PREFIX}{index:05d}{suffix}"
+
+
+def list_frame_files(jobs_dir: Path, job_id: str) -> dict[int, Path]:
+    """Return the fully written frames of a job keyed by frame index."""
+
+    frames: dict[int, Path] = {}
+    try:
+        entries = list(os.scandir(get_job_dir(jobs_dir, job_id) / "frames"))
+    except FileNotFoundError:
+        return frames
+
+    for entry in entries:
+        name = entry.name
+        if not name.startswith(FRAME_PREFIX) or name.endswith(PARTIAL_SUFFIX):
+            continue
+        index = name[len(FRAME_PREFIX) :].split(".", 1)[0]
+        if index.isdigit():
+            frames[int(index)] = Path(entry.path)
+    return frames
+
+
 def write_metadata(jobs_dir: Path, job_id: str, metadata_json: str) -> str:
     job_dir = get_job_dir(jobs_dir, job_id)
     job_dir.mkdir(parents=True, exist_ok=True)
@@ -135,15 +355,193 @@ def write_glb(jobs_dir: Path, job_id: str, glb: bytes) -> str:
     return glb_path.name
 
 
-def read_glb(jobs_dir: Path, job_id: str) -> bytes | None:
-    record = read_job_record(jobs_dir, job_id)
-    if record is None or record.glb_file is None:
+def get_glb_path(jobs_dir: Path, record: HandScanJobRecord) -> Path | None:
+    if record.glb_file is None:
         return None
 
     path = Path(record.glb_file)
     if not path.is_absolute():
-        path = get_job_dir(jobs_dir, job_id) / path
+        path = get_job_dir(jobs_dir, record.job_id) / path
     if not path.exists():
         return None
+    return path
+
+
+def read_glb(jobs_dir: Path, job_id: str) -> bytes | None:
+    record = read_job_record(jobs_dir, job_id)
+    if record is None:
+        return None
+
+    path = get_glb_path(jobs_dir, record)
+    return path.read_bytes() if path is not None else None
+
+
+def glb_digest(jobs_dir: Path, record: HandScanJobRecord) -> str | None:
+    """Return the GLB's SHA-256, hashing (and recording) it for older jobs."""
+
+    if record.glb_sha256 is not None:
+        return record.glb_sha256
+
+    path = get_glb_path(jobs_dir, record)
+    if path is None:
+        return None
+    with path.open("rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    update_job(jobs_dir, record.job_id, glb_sha256=digest)
+    return digest
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _tree_size(Path(entry.path))
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+def job_dir_size(jobs_dir: Path, job_id: str) -> int:
+    """Return the number of bytes used on disk by a job directory."""
+
+    return _tree_size(get_job_dir(jobs_dir, job_id))
+
+
+def purge_frames(jobs_dir: Path, job_id: str) -> int:
+    """Delete the raw uploaded frames (or source clip/archive) of a job.
+
+    Returns:
+        Number of bytes reclaimed.
+    """
+
+    frames_dir = get_job_dir(jobs_dir, job_id) / "frames"
+    reclaimed = _tree_size(frames_dir)
+    shutil.rmtree(frames_dir, ignore_errors=True)
+
+    record = read_job_record(jobs_dir, job_id)
+    if record is None:
+        return reclaimed
+
+    if record.source_file is not None:
+        source_path = get_job_dir(jobs_dir, job_id) / record.source_file
+        try:
+            reclaimed += source_path.stat().st_size
+            source_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    update_job(jobs_dir, job_id, frames_purged=True)
+    return reclaimed
+
+
+def delete_job(jobs_dir: Path, job_id: str) -> int:
+    """Delete a job directory and everything in it.
+
+    Returns:
+        Number of bytes reclaimed.
+    """
+
+    job_dir = get_job_dir(jobs_dir, job_id)
+    try:
+        record = read_job_record(jobs_dir, job_id)
+    except ValueError:
+        record = None
+    if record is not None and record.dedup_key is not None:
+        release_dedup_key(jobs_dir, record.dedup_key, job_id)
+
+    reclaimed = _tree_size(job_dir)
+    shutil.rmtree(job_dir, ignore_errors=True)
+    return reclaimed
+
+
+def _dedup_path(jobs_dir: Path, key: str) -> Path:
+    return jobs_dir / DEDUP_DIRNAME / key
+
+
+def _read_dedup_owner(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
 
-    return path.read_bytes()
+def claim_dedup_key(jobs_dir: Path, key: str, job_id: str) -> HandScanJobRecord | None:
+    """Register ``job_id`` as the owner of dedup ``key``.
+
+    A key is owned by the first live job submitted with it. Jobs that failed or were
+    deleted by retention give up ownership, so resubmitting after a failure runs the
+    pipeline again.
+
+    Returns:
+        The existing job's record if another live job owns ``key``, else ``None``
+        (``job_id`` now owns it).
+    """
+
+    path = _dedup_path(jobs_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    while True:
+        if _link_dedup_owner(path, key, job_id):
+            return None
+
+        owner = _read_dedup_owner(path)
+        if owner is None:
+            # Released between our claim attempt and the read; try again.
+            continue
+        if owner == job_id:
+            return None
+
+        try:
+            existing = read_job_record(jobs_dir, owner)
+        except ValueError:
+            existing = None
+        if existing is not None and existing.status != "failed":
+            return existing
+
+        _evict_stale_dedup_owner(path, key, owner)
+
+
+def _link_dedup_owner(path: Path, key: str, job_id: str) -> bool:
+    # Publish a complete entry with link(), which fails if the key is taken, so
+    # readers never observe a half-written owner.
+    tmp_path = path.with_name(f"{key}.{uuid4().hex}.tmp")
+    tmp_path.write_text(job_id, encoding="utf-8")
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        return False
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return True
+
+
+def _evict_stale_dedup_owner(path: Path, key: str, owner: str) -> None:
+    # Move the entry aside (only one contender wins); the caller then re-claims.
+    stale = path.with_name(f"{key}.stale.{uuid4().hex}")
+    try:
+        path.rename(stale)
+    except FileNotFoundError:
+        return
+    if _read_dedup_owner(stale) != owner:
+        # Replaced by a fresh claim between our read and the rename; put it back.
+        try:
+            os.link(stale, path)
+        except FileExistsError:
+            pass
+    stale.unlink(missing_ok=True)
+
+
+def release_dedup_key(jobs_dir: Path, key: str, job_id: str) -> None:
+    """Drop dedup ``key`` if it still points at ``job_id``."""
+
+    path = _dedup_path(jobs_dir, key)
+    if _read_dedup_owner(path) == job_id:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,90 @@
+"""Job claiming loop for API processes and standalone workers.
+
+Every API process runs :func:`run_claim_loop` in the background so jobs abandoned by
+a dead worker are taken over once their lease expires. Extra workers without an HTTP
+server can share the same jobs directory::
+
+    python -m app.jobs.worker
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.hands.detector import LandmarkDetector
+from app.services.hands.job_processor import resume_unfinished_jobs
+
+logger = logging.getLogger(__name__)
+
+
+def claim_pending_jobs(
+    jobs_dir: Path, detector: LandmarkDetector, *, full_scan: bool = False
+) -> list[str]:
+    """Run one claiming pass with the lease settings from ``settings``."""
+
+    return resume_unfinished_jobs(
+        jobs_dir=jobs_dir,
+        detector=detector,
+        max_attempts=settings.jobs_max_attempts,
+        checkpoint_fsync=settings.jobs_checkpoint_fsync,
+        lease_ttl_seconds=settings.jobs_lease_ttl_seconds,
+        heartbeat_seconds=settings.jobs_lease_heartbeat_seconds,
+        full_scan=full_scan,
+        max_frames=settings.max_scan_frames,
+        max_frame_bytes=settings.max_image_size_mb * 1024 * 1024,
+    )
+
+
+async def run_claim_loop(
+    jobs_dir: Path,
+    detector: LandmarkDetector,
+    *,
+    interval_seconds: float,
+    full_scan_first: bool = True,
+) -> None:
+    """Claim and process pending jobs forever, off the event loop."""
+
+    full_scan = full_scan_first
+    while True:
+        try:
+            processed = await run_in_threadpool(
+                claim_pending_jobs, jobs_dir, detector, full_scan=full_scan
+            )
+        except Exception:  # pragma: no cover
+            logger.exception("Job claiming pass failed")
+        else:
+            full_scan = False
+            if processed:
+                logger.info("Processed %d claimed job(s)", len(processed))
+        await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Process hand scan jobs from a jobs dir")
+    parser.add_argument("--jobs-dir", default=settings.jobs_dir)
+    parser.add_argument("--poll-seconds", type=float, default=settings.jobs_worker_poll_seconds)
+    args = parser.parse_args()
+
+    from app.routers.hands import get_landmark_detector
+
+    logging.basicConfig(level=logging.INFO)
+    jobs_dir = Path(args.jobs_dir)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    detector = get_landmark_detector()
+
+    full_scan = True
+    while True:
+        claim_pending_jobs(jobs_dir, detector, full_scan=full_scan)
+        full_scan = False
+        time.sleep(args.poll_seconds)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
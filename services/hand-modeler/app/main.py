@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+from contextlib import suppress
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -9,13 +11,23 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers import health, hand_detection, hands
 from app.config import settings
-from app.db.session import init_db
+from app.db.delivery_marks import flush_delivery_marks, run_delivery_mark_flush_loop
+from app.db.retention import (
+    SharingRetention,
+    SharingRetentionPolicy,
+    run_sharing_retention_loop,
+)
+from app.db.session import AsyncSessionLocal, SessionLocal, dispose_engines, init_db
+from app.events import Broker, get_broker
+from app.jobs.retention import run_retention_loop
+from app.jobs.worker import run_claim_loop
 from app.routers import hand_detection, hands, health
 from app.routers.hand_models import router as hand_models_router
+from app.routers.hands import get_landmark_detector
 from app.routers.sessions import router as sessions_router
 from app.routers.storage import router as storage_router
 from app.routers.users import router as users_router
-from app.storage import ensure_storage_dirs
+from app.storage import ensure_storage_dirs, get_storage_backend
 from app.routers import health, hand_detection, hand_scan
 
 app = FastAPI(
@@ -37,6 +49,61 @@ async def on_startup() -> None:
 
     init_db()
 
+    jobs_dir = Path(settings.jobs_dir)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    app.state.retention_task = asyncio.create_task(
+        run_retention_loop(jobs_dir, interval_seconds=settings.jobs_gc_interval_seconds)
+    )
+
+    # Used by the background tasks; built from the factories, not dependency overrides.
+    app.state.storage_backend = get_storage_backend()
+    app.state.broker = get_broker()
+
+    sharing_retention = SharingRetention(
+        session_factory=SessionLocal,
+        backend=app.state.storage_backend,
+        policy=SharingRetentionPolicy.from_settings(),
+    )
+    app.state.sharing_retention_task = asyncio.create_task(
+        run_sharing_retention_loop(
+            sharing_retention, interval_seconds=settings.sharing_gc_interval_seconds
+        )
+    )
+
+    if settings.delivery_marks_flush_interval_seconds > 0:
+        app.state.delivery_marks_task = asyncio.create_task(
+            run_delivery_mark_flush_loop(
+                AsyncSessionLocal, interval_seconds=settings.delivery_marks_flush_interval_seconds
+            )
+        )
+
+    if settings.jobs_resume_on_startup:
+        app.state.claim_task = asyncio.create_task(
+            run_claim_loop(
+                jobs_dir,
+                get_landmark_detector(),
+                interval_seconds=settings.jobs_worker_poll_seconds,
+            )
+        )
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """Stop background tasks, write buffered delivery marks and close DB connections."""
+
+    for name in ("retention_task", "sharing_retention_task", "claim_task", "delivery_marks_task"):
+        task: asyncio.Task[None] | None = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    broker: Broker | None = getattr(app.state, "broker", None)
+    if broker is not None:
+        broker.close()
+    await flush_delivery_marks(AsyncSessionLocal)
+    await dispose_engines()
+
 
 # Configure CORS
 app.add_middleware(
@@ -1,4 +1,3 @@
-"""Hand scan models."""
 """Hand scan and meshing API models."""
 
 from __future__ import annotations
@@ -78,6 +77,25 @@ class HandScanCreateResponse(BaseModel):
 
     job_id: str
     status: str
+    duplicate: bool = Field(
+        default=False,
+        description="True if an identical submission already exists and was returned",
+    )
+
+
+class HandScanUploadStatusResponse(BaseModel):
+    """State of a resumable scan upload session."""
+
+    job_id: str
+    status: str
+    received_frames: list[int] = Field(
+        default_factory=list,
+        description="Frame indices that have been fully received",
+    )
+    detected_frames: int = Field(
+        default=0,
+        description="Frames whose landmarks were already detected during the upload",
+    )
 
 
 class HandScanStatusResponse(BaseModel):
@@ -94,5 +112,9 @@ class HandScanStatusResponse(BaseModel):
         default=None,
         description="Base64-encoded binary glTF (GLB) if job is completed",
     )
+    glb_url: str | None = Field(
+        default=None,
+        description="URL of the cacheable binary GLB download if job is completed",
+    )
 
     debug: dict[str, Any] | None = None
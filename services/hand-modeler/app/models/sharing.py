@@ -39,6 +39,7 @@ class SessionResponse(BaseModel):
     partner_user_id: str | None
     created_at: datetime
     paired_at: datetime | None
+    latest_hand_model_id: str | None = None
 
 
 class HandModelBase64UploadRequest(BaseModel):
@@ -67,3 +68,12 @@ class PollResponse(BaseModel):
     session: SessionResponse
     latest_model: HandModelResponse | None
     has_new_model: bool
+
+
+class HandModelListResponse(BaseModel):
+    """A page of hand models, newest first."""
+
+    items: list[HandModelResponse]
+    next_cursor: str | None = Field(
+        default=None, description="Pass as `cursor` for the next page; null on the last page"
+    )
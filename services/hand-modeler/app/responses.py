@@ -0,0 +1,192 @@
+"""Conditional and ranged file responses.
+
+Starlette's ``FileResponse`` always sends the whole file. :func:`cacheable_file_response`
+adds what immutable downloads need on top of it: a strong ``ETag``, ``304 Not Modified``
+for ``If-None-Match`` and single-range ``206 Partial Content`` for ``Range`` requests
+(honouring ``If-Range``). The body is read in chunks off the event loop. Servers
+that advertise the ASGI ``zerocopysend`` extension are handed the open file instead;
+uvicorn does not, so under it every response takes the read loop.
+"""
+
+from __future__ import annotations
+
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import Final
+
+import anyio
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE_CACHE_CONTROL: Final[str] = "private, max-age=31536000, immutable"
+
+_CHUNK_SIZE: Final[int] = 64 * 1024
+
+_ZEROCOPY_EXTENSION: Final[str] = "http.response.zerocopysend"
+
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def weak_etag(digest: str) -> str:
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of ``If-None-Match`` against ``etag`` (RFC 9110 §13.1.2)."""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+    )
+
+
+def parse_range(range_header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)`` offsets.
+
+    Returns ``None`` when the whole file should be sent (no header, a malformed
+    header, or a multi-range request, which we answer with the full body).
+
+    Raises:
+        HTTPException: 416 if the range cannot be satisfied.
+    """
+
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the final N bytes.
+            start = max(0, size - int(last))
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def requested_range(request: Request, *, etag: str, size: int) -> tuple[int, int] | None:
+    """The single range ``request`` asks for, or ``None`` to send the whole body.
+
+    A ``Range`` is ignored when ``If-Range`` names a different representation.
+
+    Raises:
+        HTTPException: 416 if the range cannot be satisfied.
+    """
+
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != etag:
+        return None
+    return parse_range(request.headers.get("range"), size)
+
+
+class _FileSliceResponse(Response):
+    """Send ``[start, end]`` of a file (all of it for a 200) without loading it."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        byte_range: tuple[int, int] | None,
+        size: int,
+        media_type: str,
+        headers: dict[str, str],
+    ) -> None:
+        status_code = 200 if byte_range is None else 206
+        super().__init__(status_code=status_code, media_type=media_type, headers=headers)
+        self.path = path
+        self.start, self.end = byte_range or (0, size - 1)
+        if byte_range is not None:
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        remaining = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD" or remaining <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if _ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with self.path.open("rb") as f:
+                await send(
+                    {
+                        "type": _ZEROCOPY_EXTENSION,
+                        "file": f,
+                        "offset": self.start,
+                        "count": remaining,
+                        "more_body": False,
+                    }
+                )
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": remaining > 0}
+                )
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def cacheable_file_response(
+    request: Request,
+    path: Path,
+    *,
+    etag: str,
+    media_type: str,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL,
+    filename: str | None = None,
+) -> Response:
+    """Serve ``path`` with ``etag``, answering conditional and range requests."""
+
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    stat = os.stat(path)
+    headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+    if filename is not None:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return _FileSliceResponse(
+        path,
+        byte_range=requested_range(request, etag=etag, size=stat.st_size),
+        size=stat.st_size,
+        media_type=media_type,
+        headers=headers,
+    )
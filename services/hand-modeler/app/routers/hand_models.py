@@ -2,40 +2,101 @@
 
 from __future__ import annotations
 
+import logging
 import secrets
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, UploadFile
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.db.models import HandModel, Session as PairSession, User
-from app.db.session import get_db
-from app.models.sharing import HandModelBase64UploadRequest, HandModelResponse
-from app.storage import generate_signed_download_url, save_base64_bytes, save_upload_file
+from app.db.delivery_marks import DeliveryField, delivery_marks
+from app.db.membership import membership_cache
+from app.db.models import HandModel, Session as PairSession
+from app.db.queries import (
+    HandModelCursor,
+    HandModelLookup,
+    HandModelPage,
+    advance_latest_hand_model,
+    hand_model_with_session,
+    session_exists,
+    session_for_user,
+    session_hand_models,
+    session_with_latest_model,
+    user_hand_models,
+)
+from app.db.session import get_db, get_read_db
+from app.events import Broker, BrokerError, SessionEvent, get_broker
+from app.models.sharing import (
+    HandModelBase64UploadRequest,
+    HandModelListResponse,
+    HandModelResponse,
+)
+from app.storage import (
+    StorageBackend,
+    generate_signed_download_url,
+    generate_signed_download_urls,
+    get_storage_backend,
+    save_staged_object,
+    save_upload_file,
+    stage_base64_json,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+_PAGE_SIZE_DEFAULT = 50
+_PAGE_SIZE_MAX = 200
+
+_hand_model_list = TypeAdapter(list[HandModelResponse])
+
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _get_user_or_404(db: Session, user_id: str) -> User:
-    user = db.execute(select(User).where(User.id == user_id)).scalars().first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def _ensure_member_or_404(db: AsyncSession, session_id: str, user_id: str) -> None:
+    """Check that ``user_id`` exists and belongs to the session.
 
+    Answered from the membership cache when it knows both; anything else (including
+    a refusal) is checked against the database. A cached answer may outlive a session
+    deleted by another process, so uploads insert through :func:`_commit_hand_model`.
+    """
 
-def _get_session_or_404(db: Session, session_id: str) -> PairSession:
-    session = (
-        db.execute(select(PairSession).where(PairSession.id == session_id)).scalars().first()
-    )
+    if membership_cache.user_exists(user_id) and membership_cache.is_member(session_id, user_id):
+        return
+    user_exists, session = await session_for_user(db, session_id=session_id, user_id=user_id)
+    if not user_exists:
+        raise HTTPException(status_code=404, detail="User not found")
+    membership_cache.remember_user(user_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    membership_cache.remember_session(
+        session.id,
+        inviter_user_id=session.inviter_user_id,
+        partner_user_id=session.partner_user_id,
+    )
+    _ensure_user_in_session(session, user_id)
+
+
+async def _get_hand_model_or_404(
+    db: AsyncSession, hand_model_id: str, *, user_id: str | None = None
+) -> tuple[HandModel, PairSession]:
+    lookup = await hand_model_with_session(db, hand_model_id, user_id=user_id)
+    return _checked_lookup(lookup)
+
+
+def _checked_lookup(lookup: HandModelLookup | None) -> tuple[HandModel, PairSession]:
+    if lookup is None:
+        raise HTTPException(status_code=404, detail="Hand model not found")
+    if lookup.session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if not lookup.user_exists:
+        raise HTTPException(status_code=404, detail="User not found")
+    return lookup.model, lookup.session
 
 
 def _ensure_user_in_session(session: PairSession, user_id: str) -> None:
@@ -43,6 +104,90 @@ def _ensure_user_in_session(session: PairSession, user_id: str) -> None:
         raise HTTPException(status_code=403, detail="User is not part of this session")
 
 
+def _parse_cursor(cursor: str | None) -> HandModelCursor | None:
+    if cursor is None:
+        return None
+    try:
+        return HandModelCursor.decode(cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+def _hand_model_list_response(
+    request: Request, page: HandModelPage, storage: StorageBackend
+) -> HandModelListResponse:
+    """Sign each distinct key once and validate the whole page in one pass."""
+
+    urls = generate_signed_download_urls(
+        request=request, keys=[row["storage_key"] for row in page.rows], backend=storage
+    )
+    items = _hand_model_list.validate_python(
+        [{**row, "download_url": urls[row["storage_key"]]} for row in page.rows]
+    )
+    for item in items:
+        delivery_marks.overlay(item)
+    next_cursor = page.next_cursor.encode() if page.next_cursor is not None else None
+    return HandModelListResponse.model_construct(items=items, next_cursor=next_cursor)
+
+
+async def _announce_upload(broker: Broker, model: HandModelResponse) -> None:
+    """Tell the session's subscribers about a committed upload.
+
+    Best effort: the upload has succeeded either way, and clients can still poll.
+    """
+
+    event = SessionEvent(
+        session_id=model.session_id,
+        type="hand_model",
+        data={"hand_model": model.model_dump(mode="json", exclude={"download_url"})},
+    )
+    try:
+        await broker.publish(event)
+    except BrokerError:
+        logger.warning("Could not announce hand model %s", model.id, exc_info=True)
+
+
+async def _with_delivery_marks(
+    db: AsyncSession, model: HandModel, *, retrieve: bool = False, confirm: bool = False
+) -> HandModelResponse:
+    """Respond with ``model`` as it will be once buffered delivery marks are written.
+
+    ``retrieve`` and ``confirm`` record new marks (kept only where the column is
+    unset). ``db`` must be a primary session: it flushes the buffer when full.
+    """
+
+    response = HandModelResponse.model_validate(model)
+    now = _utcnow()
+    fields: list[tuple[DeliveryField, bool]] = [
+        ("retrieved_at", retrieve),
+        ("confirmed_at", confirm),
+    ]
+    for field, record in fields:
+        if record and getattr(response, field) is None:
+            delivery_marks.mark(field, model.id, now)
+    delivery_marks.overlay(response)
+    if delivery_marks.should_flush():
+        await delivery_marks.flush(db)
+    return response
+
+
+async def _commit_hand_model(db: AsyncSession, model: HandModel) -> None:
+    """Insert ``model`` and advance its session's latest model, in one transaction.
+
+    If the session is gone (deleted after the membership check), roll back the row
+    and its blob reference rather than commit a model without a session.
+    """
+
+    db.add(model)
+    advanced = await db.execute(advance_latest_hand_model(model))
+    # No row updated: the session has a newer model, or no longer exists.
+    if advanced.rowcount == 0 and not await session_exists(db, model.session_id):
+        await db.rollback()
+        membership_cache.invalidate_sessions([model.session_id])
+        raise HTTPException(status_code=404, detail="Session not found")
+    await db.commit()
+
+
 def _max_model_size_bytes() -> int:
     return settings.max_model_size_mb * 1024 * 1024
 
@@ -53,72 +198,104 @@ async def upload_hand_model(
     session_id: str,
     owner_user_id: str = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage_backend),
+    broker: Broker = Depends(get_broker),
 ) -> HandModelResponse:
     """Upload a GLB file for a pairing session."""
 
-    _get_user_or_404(db, owner_user_id)
-    session = _get_session_or_404(db, session_id)
-    _ensure_user_in_session(session, owner_user_id)
+    await _ensure_member_or_404(db, session_id, owner_user_id)
 
-    hand_model_id = str(secrets.token_hex(16))
-    storage_key = f"hand-models/{session_id}/{hand_model_id}.glb"
-
-    size = save_upload_file(key=storage_key, upload=file, max_size_bytes=_max_model_size_bytes())
+    try:
+        blob = await save_upload_file(
+            db=db, upload=file, max_size_bytes=_max_model_size_bytes(), backend=storage
+        )
+    finally:
+        await file.close()
 
     content_type = file.content_type or "model/gltf-binary"
 
     model = HandModel(
-        id=hand_model_id,
+        id=str(secrets.token_hex(16)),
         session_id=session_id,
         owner_user_id=owner_user_id,
-        storage_key=storage_key,
-        file_size_bytes=size,
+        storage_key=blob.key,
+        file_size_bytes=blob.size_bytes,
         content_type=content_type,
         created_at=_utcnow(),
     )
-    db.add(model)
-    db.commit()
+    await _commit_hand_model(db, model)
 
     response = HandModelResponse.model_validate(model)
-    response.download_url = generate_signed_download_url(request=request, key=storage_key)
+    await _announce_upload(broker, response)
+    response.download_url = generate_signed_download_url(
+        request=request, key=blob.key, backend=storage
+    )
     return response
 
 
-@router.post("/sessions/{session_id}/hand-models/base64", response_model=HandModelResponse)
+@router.post(
+    "/sessions/{session_id}/hand-models/base64",
+    response_model=HandModelResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": HandModelBase64UploadRequest.model_json_schema()}
+            },
+        }
+    },
+)
 async def upload_hand_model_base64(
     request: Request,
     session_id: str,
-    payload: HandModelBase64UploadRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage_backend),
+    broker: Broker = Depends(get_broker),
 ) -> HandModelResponse:
-    """Upload a GLB file in base64 form (mobile-friendly fallback)."""
-
-    _get_user_or_404(db, payload.owner_user_id)
-    session = _get_session_or_404(db, session_id)
-    _ensure_user_in_session(session, payload.owner_user_id)
+    """Upload a GLB file in base64 form (mobile-friendly fallback).
 
-    hand_model_id = str(secrets.token_hex(16))
-    storage_key = f"hand-models/{session_id}/{hand_model_id}.glb"
+    The body (a :class:`HandModelBase64UploadRequest`) is decoded as it streams in,
+    so the upload is never held in memory.
+    """
 
-    size = save_base64_bytes(
-        key=storage_key, data_base64=payload.glb_base64, max_size_bytes=_max_model_size_bytes()
+    staged, fields = await stage_base64_json(
+        request.stream(),
+        field="glb_base64",
+        max_size_bytes=_max_model_size_bytes(),
+        backend=storage,
     )
+    try:
+        try:
+            # The payload has already been staged; validate the remaining fields.
+            payload = HandModelBase64UploadRequest.model_validate({**fields, "glb_base64": ""})
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors()) from exc
+
+        await _ensure_member_or_404(db, session_id, payload.owner_user_id)
+
+        blob = await save_staged_object(
+            db=db, staged=staged, content_type=payload.content_type, backend=storage
+        )
+    finally:
+        staged.path.unlink(missing_ok=True)
 
     model = HandModel(
-        id=hand_model_id,
+        id=str(secrets.token_hex(16)),
         session_id=session_id,
         owner_user_id=payload.owner_user_id,
-        storage_key=storage_key,
-        file_size_bytes=size,
+        storage_key=blob.key,
+        file_size_bytes=blob.size_bytes,
         content_type=payload.content_type,
         created_at=_utcnow(),
     )
-    db.add(model)
-    db.commit()
+    await _commit_hand_model(db, model)
 
     response = HandModelResponse.model_validate(model)
-    response.download_url = generate_signed_download_url(request=request, key=storage_key)
+    await _announce_upload(broker, response)
+    response.download_url = generate_signed_download_url(
+        request=request, key=blob.key, backend=storage
+    )
     return response
 
 
@@ -127,55 +304,55 @@ async def get_hand_model(
     request: Request,
     hand_model_id: str,
     viewer_user_id: str | None = Query(default=None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+    storage: StorageBackend = Depends(get_storage_backend),
 ) -> HandModelResponse:
     """Get hand model metadata.
 
-    If the viewer is the session partner, this will mark the model as retrieved.
+    Reads go to the read replica when one is configured. If the viewer is the
+    session partner, this marks the model as retrieved; the mark is written to the
+    primary in a later batch (``app/db/delivery_marks.py``).
     """
 
-    model = db.execute(select(HandModel).where(HandModel.id == hand_model_id)).scalar_one_or_none()
-    if model is None:
-        raise HTTPException(status_code=404, detail="Hand model not found")
-
-    session = _get_session_or_404(db, model.session_id)
+    lookup = await hand_model_with_session(read_db, hand_model_id, user_id=viewer_user_id)
+    if lookup is None and read_db.bind is not db.bind:
+        # A model that was just uploaded may not have reached the replica yet.
+        lookup = await hand_model_with_session(db, hand_model_id, user_id=viewer_user_id)
+    model, session = _checked_lookup(lookup)
 
     if viewer_user_id is not None:
-        _get_user_or_404(db, viewer_user_id)
         _ensure_user_in_session(session, viewer_user_id)
-        if session.partner_user_id == viewer_user_id and model.retrieved_at is None:
-            model.retrieved_at = _utcnow()
-            db.add(model)
-            db.commit()
 
-    response = HandModelResponse.model_validate(model)
-    response.download_url = generate_signed_download_url(request=request, key=model.storage_key)
+    retrieve = viewer_user_id is not None and session.partner_user_id == viewer_user_id
+    response = await _with_delivery_marks(db, model, retrieve=retrieve)
+    response.download_url = generate_signed_download_url(
+        request=request, key=model.storage_key, backend=storage
+    )
     return response
 
 
 @router.get("/sessions/{session_id}/hand-models/latest", response_model=HandModelResponse)
 async def get_latest_hand_model(
-    request: Request, session_id: str, db: Session = Depends(get_db)
+    request: Request,
+    session_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    storage: StorageBackend = Depends(get_storage_backend),
 ) -> HandModelResponse:
     """Get the latest uploaded hand model for a session."""
 
-    _get_session_or_404(db, session_id)
+    found = await session_with_latest_model(db, session_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Session not found")
 
-    model = (
-        db.execute(
-            select(HandModel)
-            .where(HandModel.session_id == session_id)
-            .order_by(HandModel.created_at.desc())
-            .limit(1)
-        )
-        .scalars()
-        .first()
-    )
+    _, model = found
     if model is None:
         raise HTTPException(status_code=404, detail="No models uploaded for this session")
 
-    response = HandModelResponse.model_validate(model)
-    response.download_url = generate_signed_download_url(request=request, key=model.storage_key)
+    response = delivery_marks.overlay(HandModelResponse.model_validate(model))
+    response.download_url = generate_signed_download_url(
+        request=request, key=model.storage_key, backend=storage
+    )
     return response
 
 
@@ -184,25 +361,54 @@ async def confirm_delivery(
     request: Request,
     hand_model_id: str,
     partner_user_id: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage_backend),
 ) -> HandModelResponse:
     """Confirm delivery after the partner has successfully downloaded/processed the model."""
 
-    model = db.execute(select(HandModel).where(HandModel.id == hand_model_id)).scalar_one_or_none()
-    if model is None:
-        raise HTTPException(status_code=404, detail="Hand model not found")
-
-    session = _get_session_or_404(db, model.session_id)
-
-    _get_user_or_404(db, partner_user_id)
+    model, session = await _get_hand_model_or_404(db, hand_model_id, user_id=partner_user_id)
     if session.partner_user_id != partner_user_id:
         raise HTTPException(status_code=403, detail="Only the partner can confirm delivery")
 
-    if model.confirmed_at is None:
-        model.confirmed_at = _utcnow()
-        db.add(model)
-        db.commit()
-
-    response = HandModelResponse.model_validate(model)
-    response.download_url = generate_signed_download_url(request=request, key=model.storage_key)
+    response = await _with_delivery_marks(db, model, confirm=True)
+    response.download_url = generate_signed_download_url(
+        request=request, key=model.storage_key, backend=storage
+    )
     return response
+
+
+@router.get("/sessions/{session_id}/hand-models", response_model=HandModelListResponse)
+async def list_session_hand_models(
+    request: Request,
+    session_id: str,
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=_PAGE_SIZE_DEFAULT, ge=1, le=_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_read_db),
+    storage: StorageBackend = Depends(get_storage_backend),
+) -> HandModelListResponse:
+    """List a session's hand models, newest first.
+
+    Pass ``next_cursor`` back as ``cursor`` for the next page.
+    """
+
+    page = await session_hand_models(db, session_id, after=_parse_cursor(cursor), limit=limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _hand_model_list_response(request, page, storage)
+
+
+@router.get("/users/{user_id}/hand-models", response_model=HandModelListResponse)
+async def list_user_hand_models(
+    request: Request,
+    user_id: str,
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=_PAGE_SIZE_DEFAULT, ge=1, le=_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_read_db),
+    storage: StorageBackend = Depends(get_storage_backend),
+) -> HandModelListResponse:
+    """List the hand models a user uploaded, across sessions, newest first."""
+
+    page = await user_hand_models(db, user_id, after=_parse_cursor(cursor), limit=limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return _hand_model_list_response(request, page, storage)
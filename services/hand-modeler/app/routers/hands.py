@@ -3,24 +3,49 @@
 from __future__ import annotations
 
 import base64
+import hashlib
+import shutil
 from pathlib import Path
+from typing import Any, Final
 from uuid import uuid4
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+)
+from fastapi import Path as PathParam
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
 
 from app.config import settings
 from app.jobs import store
+from app.jobs.checkpoints import load_checkpoints
+from app.jobs.leases import JobLease
+from app.jobs.retention import get_job_retention
 from app.models.hand_scan import (
     HandMeshMetadata,
     HandScanCreateResponse,
     HandScanStatusResponse,
+    HandScanUploadStatusResponse,
 )
+from app.responses import cacheable_file_response, strong_etag
 from app.services.hands.detector import (
     LandmarkDetector,
     MediapipeHandsDetector,
     UnavailableLandmarkDetector,
 )
-from app.services.hands.job_processor import process_hand_scan_job
+from app.services.hands.frame_sources import detect_source_kind
+from app.services.hands.job_processor import detect_landed_frames, process_hand_scan_job
+from app.services.hands.timing import stage_histograms
 
 router = APIRouter()
 
@@ -41,63 +66,414 @@ def get_landmark_detector() -> LandmarkDetector:
         )
 
 
+def _frame_filename(index: int, frame: UploadFile) -> str:
+    suffix = Path(frame.filename or "frame").suffix or ".bin"
+    return f"{store.FRAME_PREFIX}{index:05d}{suffix}"
+
+
+async def _ingest_frames(
+    frames: list[UploadFile], frames_dir: Path, scan_hash: hashlib._Hash
+) -> list[Path] | None:
+    """Stream uploaded frames to disk on the threadpool.
+
+    Each frame is copied in ``upload_chunk_size_kb`` chunks, so memory stays bounded
+    by the chunk size and disk writes never block the event loop. The per-frame
+    (``max_image_size_mb``) and per-scan (``max_scan_upload_mb``) limits are enforced
+    while streaming. Each frame is hashed as it is written and its digest is fed to
+    ``scan_hash`` in order.
+
+    Returns:
+        The written frame paths, or ``None`` if a size limit was exceeded.
+    """
+
+    max_frame_bytes = settings.max_image_size_mb * 1024 * 1024
+    remaining_bytes = settings.max_scan_upload_mb * 1024 * 1024
+    chunk_size = settings.upload_chunk_size_kb * 1024
+
+    frame_paths: list[Path] = []
+    for idx, frame in enumerate(frames):
+        out_path = frames_dir / _frame_filename(idx, frame)
+        frame_hash = hashlib.sha256()
+        try:
+            written = await run_in_threadpool(
+                store.write_frame_stream,
+                out_path,
+                frame.file,
+                max_bytes=min(max_frame_bytes, remaining_bytes),
+                chunk_size=chunk_size,
+                hasher=frame_hash,
+            )
+        except store.FrameTooLargeError:
+            return None
+        finally:
+            await frame.close()
+
+        remaining_bytes -= written
+        scan_hash.update(frame_hash.digest())
+        frame_paths.append(out_path)
+
+    return frame_paths
+
+
+async def _ingest_source(upload: UploadFile, job_dir: Path, scan_hash: hashlib._Hash) -> str | None:
+    """Stream a single clip or archive to ``<job_dir>/source<suffix>``.
+
+    Frames are decoded from it lazily during processing instead of being written
+    out individually. The whole file is bounded by ``max_scan_upload_mb``.
+
+    Returns:
+        The source file name relative to the job dir, or ``None`` if too large.
+    """
+
+    name = f"source{Path(upload.filename or '').suffix.lower()}"
+    try:
+        await run_in_threadpool(
+            store.write_frame_stream,
+            job_dir / name,
+            upload.file,
+            max_bytes=settings.max_scan_upload_mb * 1024 * 1024,
+            chunk_size=settings.upload_chunk_size_kb * 1024,
+            hasher=scan_hash,
+        )
+    except store.FrameTooLargeError:
+        return None
+    finally:
+        await upload.close()
+    return name
+
+
+def _dedup_key(scan_hash: hashlib._Hash, idempotency_key: str | None) -> str:
+    if idempotency_key is None:
+        return scan_hash.hexdigest()
+    keyed = hashlib.sha256(scan_hash.digest())
+    keyed.update(idempotency_key.encode("utf-8"))
+    return keyed.hexdigest()
+
+
 @router.post("/hands/scan", response_model=HandScanCreateResponse)
 async def create_hand_scan(
     background_tasks: BackgroundTasks,
     frames: list[UploadFile] = File(...),
+    idempotency_key: str
+    | None = Header(
+        default=None,
+        max_length=255,
+        description="Optional client key; combined with the frame contents for dedup",
+    ),
     jobs_dir: Path = Depends(get_jobs_dir),
     detector: LandmarkDetector = Depends(get_landmark_detector),
 ) -> HandScanCreateResponse:
+    """Accept a scan for processing.
+
+    Submissions are deduplicated by a hash over the ordered frame contents (and the
+    ``Idempotency-Key`` header, if sent). Retrying a scan that is in flight or
+    completed returns the existing job instead of running the pipeline again.
+    """
+
     if not frames:
         raise HTTPException(status_code=400, detail="At least one frame is required")
 
     job_id = str(uuid4())
     job_dir = store.get_job_dir(jobs_dir, job_id)
-    frames_dir = job_dir / "frames"
-    frames_dir.mkdir(parents=True, exist_ok=True)
 
-    frame_paths: list[Path] = []
-    for idx, frame in enumerate(frames):
-        suffix = Path(frame.filename or "frame").suffix or ".bin"
-        out_path = frames_dir / f"frame_{idx:05d}{suffix}"
-        out_path.write_bytes(await frame.read())
-        frame_paths.append(out_path)
+    source_kind = (
+        detect_source_kind(frames[0].filename, frames[0].content_type) if len(frames) == 1 else None
+    )
+    scan_hash = hashlib.sha256()
+    if source_kind is not None:
+        scan_hash.update(f"source:{source_kind}:".encode("ascii"))
+        source_file = await _ingest_source(frames[0], job_dir, scan_hash)
+        if source_file is None:
+            await run_in_threadpool(shutil.rmtree, job_dir, True)
+            raise HTTPException(status_code=413, detail="Scan upload too large")
+        frame_paths: list[Path] = []
+    else:
+        scan_hash.update(b"frames:")
+        source_file = None
+        ingested = await _ingest_frames(frames, job_dir / "frames", scan_hash)
+        if ingested is None:
+            await run_in_threadpool(shutil.rmtree, job_dir, True)
+            raise HTTPException(status_code=413, detail="Frame upload too large")
+        frame_paths = ingested
+
+    # Not claimable until it owns its dedup key, so a duplicate is never processed.
+    # Should the process die before it is queued, retention deletes it once idle.
+    dedup_key = _dedup_key(scan_hash, idempotency_key)
+    await run_in_threadpool(
+        store.create_job,
+        jobs_dir,
+        job_id,
+        frame_files=[str(p) for p in frame_paths],
+        status="uploading",
+        source_file=source_file,
+        source_kind=source_kind,
+        dedup_key=dedup_key,
+    )
+    get_job_retention(jobs_dir).on_upload_started(job_id)
+
+    # Claim the new job for this process before it is queued, so the claim loop of
+    # another worker never sees it unowned.
+    lease = await run_in_threadpool(
+        JobLease.try_acquire, jobs_dir, job_id, ttl_seconds=settings.jobs_lease_ttl_seconds
+    )
+    existing = await run_in_threadpool(store.claim_dedup_key, jobs_dir, dedup_key, job_id)
+    if existing is not None:
+        if lease is not None:
+            await run_in_threadpool(lease.release)
+        await run_in_threadpool(shutil.rmtree, job_dir, True)
+        return HandScanCreateResponse(
+            job_id=existing.job_id, status=existing.status, duplicate=True
+        )
+    await run_in_threadpool(store.update_job, jobs_dir, job_id, status="queued")
+
+    if lease is not None:
+        background_tasks.add_task(
+            process_hand_scan_job,
+            jobs_dir=jobs_dir,
+            job_id=job_id,
+            frame_paths=frame_paths,
+            detector=detector,
+            checkpoint_fsync=settings.jobs_checkpoint_fsync,
+            lease=lease,
+            heartbeat_seconds=settings.jobs_lease_heartbeat_seconds,
+            max_frames=settings.max_scan_frames,
+            max_frame_bytes=settings.max_image_size_mb * 1024 * 1024,
+        )
+
+    return HandScanCreateResponse(job_id=job_id, status="queued")
+
+
+@router.post("/hands/scan/uploads", response_model=HandScanUploadStatusResponse)
+async def create_hand_scan_upload(
+    jobs_dir: Path = Depends(get_jobs_dir),
+) -> HandScanUploadStatusResponse:
+    """Open a resumable upload session.
+
+    Frames are then sent one per request with ``PUT .../frames/{index}`` and the
+    session is closed with ``POST .../finalize``. A session left idle for
+    ``jobs_upload_ttl_seconds`` without being finalized is deleted.
+    """
+
+    job_id = str(uuid4())
+    await run_in_threadpool(store.create_job, jobs_dir, job_id, [], status="uploading")
+    get_job_retention(jobs_dir).on_upload_started(job_id)
+    return HandScanUploadStatusResponse(job_id=job_id, status="uploading")
+
+
+def _upload_status(jobs_dir: Path, record: store.HandScanJobRecord) -> HandScanUploadStatusResponse:
+    return HandScanUploadStatusResponse(
+        job_id=record.job_id,
+        status=record.status,
+        received_frames=sorted(store.list_frame_files(jobs_dir, record.job_id)),
+        detected_frames=len(load_checkpoints(jobs_dir, record.job_id)),
+    )
+
+
+def _received_bytes(frames: dict[int, Path]) -> int:
+    return sum(path.stat().st_size for path in frames.values())
+
+
+def _read_upload_record(jobs_dir: Path, job_id: str) -> store.HandScanJobRecord:
+    record = store.read_job_record(jobs_dir, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return record
+
 
-    store.create_job(jobs_dir, job_id, frame_files=[str(p) for p in frame_paths])
+@router.get("/hands/scan/uploads/{job_id}", response_model=HandScanUploadStatusResponse)
+async def get_hand_scan_upload(
+    job_id: str,
+    jobs_dir: Path = Depends(get_jobs_dir),
+) -> HandScanUploadStatusResponse:
+    """Report which frames have been received, so a client can resume an upload."""
+
+    record = await run_in_threadpool(_read_upload_record, jobs_dir, job_id)
+    return await run_in_threadpool(_upload_status, jobs_dir, record)
+
+
+@router.put(
+    "/hands/scan/uploads/{job_id}/frames/{index}",
+    response_model=HandScanUploadStatusResponse,
+)
+async def put_hand_scan_frame(
+    background_tasks: BackgroundTasks,
+    job_id: str,
+    index: int = PathParam(..., ge=0),
+    frame: UploadFile = File(...),
+    jobs_dir: Path = Depends(get_jobs_dir),
+    detector: LandmarkDetector = Depends(get_landmark_detector),
+) -> HandScanUploadStatusResponse:
+    """Upload one frame of a session.
+
+    Frame indices are idempotent: re-sending a frame that was already received is a
+    no-op, so a client can blindly retry after a dropped connection. Detection of the
+    frame starts in the background right away.
+
+    The same limits as ``POST /hands/scan`` apply: indices stop at ``max_scan_frames``
+    and all frames of the session share one ``max_scan_upload_mb`` budget.
+    """
+
+    if index >= settings.max_scan_frames:
+        raise HTTPException(status_code=400, detail="Frame index out of range")
+
+    record = await run_in_threadpool(_read_upload_record, jobs_dir, job_id)
+    if record.status != "uploading":
+        raise HTTPException(status_code=409, detail="Upload session is already finalized")
+
+    try:
+        received = await run_in_threadpool(store.list_frame_files, jobs_dir, job_id)
+        if index not in received:
+            used_bytes = await run_in_threadpool(_received_bytes, received)
+            remaining_bytes = settings.max_scan_upload_mb * 1024 * 1024 - used_bytes
+            await run_in_threadpool(
+                store.write_frame_stream,
+                store.get_job_dir(jobs_dir, job_id) / "frames" / _frame_filename(index, frame),
+                frame.file,
+                max_bytes=min(settings.max_image_size_mb * 1024 * 1024, remaining_bytes),
+                chunk_size=settings.upload_chunk_size_kb * 1024,
+            )
+    except store.FrameTooLargeError as exc:
+        raise HTTPException(status_code=413, detail="Frame upload too large") from exc
+    finally:
+        await frame.close()
 
     background_tasks.add_task(
-        process_hand_scan_job,
+        detect_landed_frames,
         jobs_dir=jobs_dir,
         job_id=job_id,
-        frame_paths=frame_paths,
         detector=detector,
+        lease_ttl_seconds=settings.jobs_lease_ttl_seconds,
+        heartbeat_seconds=settings.jobs_lease_heartbeat_seconds,
+        checkpoint_fsync=settings.jobs_checkpoint_fsync,
+        max_frames=settings.max_scan_frames,
+        max_frame_bytes=settings.max_image_size_mb * 1024 * 1024,
+    )
+
+    return await run_in_threadpool(_upload_status, jobs_dir, record)
+
+
+@router.post("/hands/scan/uploads/{job_id}/finalize", response_model=HandScanCreateResponse)
+async def finalize_hand_scan_upload(
+    background_tasks: BackgroundTasks,
+    job_id: str,
+    frame_count: int = Form(..., ge=1),
+    jobs_dir: Path = Depends(get_jobs_dir),
+    detector: LandmarkDetector = Depends(get_landmark_detector),
+) -> HandScanCreateResponse:
+    """Close an upload session and queue the remaining frames and meshing."""
+
+    record = await run_in_threadpool(_read_upload_record, jobs_dir, job_id)
+    if record.status != "uploading":
+        return HandScanCreateResponse(job_id=job_id, status=record.status)
+
+    received = await run_in_threadpool(store.list_frame_files, jobs_dir, job_id)
+    missing = [idx for idx in range(frame_count) if idx not in received]
+    if missing:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload session is missing frames", "missing_frames": missing},
+        )
+
+    frame_files = [str(received[idx]) for idx in range(frame_count)]
+    await run_in_threadpool(
+        store.update_job, jobs_dir, job_id, status="queued", frame_files=frame_files
+    )
+
+    # If a background detection pass still holds the lease, it runs the job itself
+    # once it notices the finalize (or the claim loop picks the job up).
+    lease = await run_in_threadpool(
+        JobLease.try_acquire, jobs_dir, job_id, ttl_seconds=settings.jobs_lease_ttl_seconds
     )
+    if lease is not None:
+        background_tasks.add_task(
+            process_hand_scan_job,
+            jobs_dir=jobs_dir,
+            job_id=job_id,
+            frame_paths=[Path(p) for p in frame_files],
+            detector=detector,
+            checkpoint_fsync=settings.jobs_checkpoint_fsync,
+            lease=lease,
+            heartbeat_seconds=settings.jobs_lease_heartbeat_seconds,
+            max_frames=settings.max_scan_frames,
+            max_frame_bytes=settings.max_image_size_mb * 1024 * 1024,
+        )
 
     return HandScanCreateResponse(job_id=job_id, status="queued")
 
 
+@router.get("/hands/metrics/stages")
+async def get_stage_metrics() -> dict[str, dict[str, object]]:
+    """Process-wide histograms of per-stage pipeline durations."""
+
+    return stage_histograms.snapshot()
+
+
+STATUS_FIELDS: Final[frozenset[str]] = frozenset(HandScanStatusResponse.model_fields)
+
+
+def _parse_fields(fields: str | None) -> set[str] | None:
+    if fields is None:
+        return None
+
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - STATUS_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"job_id", "status"}
+
+
+def _debug_info(record: store.HandScanJobRecord) -> dict[str, Any]:
+    return {
+        "frame_count": record.frame_count,
+        "stage_timings_ms": record.stage_timings_ms,
+        "stage_calls": record.stage_calls,
+        "attempts": record.attempts,
+        "resumed_frames": record.resumed_frames,
+    }
+
+
 @router.get("/hands/{job_id}", response_model=HandScanStatusResponse)
 async def get_hand_scan(
+    request: Request,
     job_id: str,
+    debug: bool = Query(default=False, description="Include per-stage pipeline timings"),
+    fields: str
+    | None = Query(
+        default=None,
+        description=(
+            "Comma-separated response fields to return, e.g. 'status,error,glb_url'. "
+            "Leaving out glb_base64 and metadata skips reading them."
+        ),
+    ),
     jobs_dir: Path = Depends(get_jobs_dir),
-) -> HandScanStatusResponse:
+) -> HandScanStatusResponse | JSONResponse:
+    selected = _parse_fields(fields)
     record = store.read_job_record(jobs_dir, job_id)
     if record is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    def wanted(name: str) -> bool:
+        return selected is None or name in selected
+
     metadata: HandMeshMetadata | None = None
     glb_base64: str | None = None
+    glb_url: str | None = None
 
     if record.status == "completed":
-        metadata_dict = store.read_metadata(jobs_dir, job_id)
-        if metadata_dict is not None:
-            metadata = HandMeshMetadata.model_validate(metadata_dict)
+        if wanted("metadata"):
+            metadata_dict = store.read_metadata(jobs_dir, job_id)
+            if metadata_dict is not None:
+                metadata = HandMeshMetadata.model_validate(metadata_dict)
+
+        if wanted("glb_base64"):
+            glb = store.read_glb(jobs_dir, job_id)
+            if glb is not None:
+                glb_base64 = base64.b64encode(glb).decode("ascii")
 
-        glb = store.read_glb(jobs_dir, job_id)
-        if glb is not None:
-            glb_base64 = base64.b64encode(glb).decode("ascii")
+        if record.glb_file is not None:
+            glb_url = str(request.url_for("get_hand_scan_mesh", job_id=job_id))
 
-    return HandScanStatusResponse(
+    response = HandScanStatusResponse(
         job_id=record.job_id,
         status=record.status,
         created_at=record.created_at,
@@ -105,4 +481,38 @@ async def get_hand_scan(
         error=record.error,
         metadata=metadata,
         glb_base64=glb_base64,
+        glb_url=glb_url,
+        debug=_debug_info(record) if debug else None,
+    )
+    if selected is None:
+        return response
+    return JSONResponse(response.model_dump(mode="json", include=selected))
+
+
+@router.get("/hands/{job_id}/mesh.glb", name="get_hand_scan_mesh")
+async def get_hand_scan_mesh(
+    request: Request,
+    job_id: str,
+    jobs_dir: Path = Depends(get_jobs_dir),
+) -> Response:
+    """Download the binary glTF of a completed scan.
+
+    A job's mesh never changes once written, so responses carry a strong ETag
+    (the GLB's SHA-256) and may be cached indefinitely. ``If-None-Match`` and
+    single ``Range`` requests are supported.
+    """
+
+    record = store.read_job_record(jobs_dir, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if record.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {record.status}")
+
+    path = store.get_glb_path(jobs_dir, record)
+    digest = await run_in_threadpool(store.glb_digest, jobs_dir, record)
+    if path is None or digest is None:
+        raise HTTPException(status_code=404, detail="Mesh not found")
+
+    return cacheable_file_response(
+        request, path, etag=strong_etag(digest), media_type="model/gltf-binary"
     )
@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import secrets
+from contextlib import AsyncExitStack, suppress
 from datetime import datetime, timezone
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, status
 from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from app.db.models import HandModel, Session as PairSession, User
-from app.db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.delivery_marks import delivery_marks
+from app.db.membership import membership_cache
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+from app.db.queries import session_with_latest_model
+from app.db.session import get_db, get_read_db
+from app.events import Broker, Subscription, get_broker
 from app.models.sharing import (
     HandModelResponse,
     PollResponse,
@@ -18,38 +28,57 @@ from app.models.sharing import (
     SessionJoinRequest,
     SessionResponse,
 )
-from app.storage import generate_signed_download_url
+from app.responses import etag_matches, weak_etag
+from app.storage import StorageBackend, generate_signed_download_url, get_storage_backend
+from app.storage.signing import url_validity
 
 router = APIRouter()
 
 _SHARE_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
 
+# Pollers revalidate every time; a 304 costs one query and no body.
+_POLL_CACHE_CONTROL = "private, no-cache"
+
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _get_user_or_404(db: Session, user_id: str) -> User:
-    user = db.execute(select(User).where(User.id == user_id)).scalars().first()
-    if user is None:
+async def _ensure_user_or_404(db: AsyncSession, user_id: str) -> None:
+    if membership_cache.user_exists(user_id):
+        return
+    found = (await db.execute(select(User.id).where(User.id == user_id))).first()
+    if found is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    membership_cache.remember_user(user_id)
+
+
+def _remember_members(session: PairSession) -> None:
+    membership_cache.remember_session(
+        session.id,
+        inviter_user_id=session.inviter_user_id,
+        partner_user_id=session.partner_user_id,
+    )
 
 
-def _get_session_or_404(db: Session, session_id: str) -> PairSession:
+async def _get_session_or_404(db: AsyncSession, session_id: str) -> PairSession:
     session = (
-        db.execute(select(PairSession).where(PairSession.id == session_id)).scalars().first()
+        (await db.execute(select(PairSession).where(PairSession.id == session_id)))
+        .scalars()
+        .first()
     )
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
 
 
-def _generate_unique_share_code(db: Session, length: int = 6) -> str:
+async def _generate_unique_share_code(db: AsyncSession, length: int = 6) -> str:
     for _ in range(30):
         code = "".join(secrets.choice(_SHARE_CODE_ALPHABET) for _ in range(length))
         existing = (
-            db.execute(select(PairSession).where(PairSession.share_code == code)).scalars().first()
+            (await db.execute(select(PairSession).where(PairSession.share_code == code)))
+            .scalars()
+            .first()
         )
         if existing is None:
             return code
@@ -59,13 +88,13 @@ def _generate_unique_share_code(db: Session, length: int = 6) -> str:
 
 @router.post("/sessions", response_model=SessionResponse)
 async def create_session(
-    request: SessionCreateRequest, db: Session = Depends(get_db)
+    request: SessionCreateRequest, db: AsyncSession = Depends(get_db)
 ) -> SessionResponse:
     """Create a pairing session and return a share code."""
 
-    _get_user_or_404(db, request.inviter_user_id)
+    await _ensure_user_or_404(db, request.inviter_user_id)
 
-    share_code = _generate_unique_share_code(db)
+    share_code = await _generate_unique_share_code(db)
     session = PairSession(
         id=secrets.token_hex(16),
         share_code=share_code,
@@ -74,21 +103,26 @@ async def create_session(
         paired_at=None,
     )
     db.add(session)
-    db.commit()
+    await db.commit()
+    _remember_members(session)
 
     return SessionResponse.model_validate(session)
 
 
 @router.post("/sessions/join", response_model=SessionResponse)
 async def join_session(
-    request: SessionJoinRequest, db: Session = Depends(get_db)
+    request: SessionJoinRequest, db: AsyncSession = Depends(get_db)
 ) -> SessionResponse:
     """Join a pairing session using a share code."""
 
-    _get_user_or_404(db, request.partner_user_id)
+    await _ensure_user_or_404(db, request.partner_user_id)
 
     session = (
-        db.execute(select(PairSession).where(PairSession.share_code == request.share_code))
+        (
+            await db.execute(
+                select(PairSession).where(PairSession.share_code == request.share_code)
+            )
+        )
         .scalars()
         .first()
     )
@@ -105,52 +139,187 @@ async def join_session(
         session.partner_user_id = request.partner_user_id
         session.paired_at = _utcnow()
         db.add(session)
-        db.commit()
+        await db.commit()
+        _remember_members(session)
 
     return SessionResponse.model_validate(session)
 
 
+@router.get("/sessions/metrics/membership-cache")
+async def get_membership_cache_metrics() -> dict[str, dict[str, object]]:
+    """Size, hits, misses, evictions and hit rate of this process's membership cache."""
+
+    return membership_cache.snapshot()
+
+
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
-async def get_session(session_id: str, db: Session = Depends(get_db)) -> SessionResponse:
+async def get_session(session_id: str, db: AsyncSession = Depends(get_db)) -> SessionResponse:
     """Get session details."""
 
-    session = _get_session_or_404(db, session_id)
+    session = await _get_session_or_404(db, session_id)
     return SessionResponse.model_validate(session)
 
 
+def _poll_etag(
+    session: PairSession, latest: HandModelResponse | None, after_hand_model_id: str | None
+) -> str:
+    """Changes whenever the poll body would: session, latest model, cursor, or signed URL."""
+
+    parts: list[object] = [
+        session.id,
+        session.partner_user_id,
+        session.paired_at,
+        after_hand_model_id,
+    ]
+    if latest is not None:
+        # The download URL only changes when its signing bucket rolls over.
+        parts += [latest.id, latest.retrieved_at, latest.confirmed_at, url_validity()[0]]
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12)
+    return weak_etag(digest.hexdigest())
+
+
+def _latest_model_response(latest: HandModel | None) -> HandModelResponse | None:
+    """The latest model as served, with delivery marks that are not written yet."""
+
+    if latest is None:
+        return None
+    return delivery_marks.overlay(HandModelResponse.model_validate(latest))
+
+
+async def _poll_state(
+    db: AsyncSession, session_id: str
+) -> tuple[PairSession, HandModelResponse | None]:
+    found = await session_with_latest_model(db, session_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    session, latest = found
+    return session, _latest_model_response(latest)
+
+
 @router.get("/sessions/{session_id}/poll", response_model=PollResponse)
 async def poll_session(
     request: Request,
+    response: Response,
     session_id: str,
     after_hand_model_id: str | None = Query(default=None),
-    db: Session = Depends(get_db),
-) -> PollResponse:
-    """Polling endpoint for partners to check for newly available models."""
-
-    session = _get_session_or_404(db, session_id)
-
-    latest = (
-        db.execute(
-            select(HandModel)
-            .where(HandModel.session_id == session_id)
-            .order_by(HandModel.created_at.desc())
-            .limit(1)
-        )
-        .scalars()
-        .first()
-    )
+    wait: float = Query(default=0.0, ge=0.0, le=settings.session_poll_max_wait_seconds),
+    db: AsyncSession = Depends(get_read_db),
+    broker: Broker = Depends(get_broker),
+    storage: StorageBackend = Depends(get_storage_backend),
+) -> PollResponse | Response:
+    """Polling endpoint for partners to check for newly available models.
+
+    Served by the read replica when one is configured. Responses carry an ``ETag``;
+    a matching ``If-None-Match`` gets an empty ``304``.
+
+    With ``wait`` (seconds), a poll that has nothing new (no model after
+    ``after_hand_model_id``, or a matching ``If-None-Match``) is held open until an
+    upload to the session is published or ``wait`` passes. The wait is an await on
+    the event broker: it holds neither a worker thread nor a database connection.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    async with AsyncExitStack() as stack:
+        subscription = None
+        if wait > 0:
+            # Subscribe before reading, so an upload in between still wakes us.
+            subscription = await stack.enter_async_context(broker.subscribe(session_id))
+
+        session, latest = await _poll_state(db, session_id)
+        etag = _poll_etag(session, latest, after_hand_model_id)
+        nothing_new = latest is None or latest.id == after_hand_model_id
+        if subscription is not None and (nothing_new or etag_matches(if_none_match, etag)):
+            await db.close()
+            try:
+                await asyncio.wait_for(subscription.get(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                session, latest = await _poll_state(db, session_id)
+                etag = _poll_etag(session, latest, after_hand_model_id)
+
+    headers = {"ETag": etag, "Cache-Control": _POLL_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
 
-    latest_response: HandModelResponse | None = None
     if latest is not None:
-        latest_response = HandModelResponse.model_validate(latest)
-        latest_response.download_url = generate_signed_download_url(
-            request=request, key=latest.storage_key
+        latest.download_url = generate_signed_download_url(
+            request=request, key=latest.storage_key, backend=storage
         )
 
     has_new_model = latest is not None and latest.id != after_hand_model_id
 
     return PollResponse(
         session=SessionResponse.model_validate(session),
-        latest_model=latest_response,
+        latest_model=latest,
         has_new_model=has_new_model,
     )
+
+
+def _event_message(
+    websocket: WebSocket, message: dict[str, Any], storage: StorageBackend
+) -> dict[str, Any]:
+    model = message.get("hand_model")
+    if model is not None:
+        url = generate_signed_download_url(
+            request=websocket, key=model["storage_key"], backend=storage
+        )
+        message = {**message, "hand_model": {**model, "download_url": url}}
+    return message
+
+
+async def _forward_events(
+    websocket: WebSocket, subscription: Subscription, storage: StorageBackend
+) -> None:
+    async for event in subscription:
+        await websocket.send_json(_event_message(websocket, event.to_message(), storage))
+
+
+@router.websocket("/sessions/{session_id}/events")
+async def session_events(
+    websocket: WebSocket,
+    session_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    broker: Broker = Depends(get_broker),
+    storage: StorageBackend = Depends(get_storage_backend),
+) -> None:
+    """Push session events instead of polling.
+
+    Sends a ``snapshot`` message (the session and its latest model, as from
+    ``/poll``) on connect, then a ``hand_model`` message for each upload. A model
+    uploaded while connecting can appear in both; use its id to deduplicate.
+    """
+
+    # Subscribe before reading the snapshot, so no upload falls in between.
+    async with broker.subscribe(session_id) as subscription:
+        found = await session_with_latest_model(db, session_id)
+        # Release the connection rather than hold it for the life of the socket.
+        await db.close()
+        if found is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Session not found")
+            return
+        session, latest = found
+
+        await websocket.accept()
+        latest_model: dict[str, Any] | None = None
+        latest_response = _latest_model_response(latest)
+        if latest_response is not None:
+            latest_model = latest_response.model_dump(mode="json")
+        snapshot = {
+            "type": "snapshot",
+            "session_id": session_id,
+            "session": SessionResponse.model_validate(session).model_dump(mode="json"),
+            "hand_model": latest_model,
+        }
+        await websocket.send_json(_event_message(websocket, snapshot, storage))
+
+        forward = asyncio.create_task(_forward_events(websocket, subscription, storage))
+        try:
+            # Clients send nothing; reading notices the disconnect.
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            forward.cancel()
+            with suppress(asyncio.CancelledError):
+                await forward
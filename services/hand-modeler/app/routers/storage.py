@@ -2,23 +2,98 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Query
-from starlette.responses import FileResponse
+import time
 
-from app.storage import file_path_for_key, verify_storage_signature
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+
+from app.responses import cacheable_file_response, etag_matches, requested_range, strong_etag
+from app.storage import (
+    InvalidStorageKeyError,
+    ObjectInfo,
+    ObjectNotFoundError,
+    StorageBackend,
+    StorageError,
+    blob_digest,
+    get_storage_backend,
+    verify_storage_signature,
+)
 
 router = APIRouter()
 
 
+def _etag(info: ObjectInfo) -> str:
+    # Content-addressed keys name their SHA-256, which is the strongest validator there is.
+    digest = blob_digest(info.key)
+    if digest is not None:
+        return strong_etag(digest)
+    if info.etag and info.etag.startswith('"'):
+        return info.etag
+    return strong_etag(info.etag or f"{info.size:x}")
+
+
+def _cache_control(info: ObjectInfo, expires: int) -> str:
+    # Caches may keep the response as long as the signed URL itself stays valid.
+    max_age = max(0, expires - int(time.time()))
+    if blob_digest(info.key) is not None:
+        return f"private, max-age={max_age}, immutable"
+    return f"private, max-age={max_age}"
+
+
 @router.get("/storage/download", name="storage_download")
 async def download(
+    request: Request,
     key: str = Query(...),
     expires: int = Query(...),
     sig: str = Query(...),
-) -> FileResponse:
-    """Download a file from local object storage via a signed URL."""
+    kid: str | None = Query(default=None),
+    storage: StorageBackend = Depends(get_storage_backend),
+) -> Response:
+    """Download a file from object storage via a signed URL.
+
+    Supports ``If-None-Match`` and single ``Range`` requests, so interrupted
+    downloads can resume. Local files are handed to the server to send.
+    """
+
+    verify_storage_signature(key=key, expires=expires, sig=sig, key_id=kid)
+
+    try:
+        info = await run_in_threadpool(storage.head, key)
+        if info is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        media_type = info.content_type or "application/octet-stream"
+        etag = _etag(info)
+        cache_control = _cache_control(info, expires)
+
+        path = storage.local_path(key)
+        if path is not None:
+            return cacheable_file_response(
+                request, path, etag=etag, media_type=media_type, cache_control=cache_control
+            )
+
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
 
-    verify_storage_signature(key=key, expires=expires, sig=sig)
-    path = file_path_for_key(key)
+        byte_range = requested_range(request, etag=etag, size=info.size)
+        start, end = byte_range or (0, info.size - 1)
+        chunks = await run_in_threadpool(
+            storage.get, key, start=start, end=end if byte_range is not None else None
+        )
+    except InvalidStorageKeyError as exc:
+        raise HTTPException(status_code=400, detail="Invalid storage key") from exc
+    except (ObjectNotFoundError, FileNotFoundError) as exc:
+        raise HTTPException(status_code=404, detail="File not found") from exc
+    except StorageError as exc:
+        raise HTTPException(status_code=502, detail="Object storage is unavailable") from exc
 
-    return FileResponse(path)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    return StreamingResponse(
+        iterate_in_threadpool(chunks),
+        status_code=206 if byte_range is not None else 200,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -6,8 +6,9 @@ from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.membership import membership_cache
 from app.db.models import User
 from app.db.session import get_db
 from app.models.sharing import UserCreateRequest, UserResponse
@@ -16,7 +17,9 @@ router = APIRouter()
 
 
 @router.post("/users", response_model=UserResponse)
-async def create_user(request: UserCreateRequest, db: Session = Depends(get_db)) -> UserResponse:
+async def create_user(
+    request: UserCreateRequest, db: AsyncSession = Depends(get_db)
+) -> UserResponse:
     """Create a user.
 
     This is intentionally minimal to support pairing + sharing in a demo setting.
@@ -25,16 +28,17 @@ async def create_user(request: UserCreateRequest, db: Session = Depends(get_db))
     display_name = request.display_name.strip() or "User"
     user = User(id=str(uuid4()), display_name=display_name)
     db.add(user)
-    db.commit()
+    await db.commit()
+    membership_cache.remember_user(user.id)
 
     return UserResponse.model_validate(user)
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, db: Session = Depends(get_db)) -> UserResponse:
+async def get_user(user_id: str, db: AsyncSession = Depends(get_db)) -> UserResponse:
     """Fetch a user by id."""
 
-    user = db.execute(select(User).where(User.id == user_id)).scalar_one_or_none()
+    user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
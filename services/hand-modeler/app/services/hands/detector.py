@@ -8,7 +8,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from io import BytesIO
-from typing import Protocol
+from typing import Any, Protocol, runtime_checkable
 
 
 @dataclass(frozen=True, slots=True)
@@ -24,6 +24,20 @@ class LandmarkDetector(Protocol):
         ...
 
 
+@runtime_checkable
+class DecodingLandmarkDetector(Protocol):
+    """A detector that exposes image decoding and detection as separate steps.
+
+    The job processor uses this to time decoding and detection independently.
+    """
+
+    def decode(self, image_bytes: bytes) -> Any:
+        ...
+
+    def detect_decoded(self, image: Any) -> list[Landmark]:
+        ...
+
+
 class UnavailableLandmarkDetector:
     def __init__(self, message: str) -> None:
         self._message = message
@@ -57,12 +71,16 @@ class MediapipeHandsDetector:
         )
 
     def detect(self, image_bytes: bytes) -> list[Landmark]:
+        return self.detect_decoded(self.decode(image_bytes))
+
+    def decode(self, image_bytes: bytes) -> Any:
         from PIL import Image  # type: ignore[import-untyped]
         import numpy as np
 
         img = Image.open(BytesIO(image_bytes)).convert("RGB")
-        image = np.asarray(img)
+        return np.asarray(img)
 
+    def detect_decoded(self, image: Any) -> list[Landmark]:
         result = self._hands.process(image)
         if not result.multi_hand_landmarks:
             return []
@@ -0,0 +1,216 @@
+"""Lazy frame sources for the hand scan pipeline.
+
+A scan can arrive as individual image files, a zip archive of images, an MJPEG
+stream or a video clip. Every source yields :class:`LazyFrame` objects one at a time;
+a frame's bytes (or decoded pixels) are only produced when :meth:`LazyFrame.read` is
+called, so frames that already have a landmark checkpoint are skipped cheaply and at
+most one frame is held in memory.
+"""
+
+from __future__ import annotations
+
+import zipfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Final, Literal, Protocol
+
+SourceKind = Literal["zip", "mjpeg", "video"]
+
+IMAGE_SUFFIXES: Final[frozenset[str]] = frozenset({".jpg", ".jpeg", ".png", ".bmp", ".webp"})
+
+SOURCE_KIND_BY_SUFFIX: Final[dict[str, SourceKind]] = {
+    ".zip": "zip",
+    ".mjpeg": "mjpeg",
+    ".mjpg": "mjpeg",
+    ".mp4": "video",
+    ".mov": "video",
+    ".m4v": "video",
+    ".webm": "video",
+}
+
+SOURCE_KIND_BY_CONTENT_TYPE: Final[dict[str, SourceKind]] = {
+    "application/zip": "zip",
+    "application/x-zip-compressed": "zip",
+    "video/x-motion-jpeg": "mjpeg",
+    "video/mjpeg": "mjpeg",
+    "multipart/x-mixed-replace": "mjpeg",
+    "video/mp4": "video",
+    "video/quicktime": "video",
+    "video/webm": "video",
+}
+
+_JPEG_SOI: Final[bytes] = b"\xff\xd8"
+_JPEG_EOI: Final[bytes] = b"\xff\xd9"
+
+
+class FrameSourceError(ValueError):
+    """Raised when a scan source cannot be decoded into frames."""
+
+
+@dataclass(frozen=True, slots=True)
+class DecodedFrame:
+    """A frame that is already decoded into an RGB ``(H, W, 3)`` uint8 array."""
+
+    image: Any
+
+
+FramePayload = bytes | DecodedFrame
+
+
+class LazyFrame(Protocol):
+    def read(self) -> FramePayload:
+        ...
+
+
+def detect_source_kind(filename: str | None, content_type: str | None) -> SourceKind | None:
+    """Return the source kind of an upload, or ``None`` for a plain image frame."""
+
+    if content_type:
+        kind = SOURCE_KIND_BY_CONTENT_TYPE.get(content_type.split(";", 1)[0].strip().lower())
+        if kind is not None:
+            return kind
+
+    return SOURCE_KIND_BY_SUFFIX.get(Path(filename or "").suffix.lower())
+
+
+@dataclass(frozen=True, slots=True)
+class _FileFrame:
+    path: Path
+
+    def read(self) -> FramePayload:
+        return self.path.read_bytes()
+
+
+@dataclass(frozen=True, slots=True)
+class _BytesFrame:
+    data: bytes
+
+    def read(self) -> FramePayload:
+        return self.data
+
+
+@dataclass(frozen=True, slots=True)
+class _ZipFrame:
+    archive: zipfile.ZipFile
+    info: zipfile.ZipInfo
+    max_frame_bytes: int
+
+    def read(self) -> FramePayload:
+        if self.info.file_size > self.max_frame_bytes:
+            raise FrameSourceError(f"Archive member {self.info.filename} is too large")
+        return self.archive.read(self.info)
+
+
+def iter_path_frames(paths: list[Path]) -> Iterator[LazyFrame]:
+    for path in paths:
+        yield _FileFrame(path)
+
+
+def iter_zip_frames(path: Path, *, max_frame_bytes: int) -> Iterator[LazyFrame]:
+    """Yield image members of a zip archive in name order.
+
+    Only the central directory is read up front; member data is decompressed on
+    :meth:`LazyFrame.read`.
+    """
+
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as exc:
+        raise FrameSourceError("Invalid zip archive") from exc
+
+    with archive:
+        members = sorted(
+            (
+                info
+                for info in archive.infolist()
+                if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_SUFFIXES
+            ),
+            key=lambda info: info.filename,
+        )
+        for info in members:
+            yield _ZipFrame(archive, info, max_frame_bytes)
+
+
+def iter_mjpeg_frames(
+    path: Path, *, max_frame_bytes: int, chunk_size: int = 256 * 1024
+) -> Iterator[LazyFrame]:
+    """Split an MJPEG stream (concatenated JPEGs, optionally multipart-framed) into frames.
+
+    The file is read in ``chunk_size`` pieces; the buffer never holds more than one
+    frame plus one chunk.
+    """
+
+    buffer = bytearray()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer.extend(chunk)
+
+            while True:
+                start = buffer.find(_JPEG_SOI)
+                if start < 0:
+                    # Keep a trailing 0xFF in case a marker straddles chunks.
+                    del buffer[: max(0, len(buffer) - 1)]
+                    break
+                end = buffer.find(_JPEG_EOI, start + 2)
+                if end < 0:
+                    del buffer[:start]
+                    if len(buffer) > max_frame_bytes:
+                        raise FrameSourceError("MJPEG frame is too large")
+                    break
+                yield _BytesFrame(bytes(buffer[start : end + 2]))
+                del buffer[: end + 2]
+
+            if not chunk:
+                return
+
+
+@dataclass(frozen=True, slots=True)
+class _VideoFrame:
+    capture: Any
+
+    def read(self) -> FramePayload:
+        import cv2  # type: ignore[import-untyped]
+
+        ok, bgr = self.capture.retrieve()
+        if not ok:
+            raise FrameSourceError("Could not decode video frame")
+        return DecodedFrame(image=cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+
+def iter_video_frames(path: Path) -> Iterator[LazyFrame]:
+    """Yield frames of a video clip using OpenCV.
+
+    Frames are demuxed with ``grab()`` and only decoded when read, so checkpointed
+    frames skip the decode.
+    """
+
+    try:
+        import cv2  # type: ignore[import-untyped]
+    except ImportError as exc:  # pragma: no cover
+        raise FrameSourceError(
+            "Video input requires opencv-python. Install with: poetry install -E vision"
+        ) from exc
+
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise FrameSourceError("Could not open video clip")
+
+    try:
+        while capture.grab():
+            yield _VideoFrame(capture)
+    finally:
+        capture.release()
+
+
+def open_frame_source(
+    kind: SourceKind, path: Path, *, max_frame_bytes: int, chunk_size: int = 256 * 1024
+) -> Iterator[LazyFrame]:
+    if kind == "zip":
+        return iter_zip_frames(path, max_frame_bytes=max_frame_bytes)
+    if kind == "mjpeg":
+        return iter_mjpeg_frames(path, max_frame_bytes=max_frame_bytes, chunk_size=chunk_size)
+    if kind == "video":
+        return iter_video_frames(path)
+    raise FrameSourceError(f"Unsupported source kind: {kind}")
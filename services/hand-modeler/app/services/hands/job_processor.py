@@ -2,11 +2,27 @@
 
 from __future__ import annotations
 
+import hashlib
+from collections.abc import Iterator
+from contextlib import closing
 from pathlib import Path
+from typing import Final
 
 from app.jobs import store
+from app.jobs.checkpoints import CheckpointWriter, load_checkpoints
+from app.jobs.leases import JobLease, LeaseLostError
+from app.jobs.retention import get_job_retention
 from app.models.hand_scan import HandMeshMetadata
-from app.services.hands.detector import Landmark, LandmarkDetector
+from app.services.hands.detector import DecodingLandmarkDetector, Landmark, LandmarkDetector
+from app.services.hands.frame_sources import (
+    DecodedFrame,
+    FramePayload,
+    FrameSourceError,
+    LazyFrame,
+    SourceKind,
+    iter_path_frames,
+    open_frame_source,
+)
 from app.services.hands.meshing import export_mesh_glb, generate_hand_mesh
 from app.services.hands.processing import (
     HAND_LANDMARK_COUNT,
@@ -16,6 +32,67 @@ from app.services.hands.processing import (
     normalize_landmarks,
     smooth_trajectories,
 )
+from app.services.hands.timing import StageTimer, stage_histograms
+
+DEFAULT_MAX_FRAME_BYTES: Final[int] = 10 * 1024 * 1024
+
+
+def _encode_png(image: object) -> bytes:
+    from io import BytesIO
+
+    from PIL import Image  # type: ignore[import-untyped]
+
+    buf = BytesIO()
+    Image.fromarray(image).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _detect_frame(
+    detector: LandmarkDetector, payload: FramePayload, timer: StageTimer
+) -> list[Landmark]:
+    if isinstance(detector, DecodingLandmarkDetector):
+        if isinstance(payload, DecodedFrame):
+            image = payload.image
+        else:
+            with timer.stage("image_decode"):
+                image = detector.decode(payload)
+        with timer.stage("detection"):
+            return detector.detect_decoded(image)
+
+    if isinstance(payload, DecodedFrame):
+        # Opaque detectors only accept encoded images.
+        with timer.stage("image_decode"):
+            payload = _encode_png(payload.image)
+
+    # Opaque detectors decode internally; the decode cost is part of detection.
+    with timer.stage("detection"):
+        return detector.detect(payload)
+
+
+def _open_frames(
+    jobs_dir: Path,
+    record: store.HandScanJobRecord | None,
+    frame_paths: list[Path],
+    max_frame_bytes: int,
+) -> Iterator[LazyFrame]:
+    if record is None or record.source_file is None or record.source_kind is None:
+        return iter_path_frames(frame_paths)
+
+    source_kind: SourceKind
+    if record.source_kind == "zip":
+        source_kind = "zip"
+    elif record.source_kind == "mjpeg":
+        source_kind = "mjpeg"
+    elif record.source_kind == "video":
+        source_kind = "video"
+    else:
+        raise FrameSourceError(f"Unsupported source kind: {record.source_kind}")
+
+    return open_frame_source(
+        source_kind,
+        store.get_job_dir(jobs_dir, record.job_id) / record.source_file,
+        max_frame_bytes=max_frame_bytes,
+    )
 
 
 def process_hand_scan_job(
@@ -24,43 +101,322 @@ def process_hand_scan_job(
     job_id: str,
     frame_paths: list[Path],
     detector: LandmarkDetector,
+    checkpoint_fsync: bool = False,
+    lease: JobLease | None = None,
+    heartbeat_seconds: float = 10.0,
+    max_frames: int | None = None,
+    max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
 ) -> None:
-    """Run landmark detection, smoothing, mesh generation, and persistence."""
+    """Run landmark detection, smoothing, mesh generation, and persistence.
+
+    Frames come from ``frame_paths`` or, for jobs created from a single clip or
+    archive, are decoded lazily from the job's source file one at a time.
+    ``max_frames`` and ``max_frame_bytes`` bound how much a source may expand to.
 
-    store.update_job(jobs_dir, job_id, status="processing", error=None)
+    Landmarks are checkpointed per frame, so a job resumed after a crash only runs
+    detection on frames that were not finished before.
 
+    If a ``lease`` is given, this function takes ownership of it: it heartbeats while
+    working, stops without touching the job if the lease is taken over, and releases
+    it when done.
+    """
+
+    if lease is None:
+        _process_hand_scan_job(
+            jobs_dir=jobs_dir,
+            job_id=job_id,
+            frame_paths=frame_paths,
+            detector=detector,
+            checkpoint_fsync=checkpoint_fsync,
+            lease=None,
+            max_frames=max_frames,
+            max_frame_bytes=max_frame_bytes,
+        )
+        return
+
+    lease.start_heartbeat(heartbeat_seconds)
     try:
-        frames: list[list[Landmark]] = []
-        for frame_path in frame_paths:
-            image_bytes = frame_path.read_bytes()
-            landmarks = detector.detect(image_bytes)
-            if len(landmarks) != HAND_LANDMARK_COUNT:
-                raise ValueError(
-                    f"Expected {HAND_LANDMARK_COUNT} landmarks, got {len(landmarks)}"
-                )
-            frames.append(landmarks)
+        _process_hand_scan_job(
+            jobs_dir=jobs_dir,
+            job_id=job_id,
+            frame_paths=frame_paths,
+            detector=detector,
+            checkpoint_fsync=checkpoint_fsync,
+            lease=lease,
+            max_frames=max_frames,
+            max_frame_bytes=max_frame_bytes,
+        )
+    except LeaseLostError:
+        # Another worker took the job over; it owns the job record from here on.
+        return
+    finally:
+        lease.release()
+
+
+def _process_hand_scan_job(
+    *,
+    jobs_dir: Path,
+    job_id: str,
+    frame_paths: list[Path],
+    detector: LandmarkDetector,
+    checkpoint_fsync: bool,
+    lease: JobLease | None,
+    max_frames: int | None,
+    max_frame_bytes: int,
+) -> None:
+    previous = store.read_job_record(jobs_dir, job_id)
+    attempts = (previous.attempts if previous is not None else 0) + 1
+    store.update_job(jobs_dir, job_id, status="processing", error=None, attempts=attempts)
+
+    timer = StageTimer()
+    frames: list[list[Landmark]] = []
+    try:
+        with timer.stage("checkpoint_load"):
+            checkpointed = load_checkpoints(jobs_dir, job_id)
+        resumed_frames = 0
+
+        source = _open_frames(jobs_dir, previous, frame_paths, max_frame_bytes)
+        with (
+            closing(source),  # type: ignore[type-var]
+            CheckpointWriter(jobs_dir, job_id, fsync=checkpoint_fsync) as checkpoints,
+        ):
+            for idx, frame in enumerate(source):
+                if max_frames is not None and idx >= max_frames:
+                    raise FrameSourceError(f"Scan has more than {max_frames} frames")
+                if lease is not None:
+                    lease.ensure_held()
+                landmarks = checkpointed.get(idx, [])
+                if len(landmarks) == HAND_LANDMARK_COUNT:
+                    resumed_frames += 1
+                    frames.append(landmarks)
+                    continue
 
-        trajectories = landmarks_to_array(frames)
-        trajectories = smooth_trajectories(trajectories, window=5)
-        points = aggregate_landmarks(trajectories)
-        points = normalize_landmarks(points)
+                with timer.stage("frame_read"):
+                    payload = frame.read()
+                landmarks = _detect_frame(detector, payload, timer)
+                if len(landmarks) != HAND_LANDMARK_COUNT:
+                    raise ValueError(
+                        f"Expected {HAND_LANDMARK_COUNT} landmarks, got {len(landmarks)}"
+                    )
+                checkpoints.append(idx, landmarks)
+                frames.append(landmarks)
 
-        metadata: HandMeshMetadata = compute_metadata(points)
+        with timer.stage("smoothing"):
+            trajectories = landmarks_to_array(frames)
+            trajectories = smooth_trajectories(trajectories, window=5)
+        with timer.stage("aggregation"):
+            points = aggregate_landmarks(trajectories)
+        with timer.stage("normalization"):
+            points = normalize_landmarks(points)
 
-        mesh = generate_hand_mesh(points)
-        glb = export_mesh_glb(mesh)
+        with timer.stage("metadata"):
+            metadata: HandMeshMetadata = compute_metadata(points)
 
-        metadata_json = metadata.model_dump_json(indent=2)
-        metadata_path = store.write_metadata(jobs_dir, job_id, metadata_json)
-        glb_path = store.write_glb(jobs_dir, job_id, glb)
+        with timer.stage("meshing"):
+            mesh = generate_hand_mesh(points)
+        with timer.stage("glb_export"):
+            glb = export_mesh_glb(mesh)
 
+        if lease is not None:
+            lease.heartbeat()
+
+        with timer.stage("persistence"):
+            metadata_json = metadata.model_dump_json(indent=2)
+            metadata_path = store.write_metadata(jobs_dir, job_id, metadata_json)
+            glb_path = store.write_glb(jobs_dir, job_id, glb)
+            glb_sha256 = hashlib.sha256(glb).hexdigest()
+
+        stage_histograms.observe(timer)
         store.update_job(
             jobs_dir,
             job_id,
             status="completed",
             metadata_file=metadata_path,
             glb_file=glb_path,
+            glb_sha256=glb_sha256,
             error=None,
+            frame_count=len(frames),
+            stage_timings_ms=timer.durations_ms(),
+            stage_calls=timer.calls(),
+            resumed_frames=resumed_frames,
         )
+    except LeaseLostError:
+        raise
     except Exception as exc:  # pragma: no cover
-        store.update_job(jobs_dir, job_id, status="failed", error=str(exc))
+        store.update_job(
+            jobs_dir,
+            job_id,
+            status="failed",
+            error=str(exc),
+            frame_count=len(frames),
+            stage_timings_ms=timer.durations_ms(),
+            stage_calls=timer.calls(),
+        )
+
+    get_job_retention(jobs_dir).on_job_finished(job_id)
+
+
+def detect_landed_frames(
+    *,
+    jobs_dir: Path,
+    job_id: str,
+    detector: LandmarkDetector,
+    lease_ttl_seconds: float = 30.0,
+    heartbeat_seconds: float = 10.0,
+    checkpoint_fsync: bool = False,
+    max_frames: int | None = None,
+    max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+) -> int:
+    """Checkpoint landmarks for frames of an in-progress upload session.
+
+    Runs detection on every fully written frame that has no checkpoint yet, so that
+    detection overlaps the upload. Only one worker does this per job at a time; if
+    the job lease is already held, this returns immediately and the frames are
+    picked up by the holder or, at the latest, when the job is finalized.
+
+    Frames that fail detection are left without a checkpoint for the final run to
+    report. ``max_frames`` and ``max_frame_bytes`` bound that run, as in
+    :func:`process_hand_scan_job`.
+
+    Returns:
+        Number of frames checkpointed by this call.
+    """
+
+    detected = 0
+    while True:
+        lease = JobLease.try_acquire(jobs_dir, job_id, ttl_seconds=lease_ttl_seconds)
+        if lease is None:
+            return detected
+
+        finalized: store.HandScanJobRecord | None = None
+        lease.start_heartbeat(heartbeat_seconds)
+        try:
+            record = store.read_job_record(jobs_dir, job_id)
+            if record is not None and record.status == "uploading":
+                detected += _checkpoint_pending_frames(
+                    jobs_dir, job_id, detector, lease, checkpoint_fsync
+                )
+                record = store.read_job_record(jobs_dir, job_id)
+
+            if record is not None and record.status in store.CLAIMABLE_STATUSES:
+                # Finalized while we held the lease; the finalize request could not
+                # claim the job, so run the remaining frames and meshing here.
+                finalized = record
+        except LeaseLostError:
+            pass
+        finally:
+            if finalized is None:
+                lease.release()
+
+        if finalized is not None:
+            process_hand_scan_job(
+                jobs_dir=jobs_dir,
+                job_id=job_id,
+                frame_paths=[Path(p) for p in finalized.frame_files],
+                detector=detector,
+                checkpoint_fsync=checkpoint_fsync,
+                lease=lease,
+                heartbeat_seconds=heartbeat_seconds,
+                max_frames=max_frames,
+                max_frame_bytes=max_frame_bytes,
+            )
+            return detected
+
+        # A finalize between our last read and the release lost the lease to us and
+        # left the job queued; claim it again rather than leave it to the claim loop.
+        record = store.read_job_record(jobs_dir, job_id)
+        if record is None or record.status != "queued":
+            return detected
+
+
+def _checkpoint_pending_frames(
+    jobs_dir: Path,
+    job_id: str,
+    detector: LandmarkDetector,
+    lease: JobLease,
+    checkpoint_fsync: bool,
+) -> int:
+    detected = 0
+    done = set(load_checkpoints(jobs_dir, job_id))
+    with CheckpointWriter(jobs_dir, job_id, fsync=checkpoint_fsync) as checkpoints:
+        while True:
+            pending = sorted(
+                (idx, path)
+                for idx, path in store.list_frame_files(jobs_dir, job_id).items()
+                if idx not in done
+            )
+            if not pending:
+                return detected
+
+            for idx, frame_path in pending:
+                lease.ensure_held()
+                done.add(idx)
+                try:
+                    landmarks = detector.detect(frame_path.read_bytes())
+                except Exception:  # pragma: no cover
+                    continue
+                if len(landmarks) == HAND_LANDMARK_COUNT:
+                    checkpoints.append(idx, landmarks)
+                    detected += 1
+
+
+def resume_unfinished_jobs(
+    *,
+    jobs_dir: Path,
+    detector: LandmarkDetector,
+    max_attempts: int,
+    checkpoint_fsync: bool = False,
+    lease_ttl_seconds: float = 30.0,
+    heartbeat_seconds: float = 10.0,
+    full_scan: bool = False,
+    max_frames: int | None = None,
+    max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+) -> list[str]:
+    """Claim and run jobs that are queued or were abandoned by a dead worker.
+
+    Each job is claimed with a :class:`JobLease` first, so any number of worker
+    processes can call this concurrently on a shared jobs directory. Jobs that
+    already used up ``max_attempts`` are marked failed instead of being retried
+    forever.
+
+    Returns:
+        Ids of the jobs that this worker processed.
+    """
+
+    processed: list[str] = []
+    for candidate in store.find_unfinished_jobs(jobs_dir, full_scan=full_scan):
+        lease = JobLease.try_acquire(jobs_dir, candidate.job_id, ttl_seconds=lease_ttl_seconds)
+        if lease is None:
+            continue
+
+        # Re-read under the lease: the previous owner may have finished meanwhile.
+        record = store.read_job_record(jobs_dir, candidate.job_id)
+        if record is None or record.status in store.TERMINAL_STATUSES:
+            lease.release()
+            continue
+
+        if record.attempts >= max_attempts:
+            store.update_job(
+                jobs_dir,
+                record.job_id,
+                status="failed",
+                error=f"Gave up after {record.attempts} interrupted attempts",
+            )
+            lease.release()
+            get_job_retention(jobs_dir).on_job_finished(record.job_id)
+            continue
+
+        process_hand_scan_job(
+            jobs_dir=jobs_dir,
+            job_id=record.job_id,
+            frame_paths=[Path(p) for p in record.frame_files],
+            detector=detector,
+            checkpoint_fsync=checkpoint_fsync,
+            lease=lease,
+            heartbeat_seconds=heartbeat_seconds,
+            max_frames=max_frames,
+            max_frame_bytes=max_frame_bytes,
+        )
+        processed.append(record.job_id)
+
+    return processed
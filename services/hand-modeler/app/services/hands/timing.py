@@ -0,0 +1,139 @@
+"""Per-stage timing for the hand scan pipeline.
+
+``StageTimer`` records how long each pipeline stage took for a single job, using the
+monotonic ``perf_counter_ns`` clock. Finished timers are folded into process-wide
+histograms so regressions in a single stage are visible across many jobs.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Final
+
+# The stages of ``job_processor``, in pipeline order; snapshots list them in this order.
+PIPELINE_STAGES: Final[tuple[str, ...]] = (
+    "checkpoint_load",
+    "frame_read",
+    "image_decode",
+    "detection",
+    "smoothing",
+    "aggregation",
+    "normalization",
+    "metadata",
+    "meshing",
+    "glb_export",
+    "persistence",
+)
+
+# Histogram bucket upper bounds, in milliseconds. The last bucket is open-ended.
+HISTOGRAM_BUCKETS_MS: Final[tuple[float, ...]] = (
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    25.0,
+    50.0,
+    100.0,
+    250.0,
+    500.0,
+    1000.0,
+    2500.0,
+    5000.0,
+    10000.0,
+)
+
+
+@dataclass(slots=True)
+class StageSample:
+    total_ns: int = 0
+    calls: int = 0
+
+
+@dataclass
+class StageTimer:
+    """Accumulates durations and call counts per stage for one job."""
+
+    samples: dict[str, StageSample] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter_ns() - start)
+
+    def add(self, name: str, elapsed_ns: int) -> None:
+        sample = self.samples.setdefault(name, StageSample())
+        sample.total_ns += elapsed_ns
+        sample.calls += 1
+
+    def durations_ms(self) -> dict[str, float]:
+        return {name: sample.total_ns / 1e6 for name, sample in self.samples.items()}
+
+    def calls(self) -> dict[str, int]:
+        return {name: sample.calls for name, sample in self.samples.items()}
+
+
+@dataclass(slots=True)
+class _Histogram:
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BUCKETS_MS) + 1))
+    count: int = 0
+    sum_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        idx = len(HISTOGRAM_BUCKETS_MS)
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value_ms <= bound:
+                idx = i
+                break
+        self.buckets[idx] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+
+class StageHistograms:
+    """Thread-safe, process-wide histograms of per-job stage durations."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[str, _Histogram] = {}
+
+    def observe(self, timer: StageTimer) -> None:
+        with self._lock:
+            for name, value_ms in timer.durations_ms().items():
+                self._histograms.setdefault(name, _Histogram()).observe(value_ms)
+
+    def snapshot(self) -> dict[str, dict[str, object]]:
+        """Histograms per stage: pipeline stages in order, then any others by name."""
+
+        bounds = [str(b) for b in HISTOGRAM_BUCKETS_MS] + ["+Inf"]
+        order = {name: idx for idx, name in enumerate(PIPELINE_STAGES)}
+        with self._lock:
+            histograms = sorted(
+                self._histograms.items(),
+                key=lambda item: (order.get(item[0], len(order)), item[0]),
+            )
+            return {
+                name: {
+                    "count": hist.count,
+                    "sum_ms": hist.sum_ms,
+                    "mean_ms": hist.sum_ms / hist.count if hist.count else 0.0,
+                    "max_ms": hist.max_ms,
+                    "buckets_ms": dict(zip(bounds, hist.buckets, strict=True)),
+                }
+                for name, hist in histograms
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+stage_histograms = StageHistograms()
@@ -0,0 +1,278 @@
+"""Object storage + signed URL helpers.
+
+GLB files live behind a :class:`~app.storage.base.StorageBackend`: local disk (or
+any mounted volume) by default, or an S3-compatible bucket so that several API
+nodes can share hand models. ``STORAGE_BACKEND`` selects the backend. Uploads are
+stored once per distinct content (see :mod:`app.storage.blobs`).
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.db.models import StorageBlob
+from app.storage.base import (
+    InvalidStorageKeyError,
+    ObjectInfo,
+    ObjectNotFoundError,
+    ObjectTooLargeError,
+    StorageBackend,
+    StorageError,
+)
+from app.storage.base64_stream import JsonBase64Parser, MalformedUploadError
+from app.storage.blobs import (
+    StagedObject,
+    StagingWriter,
+    blob_digest,
+    blob_key,
+    delete_blob_if_unreferenced,
+    release_blob,
+    stage_stream,
+    store_blob,
+)
+from app.storage.local import LocalDiskBackend
+from app.storage.s3 import S3Backend
+from app.storage.signing import sign_storage_key, url_validity, verify_storage_signature
+
+__all__ = [
+    "InvalidStorageKeyError",
+    "LocalDiskBackend",
+    "ObjectInfo",
+    "ObjectNotFoundError",
+    "ObjectTooLargeError",
+    "S3Backend",
+    "StorageBackend",
+    "StorageError",
+    "blob_digest",
+    "blob_key",
+    "delete_blob_if_unreferenced",
+    "ensure_storage_dirs",
+    "file_exists",
+    "generate_signed_download_url",
+    "generate_signed_download_urls",
+    "get_storage_backend",
+    "release_blob",
+    "save_staged_object",
+    "save_upload_file",
+    "sign_storage_key",
+    "stage_base64_json",
+    "storage_dir",
+    "verify_storage_signature",
+]
+
+
+def storage_dir() -> Path:
+    return Path(settings.storage_dir)
+
+
+@lru_cache(maxsize=4)
+def _build_backend(
+    kind: str,
+    root: str,
+    endpoint_url: str,
+    bucket: str,
+    region: str,
+    access_key_id: str,
+    secret_access_key: str,
+    part_size_mb: int,
+    max_connections: int,
+    buffer_size_kb: int,
+    fsync: str,
+) -> StorageBackend:
+    if kind == "local":
+        return LocalDiskBackend(Path(root), chunk_size=buffer_size_kb * 1024, fsync=fsync)
+    if kind == "s3":
+        return S3Backend(
+            endpoint_url=endpoint_url,
+            bucket=bucket,
+            region=region,
+            access_key_id=access_key_id,
+            secret_access_key=secret_access_key,
+            part_size=part_size_mb * 1024 * 1024,
+            max_connections=max_connections,
+        )
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def get_storage_backend() -> StorageBackend:
+    """FastAPI dependency returning the configured backend.
+
+    Backends are cached per configuration, so the S3 connection pool is shared by
+    every request.
+    """
+
+    return _build_backend(
+        settings.storage_backend,
+        settings.storage_dir,
+        settings.s3_endpoint_url,
+        settings.s3_bucket,
+        settings.s3_region,
+        settings.s3_access_key_id,
+        settings.s3_secret_access_key,
+        settings.s3_part_size_mb,
+        settings.s3_max_connections,
+        settings.storage_buffer_size_kb,
+        settings.storage_fsync,
+    )
+
+
+def ensure_storage_dirs() -> None:
+    """Ensure that storage + data directories exist."""
+
+    if settings.storage_backend == "local":
+        storage_dir().mkdir(parents=True, exist_ok=True)
+
+
+async def _store(
+    db: AsyncSession,
+    backend: StorageBackend,
+    src: BinaryIO,
+    max_size_bytes: int,
+    content_type: str,
+) -> StorageBlob:
+    staged: StagedObject | None = None
+    try:
+        # Staging and hashing block on file I/O; keep them off the event loop.
+        staged = await run_in_threadpool(
+            stage_stream,
+            src,
+            max_bytes=max_size_bytes,
+            staging_dir=backend.staging_dir(),
+            chunk_size=settings.storage_buffer_size_kb * 1024,
+        )
+        return await store_blob(db, backend, staged, content_type=content_type)
+    except ObjectTooLargeError as exc:
+        raise HTTPException(status_code=413, detail="Model file too large") from exc
+    except StorageError as exc:
+        raise HTTPException(status_code=502, detail="Object storage is unavailable") from exc
+    finally:
+        if staged is not None:
+            staged.path.unlink(missing_ok=True)
+
+
+async def save_upload_file(
+    *,
+    db: AsyncSession,
+    upload: UploadFile,
+    max_size_bytes: int,
+    backend: StorageBackend | None = None,
+) -> StorageBlob:
+    """Persist an UploadFile as a content-addressed blob.
+
+    The SHA-256 is computed while the upload streams in. Identical bytes share one
+    blob, and a reference to it is added to ``db``'s transaction. File and backend
+    I/O run in worker threads.
+    """
+
+    backend = backend or get_storage_backend()
+    content_type = upload.content_type or "application/octet-stream"
+    return await _store(db, backend, upload.file, max_size_bytes, content_type)
+
+
+@lru_cache(maxsize=4096)
+def _presign(
+    backend: StorageBackend, key: str, issued_at: int, expires: int, base_url: str, key_id: str
+) -> str:
+    # ``key_id`` is part of the cache key so that rotating the signing key takes effect.
+    return backend.presign(key, expires_at=expires, base_url=base_url, issued_at=issued_at)
+
+
+async def stage_base64_json(
+    chunks: AsyncIterator[bytes],
+    *,
+    field: str,
+    max_size_bytes: int,
+    backend: StorageBackend | None = None,
+) -> tuple[StagedObject, dict[str, object]]:
+    """Stage the base64 ``field`` of a streamed JSON body, decoding it as it arrives.
+
+    Memory per request stays around ``storage_buffer_size_kb``, and the decoded size
+    is checked against ``max_size_bytes`` as it grows. Returns the staged object and
+    the body's other fields; the caller removes the staged file.
+    """
+
+    backend = backend or get_storage_backend()
+    parser = JsonBase64Parser(field)
+    buffer_size = settings.storage_buffer_size_kb * 1024
+    try:
+        writer = await run_in_threadpool(
+            StagingWriter, max_bytes=max_size_bytes, staging_dir=backend.staging_dir()
+        )
+        with writer:
+            pending = bytearray()
+            async for chunk in chunks:
+                pending += parser.feed(chunk)
+                if len(pending) >= buffer_size:
+                    await run_in_threadpool(writer.write, bytes(pending))
+                    pending.clear()
+            fields = parser.finish()
+            if not parser.seen_field:
+                raise HTTPException(status_code=422, detail=f"Missing {field!r} field")
+            await run_in_threadpool(writer.write, bytes(pending))
+            staged = writer.finish()
+    except ObjectTooLargeError as exc:
+        raise HTTPException(status_code=413, detail="Model file too large") from exc
+    except MalformedUploadError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return staged, fields
+
+
+async def save_staged_object(
+    *,
+    db: AsyncSession,
+    staged: StagedObject,
+    content_type: str,
+    backend: StorageBackend | None = None,
+) -> StorageBlob:
+    """Store a staged object as a content-addressed blob; ``staged`` is left in place."""
+
+    backend = backend or get_storage_backend()
+    try:
+        return await store_blob(db, backend, staged, content_type=content_type)
+    except StorageError as exc:
+        raise HTTPException(status_code=502, detail="Object storage is unavailable") from exc
+
+
+def generate_signed_download_url(
+    *, request: HTTPConnection, key: str, backend: StorageBackend | None = None
+) -> str:
+    """Generate a signed download URL for a storage key.
+
+    The expiry is rounded to ``signed_url_bucket_seconds``, so repeated calls for the
+    same key return the same (memoized) URL until the bucket rolls over, and clients
+    and CDNs can cache the download.
+    """
+
+    backend = backend or get_storage_backend()
+    issued_at, expires = url_validity()
+    base_url = str(request.url_for("storage_download"))
+    return _presign(backend, key, issued_at, expires, base_url, settings.storage_signing_key_id)
+
+
+def generate_signed_download_urls(
+    *, request: HTTPConnection, keys: Iterable[str], backend: StorageBackend | None = None
+) -> dict[str, str]:
+    """Signed download URLs for many keys, by key.
+
+    Resolves the backend, validity and base URL once, and signs each distinct key
+    once (models with the same bytes share a blob key).
+    """
+
+    backend = backend or get_storage_backend()
+    issued_at, expires = url_validity()
+    base_url = str(request.url_for("storage_download"))
+    key_id = settings.storage_signing_key_id
+    return {key: _presign(backend, key, issued_at, expires, base_url, key_id) for key in set(keys)}
+
+
+def file_exists(key: str, backend: StorageBackend | None = None) -> bool:
+    return (backend or get_storage_backend()).head(key) is not None
@@ -0,0 +1,126 @@
+"""Object storage backend interface."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Protocol, runtime_checkable
+
+
+class StorageError(RuntimeError):
+    """Raised when the storage backend fails."""
+
+
+class ObjectNotFoundError(StorageError):
+    """Raised when a key does not exist in the backend."""
+
+
+class InvalidStorageKeyError(ValueError):
+    """Raised for keys that are absolute or escape the storage root."""
+
+
+class ObjectTooLargeError(ValueError):
+    """Raised by :meth:`StorageBackend.put` when a stream exceeds ``max_bytes``."""
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str | None = None
+    content_type: str | None = None
+    last_modified: datetime | None = None
+
+
+def validate_key(key: str) -> str:
+    """Reject keys that could address something outside the storage namespace."""
+
+    parts = key.split("/")
+    if not key or key.startswith("/") or "\\" in key or any(p in {"", ".", ".."} for p in parts):
+        raise InvalidStorageKeyError(f"Invalid storage key: {key!r}")
+    return key
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """Where hand model blobs live.
+
+    Implementations stream in both directions, so neither uploads nor downloads
+    hold a whole object in memory.
+    """
+
+    def put(
+        self,
+        key: str,
+        src: BinaryIO,
+        *,
+        max_bytes: int,
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        """Store ``src`` under ``key`` and return the number of bytes written.
+
+        Raises:
+            ObjectTooLargeError: if ``src`` is larger than ``max_bytes``; nothing is stored.
+        """
+        ...
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str = "application/octet-stream"
+    ) -> None:
+        """Store the local file ``path`` under ``key``; ``path`` is left in place."""
+        ...
+
+    def staging_dir(self) -> Path | None:
+        """Where to stage files for :meth:`put_file`, or ``None`` for the temp dir.
+
+        Staging next to the store lets :meth:`put_file` move files instead of
+        copying them.
+        """
+        ...
+
+    def local_path(self, key: str) -> Path | None:
+        """Return the file holding ``key`` if objects are local files, else ``None``.
+
+        Lets the download endpoint serve ranges straight from the file instead of
+        going through :meth:`get`.
+        """
+        ...
+
+    def get(self, key: str, *, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        """Yield the bytes of ``key`` in ``[start, end]`` (inclusive) as chunks.
+
+        Raises:
+            ObjectNotFoundError: if ``key`` does not exist.
+        """
+        ...
+
+    def head(self, key: str) -> ObjectInfo | None:
+        """Return object metadata, or ``None`` if ``key`` does not exist."""
+        ...
+
+    def delete(self, key: str) -> None:
+        """Delete ``key``; deleting a missing key is not an error."""
+        ...
+
+    def list_objects(
+        self, prefix: str, *, start_after: str | None = None, limit: int = 1000
+    ) -> list[ObjectInfo]:
+        """Return up to ``limit`` objects under ``prefix`` in key order.
+
+        Listing resumes after ``start_after``, so callers can page through a large
+        namespace a batch at a time.
+        """
+        ...
+
+    def presign(
+        self, key: str, *, expires_at: int, base_url: str, issued_at: int | None = None
+    ) -> str:
+        """Return a URL that allows downloading ``key`` until ``expires_at``.
+
+        ``base_url`` is the API's own download endpoint, used by backends that
+        cannot be reached by clients directly. Backends that embed a signing time
+        use ``issued_at`` (default: now), so equal arguments give equal URLs.
+        """
+        ...
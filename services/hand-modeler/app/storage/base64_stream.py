@@ -0,0 +1,206 @@
+"""Incremental decoding of base64 uploads embedded in a JSON body.
+
+The mobile fallback sends ``{"owner_user_id": ..., "glb_base64": "<base64>"}``.
+:class:`JsonBase64Parser` consumes such a body in arbitrary chunks and hands back
+the decoded bytes of the base64 field as they become available, so neither the
+encoded nor the decoded upload is ever held in memory as a whole. The other
+fields are small and collected as they are (up to :data:`MAX_FIELD_BYTES` each).
+"""
+
+from __future__ import annotations
+
+import binascii
+import json
+from typing import Final
+
+MAX_FIELD_BYTES: Final[int] = 4096
+
+_WHITESPACE: Final[bytes] = b" \t\r\n"
+_DELIMITERS: Final[bytes] = b",}" + _WHITESPACE
+
+
+class MalformedUploadError(ValueError):
+    """Raised for bodies that are not a flat JSON object with valid base64."""
+
+
+class Base64Decoder:
+    """Decode base64 text fed in arbitrary pieces."""
+
+    def __init__(self) -> None:
+        self._pending = b""
+        self._padded = False
+
+    def feed(self, text: bytes) -> bytes:
+        if not text:
+            return b""
+        if self._padded:
+            raise MalformedUploadError("Data after base64 padding")
+        text = self._pending + text
+        usable = len(text) - len(text) % 4
+        self._pending = text[usable:]
+        quads = text[:usable]
+        if not quads:
+            return b""
+        try:
+            decoded = binascii.a2b_base64(quads, strict_mode=True)
+        except binascii.Error as exc:
+            raise MalformedUploadError("Invalid base64 payload") from exc
+        self._padded = quads.endswith(b"=")
+        return decoded
+
+    def finish(self) -> None:
+        if self._pending:
+            raise MalformedUploadError("Incorrect base64 padding")
+
+
+class JsonBase64Parser:
+    """Stream-parse a flat JSON object whose ``field`` holds base64 data.
+
+    :meth:`feed` returns the decoded bytes of ``field`` found in each chunk;
+    :meth:`finish` returns the remaining fields once the object is complete.
+    Nested objects and arrays are rejected.
+    """
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self.fields: dict[str, object] = {}
+        self.seen_field = False
+        self._decoder = Base64Decoder()
+        self._state = "start"
+        self._key: str | None = None
+        self._raw = bytearray()
+        self._escaped = False
+
+    def feed(self, chunk: bytes) -> bytes:
+        out = bytearray()
+        pos = 0
+        while pos < len(chunk):
+            if self._state == "blob":
+                pos = self._feed_blob(chunk, pos, out)
+                continue
+
+            byte = chunk[pos : pos + 1]
+            pos += 1
+            if self._state == "literal" and byte in _DELIMITERS:
+                self._end_literal()
+            if self._state in ("key", "string", "literal"):
+                self._feed_token(byte)
+            elif byte not in _WHITESPACE:
+                self._feed_structure(byte)
+        return bytes(out)
+
+    def finish(self) -> dict[str, object]:
+        if self._state == "literal":
+            self._end_literal()
+        if self._state != "done":
+            raise MalformedUploadError("Truncated JSON body")
+        self._decoder.finish()
+        return self.fields
+
+    def _feed_structure(self, byte: bytes) -> None:
+        # Punctuation between tokens; whitespace has already been skipped.
+        if self._state == "start":
+            self._expect(byte, b"{", "first_key")
+        elif self._state in ("first_key", "key_start"):
+            if byte == b"}" and self._state == "first_key":
+                self._state = "done"
+            else:
+                self._expect(byte, b'"', "key")
+        elif self._state == "colon":
+            self._expect(byte, b":", "value")
+        elif self._state == "value":
+            self._start_value(byte)
+        elif self._state == "after_value":
+            if byte == b",":
+                self._state = "key_start"
+            else:
+                self._expect(byte, b"}", "done")
+        else:
+            raise MalformedUploadError("Data after the JSON object")
+
+    def _expect(self, byte: bytes, expected: bytes, next_state: str) -> None:
+        if byte != expected:
+            raise MalformedUploadError(f"Expected {expected.decode()!r} in JSON body")
+        self._state = next_state
+
+    def _start_value(self, byte: bytes) -> None:
+        if byte == b'"':
+            if self._key == self.field:
+                if self.seen_field:
+                    raise MalformedUploadError(f"Duplicate {self.field!r} field")
+                self.seen_field = True
+                self._state = "blob"
+            else:
+                self._state = "string"
+        elif byte in (b"{", b"["):
+            raise MalformedUploadError("Nested JSON values are not supported")
+        else:
+            self._raw += byte
+            self._state = "literal"
+
+    def _feed_token(self, byte: bytes) -> None:
+        if self._state == "literal":
+            self._append(byte)
+            return
+
+        if self._escaped:
+            self._escaped = False
+        elif byte == b"\\":
+            self._escaped = True
+        elif byte == b'"':
+            self._end_string()
+            return
+        self._append(byte)
+
+    def _append(self, byte: bytes) -> None:
+        if len(self._raw) >= MAX_FIELD_BYTES:
+            raise MalformedUploadError("JSON field is too long")
+        self._raw += byte
+
+    def _end_string(self) -> None:
+        try:
+            value = json.loads(b'"' + bytes(self._raw) + b'"')
+        except ValueError as exc:
+            raise MalformedUploadError("Invalid JSON string") from exc
+        self._raw.clear()
+        if self._state == "key":
+            self._key = value
+            self._state = "colon"
+        else:
+            self._store(value)
+
+    def _end_literal(self) -> None:
+        try:
+            value = json.loads(bytes(self._raw))
+        except ValueError as exc:
+            raise MalformedUploadError("Invalid JSON value") from exc
+        self._raw.clear()
+        self._store(value)
+
+    def _store(self, value: object) -> None:
+        self.fields[self._key or ""] = value
+        self._state = "after_value"
+
+    def _feed_blob(self, chunk: bytes, pos: int, out: bytearray) -> int:
+        if self._escaped:
+            self._escaped = False
+            escape = chunk[pos : pos + 1]
+            if escape == b"/":
+                out += self._decoder.feed(b"/")
+            elif escape not in (b"n", b"r"):
+                # Line breaks are allowed (MIME-style wrapping); nothing else is base64.
+                raise MalformedUploadError("Invalid base64 payload")
+            return pos + 1
+
+        quote = chunk.find(b'"', pos)
+        backslash = chunk.find(b"\\", pos)
+        ends = [idx for idx in (quote, backslash) if idx != -1]
+        end = min(ends) if ends else len(chunk)
+        out += self._decoder.feed(chunk[pos:end])
+        if end == len(chunk):
+            return end
+        if end == backslash:
+            self._escaped = True
+        else:
+            self._state = "after_value"
+        return end + 1
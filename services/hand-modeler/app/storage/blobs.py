@@ -0,0 +1,253 @@
+"""Content-addressed, reference-counted blobs.
+
+Uploaded GLBs are stored once per distinct content under
+``blobs/sha256/<aa>/<digest>``. The digest is computed while the upload is staged,
+so the bytes are read exactly once. A ``storage_blobs`` row counts the hand models
+that point at each blob:
+
+- **store**: an unknown digest is written to the backend *before* its row is
+  inserted, so a row that is not ``deleting`` always has its object. A known digest
+  only takes a reference; its bytes are not written again.
+- **delete**: a blob whose count is zero is first flagged ``deleting`` (only if the
+  count is still zero), then its object and row are removed. Taking a reference
+  requires ``deleting`` to be false, so the two can never interleave badly; an
+  upload that races a deletion waits for it and writes the object again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Final
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from starlette.concurrency import run_in_threadpool
+
+from app.db.models import StorageBlob
+from app.storage.base import ObjectTooLargeError, StorageBackend, StorageError
+
+BLOB_PREFIX: Final[str] = "blobs/sha256"
+
+_CHUNK_SIZE: Final[int] = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class StagedObject:
+    """Bytes staged in a local temp file, with their digest."""
+
+    path: Path
+    sha256: str
+    size: int
+
+
+def blob_key(digest: str) -> str:
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest}"
+
+
+def blob_digest(key: str) -> str | None:
+    """Return the SHA-256 a content-addressed ``key`` names, or ``None``."""
+
+    prefix, _, digest = key.rpartition("/")
+    if prefix != f"{BLOB_PREFIX}/{digest[:2]}" or len(digest) != 64:
+        return None
+    if digest.strip("0123456789abcdef"):
+        return None
+    return digest
+
+
+class StagingWriter:
+    """Stage bytes that arrive piecemeal (e.g. decoded from a request body).
+
+    Each chunk is hashed as it is written. Use as a context manager: the temp file
+    is removed on error, and by the caller once it has been stored.
+    """
+
+    def __init__(self, *, max_bytes: int, staging_dir: Path | None) -> None:
+        if staging_dir is not None:
+            staging_dir.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+        self.path = Path(name)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._file = os.fdopen(fd, "wb")
+        self._hasher = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        """Append ``chunk``.
+
+        Raises:
+            ObjectTooLargeError: once more than ``max_bytes`` have been written.
+        """
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ObjectTooLargeError(f"Object exceeds {self.max_bytes} bytes")
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> StagedObject:
+        self._file.close()
+        return StagedObject(path=self.path, sha256=self._hasher.hexdigest(), size=self.size)
+
+    def __enter__(self) -> StagingWriter:
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self._file.close()
+        if exc_type is not None:
+            self.path.unlink(missing_ok=True)
+
+
+def stage_stream(
+    src: BinaryIO,
+    *,
+    max_bytes: int,
+    staging_dir: Path | None,
+    chunk_size: int = _CHUNK_SIZE,
+) -> StagedObject:
+    """Copy ``src`` to a temp file, hashing each chunk as it is written.
+
+    Raises:
+        ObjectTooLargeError: if ``src`` is larger than ``max_bytes``.
+    """
+
+    with StagingWriter(max_bytes=max_bytes, staging_dir=staging_dir) as writer:
+        while chunk := src.read(chunk_size):
+            writer.write(chunk)
+        return writer.finish()
+
+
+async def store_blob(
+    db: AsyncSession,
+    backend: StorageBackend,
+    staged: StagedObject,
+    *,
+    content_type: str,
+    retry_seconds: float = 0.05,
+    max_attempts: int = 40,
+) -> StorageBlob:
+    """Store ``staged`` under its digest and take one reference to it in ``db``.
+
+    The reference is part of ``db``'s current transaction and becomes durable when
+    the caller commits (together with the hand model that uses it). Call this before
+    making other changes in the transaction: it may roll back to retry. Queries are
+    awaited and the backend write runs in a worker thread, so neither blocks the
+    event loop.
+
+    Raises:
+        StorageError: if the blob stayed mid-deletion for all attempts.
+    """
+
+    key = blob_key(staged.sha256)
+    for _ in range(max_attempts):
+        blob = (
+            await db.execute(
+                select(StorageBlob)
+                .where(StorageBlob.key == key)
+                .execution_options(populate_existing=True)
+            )
+        ).scalar_one_or_none()
+
+        if blob is None:
+            await run_in_threadpool(backend.put_file, key, staged.path, content_type=content_type)
+            blob = StorageBlob(
+                key=key,
+                sha256=staged.sha256,
+                size_bytes=staged.size,
+                content_type=content_type,
+                ref_count=1,
+                deleting=False,
+            )
+            db.add(blob)
+            try:
+                await db.flush()
+            except IntegrityError:
+                # Someone else inserted the same digest first; take a reference instead.
+                await db.rollback()
+                continue
+            return blob
+
+        if not blob.deleting:
+            # RETURNING hands back the new count without a second round trip.
+            ref_count = (
+                await db.execute(
+                    update(StorageBlob)
+                    .where(StorageBlob.key == key, StorageBlob.deleting.is_(False))
+                    .values(ref_count=StorageBlob.ref_count + 1, released_at=None)
+                    .returning(StorageBlob.ref_count)
+                    .execution_options(synchronize_session=False)
+                )
+            ).scalar_one_or_none()
+            if ref_count is not None:
+                set_committed_value(blob, "ref_count", ref_count)
+                set_committed_value(blob, "released_at", None)
+                return blob
+
+        # Mid-deletion: wait for the row to disappear, then write the object again.
+        await db.rollback()
+        await asyncio.sleep(retry_seconds)
+
+    raise StorageError(f"Blob {key} is being deleted")
+
+
+def release_blob(db: Session, key: str, *, now: datetime | None = None) -> bool:
+    """Drop one reference to ``key`` in ``db``'s current transaction.
+
+    ``now`` (default: the current time) is recorded as ``released_at`` when the
+    last reference goes.
+
+    Returns:
+        ``False`` if ``key`` is not a managed blob (e.g. a pre-dedup per-model key).
+    """
+
+    if now is None:
+        now = datetime.now(timezone.utc)
+    result = db.execute(
+        update(StorageBlob)
+        .where(StorageBlob.key == key, StorageBlob.ref_count > 0)
+        .values(
+            ref_count=StorageBlob.ref_count - 1,
+            released_at=case((StorageBlob.ref_count == 1, now), else_=StorageBlob.released_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def delete_blob_if_unreferenced(db: Session, backend: StorageBackend, key: str) -> bool:
+    """Delete ``key``'s object and row if nothing references it.
+
+    Commits ``db``. Also finishes deletions interrupted after the ``deleting`` flag
+    was set.
+
+    Returns:
+        ``True`` if the blob was deleted.
+    """
+
+    result = db.execute(
+        update(StorageBlob)
+        .where(StorageBlob.key == key, StorageBlob.ref_count == 0)
+        .values(deleting=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return False
+
+    backend.delete(key)
+    db.execute(
+        delete(StorageBlob)
+        .where(StorageBlob.key == key, StorageBlob.deleting.is_(True))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return True
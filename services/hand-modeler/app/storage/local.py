@@ -0,0 +1,211 @@
+"""Local-disk storage backend (a directory, or any mounted volume)."""
+
+from __future__ import annotations
+
+import errno
+import mimetypes
+import os
+import threading
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Final
+
+from app.storage.base import (
+    InvalidStorageKeyError,
+    ObjectInfo,
+    ObjectNotFoundError,
+    ObjectTooLargeError,
+    validate_key,
+)
+from app.storage.signing import signed_download_url
+
+_CHUNK_SIZE: Final[int] = 1024 * 1024
+
+STAGING_DIRNAME: Final[str] = ".staging"
+
+FSYNC_POLICIES: Final[tuple[str, ...]] = ("none", "file", "full")
+
+
+def _fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LocalDiskBackend:
+    """Store objects as files under ``root``.
+
+    Objects are written to a temporary sibling and renamed into place, so readers
+    never see partial files. Downloads go through the API's signed download endpoint.
+
+    ``fsync`` controls durability: ``"none"`` leaves flushing to the OS, ``"file"``
+    syncs each object's data before it is renamed into place, and ``"full"`` also
+    syncs the directory so the rename itself survives a crash.
+    """
+
+    def __init__(self, root: Path, *, chunk_size: int = _CHUNK_SIZE, fsync: str = "none") -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync!r}")
+        self.root = root
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+
+    def _publish(self, tmp_path: Path, dest_path: Path) -> None:
+        tmp_path.replace(dest_path)
+        if self.fsync == "full":
+            _fsync_path(dest_path.parent)
+
+    def path_for_key(self, key: str) -> Path:
+        validate_key(key)
+        base = self.root.resolve()
+        path = (base / key).resolve()
+        if base not in path.parents:
+            raise InvalidStorageKeyError(f"Invalid storage key: {key!r}")
+        return path
+
+    def put(
+        self,
+        key: str,
+        src: BinaryIO,
+        *,
+        max_bytes: int,
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        dest_path = self.path_for_key(key)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest_path.with_name(
+            f"{dest_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+
+        size = 0
+        try:
+            with tmp_path.open("wb") as f:
+                while True:
+                    chunk = src.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ObjectTooLargeError(f"Object exceeds {max_bytes} bytes")
+                    f.write(chunk)
+                if self.fsync != "none":
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._publish(tmp_path, dest_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        return size
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str = "application/octet-stream"
+    ) -> None:
+        dest_path = self.path_for_key(key)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest_path.with_name(
+            f"{dest_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            # Hard-link the staged file into place: no data is copied.
+            if self.fsync != "none":
+                _fsync_path(path)
+            os.link(path, tmp_path)
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP):
+                raise
+            with path.open("rb") as f:
+                self.put(key, f, max_bytes=path.stat().st_size, content_type=content_type)
+            return
+        try:
+            self._publish(tmp_path, dest_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def staging_dir(self) -> Path | None:
+        return self.root / STAGING_DIRNAME
+
+    def local_path(self, key: str) -> Path | None:
+        return self.path_for_key(key)
+
+    def get(self, key: str, *, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        path = self.path_for_key(key)
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError(key) from None
+        return self._iter_file(f, start, end)
+
+    def _iter_file(self, f: BinaryIO, start: int, end: int | None) -> Iterator[bytes]:
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                chunk = f.read(size)
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def head(self, key: str) -> ObjectInfo | None:
+        path = self.path_for_key(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(
+            key=key,
+            size=stat.st_size,
+            etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            content_type=mimetypes.guess_type(path.name)[0],
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        )
+
+    def delete(self, key: str) -> None:
+        self.path_for_key(key).unlink(missing_ok=True)
+
+    def list_objects(
+        self, prefix: str, *, start_after: str | None = None, limit: int = 1000
+    ) -> list[ObjectInfo]:
+        objects: list[ObjectInfo] = []
+        for key in self._iter_keys(self.root, "", prefix, start_after):
+            info = self.head(key)
+            if info is not None:
+                objects.append(info)
+                if len(objects) >= limit:
+                    break
+        return objects
+
+    def _iter_keys(
+        self, directory: Path, base: str, prefix: str, start_after: str | None
+    ) -> Iterator[str]:
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        # Sort directories as "name/" so keys come out in plain string order.
+        names = sorted(
+            (entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+            for entry in entries
+        )
+        for name, entry in names:
+            key = base + name
+            if name.endswith("/"):
+                if not (key.startswith(prefix) or prefix.startswith(key)):
+                    continue
+                if start_after is not None and key < start_after[: len(key)]:
+                    continue
+                yield from self._iter_keys(Path(entry.path), key, prefix, start_after)
+            elif key.startswith(prefix) and (start_after is None or key > start_after):
+                yield key
+
+    def presign(
+        self, key: str, *, expires_at: int, base_url: str, issued_at: int | None = None
+    ) -> str:
+        return signed_download_url(base_url, key=validate_key(key), expires=expires_at)
@@ -0,0 +1,418 @@
+"""S3-compatible storage backend (AWS S3, MinIO, Ceph RGW, R2, ...).
+
+Requests are signed with AWS Signature Version 4 and sent over a pooled
+``httpx.Client``, so API nodes share objects through the bucket instead of local
+disk. Objects larger than ``part_size`` are uploaded with multipart upload, which
+keeps at most one part in memory per upload. Keys are addressed path-style
+(``<endpoint>/<bucket>/<key>``), which every S3-compatible server accepts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import BinaryIO, Final
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+import httpx
+
+from app.storage.base import (
+    ObjectInfo,
+    ObjectNotFoundError,
+    ObjectTooLargeError,
+    StorageError,
+    validate_key,
+)
+
+MIN_PART_SIZE: Final[int] = 5 * 1024 * 1024
+MAX_PRESIGN_SECONDS: Final[int] = 7 * 24 * 60 * 60
+
+_ALGORITHM: Final[str] = "AWS4-HMAC-SHA256"
+_UNSIGNED_PAYLOAD: Final[str] = "UNSIGNED-PAYLOAD"
+_CHUNK_SIZE: Final[int] = 1024 * 1024
+
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+class SigV4Signer:
+    """AWS Signature Version 4 for the ``s3`` service."""
+
+    def __init__(self, *, access_key_id: str, secret_access_key: str, region: str) -> None:
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.region = region
+
+    def _scope(self, date: str) -> str:
+        return f"{date}/{self.region}/s3/aws4_request"
+
+    def _signature(self, date: str, string_to_sign: str) -> str:
+        key = _hmac(f"AWS4{self.secret_access_key}".encode("utf-8"), date)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        return hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _canonical_request(
+        method: str,
+        path: str,
+        query: dict[str, str],
+        headers: dict[str, str],
+        payload_hash: str,
+    ) -> tuple[str, str]:
+        # ``path`` is already URI-encoded; S3 does not encode it a second time.
+        canonical_query = "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(query.items()))
+        names = sorted(headers)
+        canonical_headers = "".join(f"{name}:{headers[name].strip()}\n" for name in names)
+        signed_headers = ";".join(names)
+        canonical = "\n".join(
+            [
+                method,
+                path,
+                canonical_query,
+                canonical_headers,
+                signed_headers,
+                payload_hash,
+            ]
+        )
+        return canonical, signed_headers
+
+    def sign_headers(
+        self,
+        method: str,
+        url: str,
+        query: dict[str, str],
+        payload_hash: str,
+        *,
+        now: float | None = None,
+    ) -> dict[str, str]:
+        """Return the ``Authorization`` and ``x-amz-*`` headers for a request."""
+
+        stamp = datetime.fromtimestamp(time.time() if now is None else now, tz=timezone.utc)
+        amz_date = stamp.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+
+        parts = urlsplit(url)
+        headers = {
+            "host": parts.netloc,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+        }
+        canonical, signed_headers = self._canonical_request(
+            method, parts.path, query, headers, payload_hash
+        )
+        string_to_sign = "\n".join(
+            [_ALGORITHM, amz_date, self._scope(date), _sha256_hex(canonical.encode("utf-8"))]
+        )
+        signature = self._signature(date, string_to_sign)
+
+        del headers["host"]
+        headers["authorization"] = (
+            f"{_ALGORITHM} Credential={self.access_key_id}/{self._scope(date)}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return headers
+
+    def presign(self, method: str, url: str, *, expires_in: int, now: float | None = None) -> str:
+        """Return ``url`` with query-string authentication valid for ``expires_in`` seconds."""
+
+        stamp = datetime.fromtimestamp(time.time() if now is None else now, tz=timezone.utc)
+        amz_date = stamp.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+
+        parts = urlsplit(url)
+        query = {
+            "X-Amz-Algorithm": _ALGORITHM,
+            "X-Amz-Credential": f"{self.access_key_id}/{self._scope(date)}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonical, _ = self._canonical_request(
+            method, parts.path, query, {"host": parts.netloc}, _UNSIGNED_PAYLOAD
+        )
+        string_to_sign = "\n".join(
+            [_ALGORITHM, amz_date, self._scope(date), _sha256_hex(canonical.encode("utf-8"))]
+        )
+        query["X-Amz-Signature"] = self._signature(date, string_to_sign)
+        encoded = "&".join(f"{_quote(k)}={_quote(v)}" for k, v in query.items())
+        return f"{url}?{encoded}"
+
+
+class S3Backend:
+    """Store objects in an S3-compatible bucket."""
+
+    def __init__(
+        self,
+        *,
+        endpoint_url: str,
+        bucket: str,
+        access_key_id: str,
+        secret_access_key: str,
+        region: str = "us-east-1",
+        part_size: int = 8 * 1024 * 1024,
+        max_connections: int = 16,
+        timeout_seconds: float = 30.0,
+        transport: httpx.BaseTransport | None = None,
+    ) -> None:
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.part_size = part_size
+        self.signer = SigV4Signer(
+            access_key_id=access_key_id, secret_access_key=secret_access_key, region=region
+        )
+        self._client = httpx.Client(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+            transport=transport,
+        )
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _url(self, key: str) -> str:
+        return f"{self.endpoint_url}/{self.bucket}/{_quote(validate_key(key), safe='/-_.~')}"
+
+    def _bucket_url(self) -> str:
+        return f"{self.endpoint_url}/{self.bucket}"
+
+    def _request(
+        self,
+        method: str,
+        key: str | None,
+        *,
+        query: dict[str, str] | None = None,
+        content: bytes = b"",
+        headers: dict[str, str] | None = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        url = self._bucket_url() if key is None else self._url(key)
+        query = query or {}
+        signed = self.signer.sign_headers(method, url, query, _sha256_hex(content))
+        request = self._client.build_request(
+            method,
+            url,
+            params=query,
+            content=content or None,
+            headers={**(headers or {}), **signed},
+        )
+        try:
+            return self._client.send(request, stream=stream)
+        except httpx.HTTPError as exc:
+            raise StorageError(f"S3 {method} {key or self.bucket} failed: {exc}") from exc
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response, key: str) -> None:
+        if response.status_code == 404:
+            raise ObjectNotFoundError(key)
+        if response.status_code >= 300:
+            response.read()
+            raise StorageError(
+                f"S3 request for {key} failed with {response.status_code}: {response.text[:200]}"
+            )
+
+    def _read_part(self, src: BinaryIO, limit: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < limit:
+            chunk = src.read(min(_CHUNK_SIZE, limit - len(buf)))
+            if not chunk:
+                break
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def put(
+        self,
+        key: str,
+        src: BinaryIO,
+        *,
+        max_bytes: int,
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        # Read one byte past the limit so an oversized single-part object is detected.
+        first = self._read_part(src, min(self.part_size, max_bytes + 1))
+        if len(first) > max_bytes:
+            raise ObjectTooLargeError(f"Object exceeds {max_bytes} bytes")
+        if len(first) < self.part_size:
+            response = self._request(
+                "PUT", key, content=first, headers={"content-type": content_type}
+            )
+            self._raise_for_status(response, key)
+            return len(first)
+
+        return self._put_multipart(key, src, first, max_bytes=max_bytes, content_type=content_type)
+
+    def _put_multipart(
+        self, key: str, src: BinaryIO, first: bytes, *, max_bytes: int, content_type: str
+    ) -> int:
+        response = self._request(
+            "POST", key, query={"uploads": ""}, headers={"content-type": content_type}
+        )
+        self._raise_for_status(response, key)
+        upload_id = _find_text(response.content, "UploadId")
+        if upload_id is None:
+            raise StorageError(f"S3 did not return an UploadId for {key}")
+
+        etags: list[str] = []
+        size = 0
+        try:
+            part = first
+            while part:
+                size += len(part)
+                if size > max_bytes:
+                    raise ObjectTooLargeError(f"Object exceeds {max_bytes} bytes")
+                response = self._request(
+                    "PUT",
+                    key,
+                    query={"partNumber": str(len(etags) + 1), "uploadId": upload_id},
+                    content=part,
+                )
+                self._raise_for_status(response, key)
+                etags.append(response.headers.get("etag", ""))
+                part = self._read_part(src, self.part_size)
+
+            body = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, start=1)
+            )
+            response = self._request(
+                "POST",
+                key,
+                query={"uploadId": upload_id},
+                content=(
+                    f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode("utf-8")
+                ),
+                headers={"content-type": "application/xml"},
+            )
+            self._raise_for_status(response, key)
+            # CompleteMultipartUpload may report failure in a 200 response body.
+            if _find_text(response.content, "Code") is not None:
+                raise StorageError(f"S3 multipart upload for {key} failed: {response.text[:200]}")
+        except BaseException:
+            try:
+                self._request("DELETE", key, query={"uploadId": upload_id}).close()
+            except StorageError:  # pragma: no cover
+                pass
+            raise
+
+        return size
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str = "application/octet-stream"
+    ) -> None:
+        with path.open("rb") as f:
+            self.put(key, f, max_bytes=path.stat().st_size, content_type=content_type)
+
+    def staging_dir(self) -> Path | None:
+        return None
+
+    def local_path(self, key: str) -> Path | None:
+        return None
+
+    def get(self, key: str, *, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["range"] = f"bytes={start}-{'' if end is None else end}"
+        response = self._request("GET", key, headers=headers, stream=True)
+        try:
+            self._raise_for_status(response, key)
+        except StorageError:
+            response.close()
+            raise
+        return self._iter_response(response)
+
+    @staticmethod
+    def _iter_response(response: httpx.Response) -> Iterator[bytes]:
+        try:
+            yield from response.iter_bytes(_CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def head(self, key: str) -> ObjectInfo | None:
+        response = self._request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        self._raise_for_status(response, key)
+
+        last_modified = response.headers.get("last-modified")
+        return ObjectInfo(
+            key=key,
+            size=int(response.headers.get("content-length", "0")),
+            etag=(response.headers.get("etag") or "").strip('"') or None,
+            content_type=response.headers.get("content-type"),
+            last_modified=parsedate_to_datetime(last_modified) if last_modified else None,
+        )
+
+    def delete(self, key: str) -> None:
+        response = self._request("DELETE", key)
+        if response.status_code != 404:
+            self._raise_for_status(response, key)
+
+    def list_objects(
+        self, prefix: str, *, start_after: str | None = None, limit: int = 1000
+    ) -> list[ObjectInfo]:
+        query = {"list-type": "2", "prefix": prefix, "max-keys": str(min(limit, 1000))}
+        if start_after is not None:
+            query["start-after"] = start_after
+        response = self._request("GET", None, query=query)
+        self._raise_for_status(response, prefix)
+
+        try:
+            root = ElementTree.fromstring(response.content)
+        except ElementTree.ParseError as exc:
+            raise StorageError(f"S3 returned an invalid listing for {prefix!r}") from exc
+        objects = []
+        for element in root.iter():
+            if element.tag.rsplit("}", 1)[-1] != "Contents":
+                continue
+            fields = {child.tag.rsplit("}", 1)[-1]: child.text or "" for child in element}
+            last_modified = fields.get("LastModified")
+            objects.append(
+                ObjectInfo(
+                    key=fields["Key"],
+                    size=int(fields.get("Size") or 0),
+                    etag=fields.get("ETag", "").strip('"') or None,
+                    last_modified=(
+                        datetime.fromisoformat(last_modified.replace("Z", "+00:00"))
+                        if last_modified
+                        else None
+                    ),
+                )
+            )
+        return objects
+
+    def presign(
+        self, key: str, *, expires_at: int, base_url: str, issued_at: int | None = None
+    ) -> str:
+        issued_at = int(time.time()) if issued_at is None else issued_at
+        expires_in = min(max(1, expires_at - issued_at), MAX_PRESIGN_SECONDS)
+        return self.signer.presign("GET", self._url(key), expires_in=expires_in, now=issued_at)
+
+
+def _find_text(xml: bytes, tag: str) -> str | None:
+    """Return the text of the first ``tag`` element, ignoring XML namespaces."""
+
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text
+    return None
@@ -0,0 +1,86 @@
+"""HMAC-signed download URLs for the API's own storage download endpoint.
+
+URLs name the signing key they were made with (``kid``), so the secret can rotate:
+new URLs use ``STORAGE_SIGNING_KEY_ID`` while every key in ``STORAGE_SIGNING_KEYS``
+still verifies. URLs without a ``kid`` use ``STORAGE_SIGNING_SECRET``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+from functools import lru_cache
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+
+@lru_cache(maxsize=4096)
+def _hmac_sha256_hex(secret: str, message: str) -> str:
+    # Memoized: with bucketed expiries the same (key, expires) is signed over and over.
+    return hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _signing_secret(key_id: str | None) -> str:
+    if not key_id:
+        return settings.storage_signing_secret
+    try:
+        return settings.storage_signing_keys[key_id]
+    except KeyError:
+        raise HTTPException(status_code=403, detail="Unknown signing key") from None
+
+
+def url_validity(now: float | None = None) -> tuple[int, int]:
+    """Return ``(issued_at, expires)`` for a URL signed at ``now``.
+
+    Both are rounded to ``signed_url_bucket_seconds``, so every URL for an object
+    signed within one bucket is identical. A URL is valid for at least
+    ``signed_url_ttl_seconds``.
+    """
+
+    now = int(time.time() if now is None else now)
+    bucket = settings.signed_url_bucket_seconds
+    if bucket <= 0:
+        return now, now + settings.signed_url_ttl_seconds
+    issued_at = now - now % bucket
+    return issued_at, issued_at + bucket + settings.signed_url_ttl_seconds
+
+
+def sign_storage_key(*, key: str, expires: int, key_id: str | None = None) -> str:
+    """Create an HMAC signature for a storage key and expiry timestamp.
+
+    Raises:
+        HTTPException: if ``key_id`` is not a configured signing key.
+    """
+
+    payload = f"{key}:{expires}"
+    return _hmac_sha256_hex(_signing_secret(key_id), payload)
+
+
+def verify_storage_signature(
+    *, key: str, expires: int, sig: str, key_id: str | None = None
+) -> None:
+    """Validate expiry and signature.
+
+    Raises:
+        HTTPException: if the signature is invalid or expired.
+    """
+
+    if int(time.time()) > expires:
+        raise HTTPException(status_code=403, detail="Signed URL has expired")
+
+    expected = sign_storage_key(key=key, expires=expires, key_id=key_id)
+    if not hmac.compare_digest(expected, sig):
+        raise HTTPException(status_code=403, detail="Invalid signed URL")
+
+
+def signed_download_url(base_url: str, *, key: str, expires: int) -> str:
+    key_id = settings.storage_signing_key_id or None
+    params: dict[str, str | int] = {"key": key, "expires": expires}
+    if key_id is not None:
+        params["kid"] = key_id
+    params["sig"] = sign_storage_key(key=key, expires=expires, key_id=key_id)
+    return f"{base_url}?{urlencode(params)}"
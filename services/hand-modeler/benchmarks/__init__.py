@@ -0,0 +1 @@
+"""Ad-hoc performance benchmarks (not run by the test suite)."""
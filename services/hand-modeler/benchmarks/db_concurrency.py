@@ -0,0 +1,178 @@
+"""Request concurrency with a slow database: blocking sessions vs ``AsyncSession``.
+
+Runs the queries of ``GET /sessions/{id}/poll`` from many concurrent coroutines,
+the way request handlers do, in two modes:
+
+- ``sync``: a regular ``Session`` called from the coroutine (the old handlers),
+  so each query blocks the event loop while it runs
+- ``async``: an ``AsyncSession`` on aiosqlite, whose queries are awaited
+
+Database latency is simulated with a ``db_latency()`` SQL function that sleeps
+inside the driver, as a slow disk or a remote database would. Reports requests/s,
+latency percentiles and the longest event loop stall for each mode.
+
+    python -m benchmarks.db_concurrency --latency-ms 5 --concurrency 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import Select, create_engine, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.base import Base
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+
+
+def _add_latency_function(engine: Engine, latency: float) -> None:
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection: object, _record: object) -> None:
+        def db_latency() -> int:
+            time.sleep(latency)
+            return 0
+
+        dbapi_connection.create_function("db_latency", 0, db_latency)  # type: ignore[attr-defined]
+
+
+def _seed(factory: sessionmaker[Session], *, sessions: int, models: int) -> list[str]:
+    now = datetime.now(timezone.utc)
+    session_ids = []
+    with factory() as db:
+        for _ in range(sessions):
+            inviter = User(id=secrets.token_hex(16), display_name="A")
+            partner = User(id=secrets.token_hex(16), display_name="B")
+            session = PairSession(
+                id=secrets.token_hex(16),
+                share_code=secrets.token_hex(4),
+                inviter_user_id=inviter.id,
+                partner_user_id=partner.id,
+                paired_at=now,
+            )
+            db.add_all([inviter, partner, session])
+            for idx in range(models):
+                db.add(
+                    HandModel(
+                        id=secrets.token_hex(16),
+                        session_id=session.id,
+                        owner_user_id=inviter.id,
+                        storage_key=f"hand-models/{secrets.token_hex(8)}.glb",
+                        file_size_bytes=1024,
+                        created_at=now - timedelta(seconds=idx),
+                    )
+                )
+            session_ids.append(session.id)
+        db.commit()
+    return session_ids
+
+
+def _poll_statements(session_id: str) -> list[Select]:
+    return [
+        select(func.db_latency()),
+        select(PairSession).where(PairSession.id == session_id),
+        select(HandModel)
+        .where(HandModel.session_id == session_id)
+        .order_by(HandModel.created_at.desc())
+        .limit(1),
+    ]
+
+
+async def _run(
+    name: str,
+    requests: int,
+    concurrency: int,
+    poll: Callable[[str], Awaitable[None]],
+    session_ids: list[str],
+) -> None:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    stalls: list[float] = [0.0]
+    done = asyncio.Event()
+
+    async def heartbeat(interval: float = 0.001) -> None:
+        last = loop.time()
+        while not done.is_set():
+            await asyncio.sleep(interval)
+            now = loop.time()
+            stalls.append(now - last - interval)
+            last = now
+
+    async def one(idx: int) -> None:
+        # All requests arrive at once; latency includes the time spent queued.
+        async with semaphore:
+            await poll(session_ids[idx % len(session_ids)])
+        latencies.append(time.perf_counter() - started)
+
+    monitor = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(idx) for idx in range(requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await monitor
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<6} {requests / elapsed:8.1f} req/s"
+        f"  p50 {quantiles[49] * 1000:7.1f} ms  p99 {quantiles[98] * 1000:7.1f} ms"
+        f"  max loop stall {max(stalls) * 1000:7.1f} ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    latency = args.latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        _add_latency_function(engine, latency)
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine, expire_on_commit=False)
+        session_ids = _seed(factory, sessions=args.sessions, models=args.models)
+
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}", pool_size=args.concurrency, max_overflow=0
+        )
+        _add_latency_function(async_engine.sync_engine, latency)
+        async_factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+        async def poll_sync(session_id: str) -> None:
+            with factory() as db:
+                for statement in _poll_statements(session_id):
+                    db.execute(statement).first()
+
+        async def poll_async(session_id: str) -> None:
+            async with async_factory() as db:
+                for statement in _poll_statements(session_id):
+                    (await db.execute(statement)).first()
+
+        print(
+            f"{args.requests} polls, concurrency {args.concurrency}, "
+            f"{args.latency_ms} ms simulated database latency"
+        )
+        try:
+            await _run("sync", args.requests, args.concurrency, poll_sync, session_ids)
+            await _run("async", args.requests, args.concurrency, poll_async, session_ids)
+        finally:
+            await async_engine.dispose()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--models", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
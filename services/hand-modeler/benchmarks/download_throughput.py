@@ -0,0 +1,151 @@
+"""Throughput of ``/api/storage/download`` for large GLBs under concurrency.
+
+Stores a few large random objects in a temporary local backend, then downloads
+them concurrently (whole, resumed with ``Range`` and revalidated with
+``If-None-Match``) and reports requests/s and MB/s for each mode.
+
+Runs against a real uvicorn server when uvicorn is installed, so socket writes are
+part of the measurement; otherwise it runs in process over ASGI.
+
+    python -m benchmarks.download_throughput --size-mb 32 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+
+from app.main import app
+from app.storage import LocalDiskBackend, blob_key, get_storage_backend, sign_storage_key
+
+
+def _store_objects(backend: LocalDiskBackend, *, count: int, size: int) -> list[str]:
+    keys = []
+    for _ in range(count):
+        data = os.urandom(size)
+        key = blob_key(hashlib.sha256(data).hexdigest())
+        backend.put(key, BytesIO(data), max_bytes=size)
+        keys.append(key)
+    return keys
+
+
+def _signed_params(key: str) -> dict[str, str | int]:
+    expires = int(time.time()) + 3600
+    return {"key": key, "expires": expires, "sig": sign_storage_key(key=key, expires=expires)}
+
+
+@asynccontextmanager
+async def _client() -> AsyncIterator[httpx.AsyncClient]:
+    try:
+        import uvicorn
+    except ImportError:
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print("uvicorn not installed: measuring in process over ASGI")
+            yield client
+        return
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.01)
+    limits = httpx.Limits(max_connections=64)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        yield client
+    server.should_exit = True
+    thread.join()
+
+
+async def _run(
+    name: str,
+    requests: int,
+    concurrency: int,
+    fetch: Callable[[int], Awaitable[int]],
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(idx: int) -> int:
+        async with semaphore:
+            return await fetch(idx)
+
+    started = time.perf_counter()
+    sizes = await asyncio.gather(*(one(idx) for idx in range(requests)))
+    elapsed = time.perf_counter() - started
+    megabytes = sum(sizes) / (1024 * 1024)
+    print(
+        f"{name:<12} {requests / elapsed:8.1f} req/s {megabytes / elapsed:9.1f} MB/s"
+        f"  ({requests} requests, {elapsed:.2f}s)"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = LocalDiskBackend(Path(tmp))
+        keys = _store_objects(backend, count=args.objects, size=size)
+        app.dependency_overrides[get_storage_backend] = lambda: backend
+        try:
+            async with _client() as client:
+                etags: dict[str, str] = {}
+
+                async def full(idx: int) -> int:
+                    key = keys[idx % len(keys)]
+                    response = await client.get("/api/storage/download", params=_signed_params(key))
+                    response.raise_for_status()
+                    etags[key] = response.headers["etag"]
+                    return len(response.content)
+
+                async def resume(idx: int) -> int:
+                    key = keys[idx % len(keys)]
+                    response = await client.get(
+                        "/api/storage/download",
+                        params=_signed_params(key),
+                        headers={"Range": f"bytes={size // 2}-", "If-Range": etags[key]},
+                    )
+                    assert response.status_code == 206, response.status_code
+                    return len(response.content)
+
+                async def revalidate(idx: int) -> int:
+                    key = keys[idx % len(keys)]
+                    response = await client.get(
+                        "/api/storage/download",
+                        params=_signed_params(key),
+                        headers={"If-None-Match": etags[key]},
+                    )
+                    assert response.status_code == 304, response.status_code
+                    return 0
+
+                print(
+                    f"{args.objects} objects x {args.size_mb} MB, "
+                    f"concurrency {args.concurrency}"
+                )
+                await _run("full", args.requests, args.concurrency, full)
+                await _run("range", args.requests, args.concurrency, resume)
+                await _run("revalidate", args.requests, args.concurrency, revalidate)
+        finally:
+            app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
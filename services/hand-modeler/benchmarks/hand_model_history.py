@@ -0,0 +1,116 @@
+"""History page latency by depth: keyset cursor vs ``OFFSET``.
+
+Seeds one session with a long history in a temporary SQLite database, then times
+fetching a page at increasing depths two ways:
+
+- ``offset``: ``ORDER BY created_at DESC, id DESC LIMIT n OFFSET depth``
+- ``keyset``: :func:`app.db.queries.session_hand_models` resumed from the cursor
+  at that depth, through the ``(session_id, created_at, id)`` index
+
+    python -m benchmarks.hand_model_history --models 500000 --limit 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.base import Base
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+from app.db.queries import HandModelCursor, session_hand_models
+from app.db.session import _async_sessionmaker
+
+_BATCH = 50_000
+
+
+def _seed(url: str, models: int) -> None:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{"id": "u", "display_name": "U"}])
+        connection.execute(
+            PairSession.__table__.insert(),
+            [{"id": "s", "share_code": "S", "inviter_user_id": "u", "partner_user_id": None}],
+        )
+        for start in range(0, models, _BATCH):
+            connection.execute(
+                HandModel.__table__.insert(),
+                [
+                    {
+                        "id": secrets.token_hex(16),
+                        "session_id": "s",
+                        "owner_user_id": "u",
+                        "storage_key": "blobs/sha256/00/0",
+                        "created_at": now - timedelta(seconds=idx),
+                    }
+                    for idx in range(start, min(start + _BATCH, models))
+                ],
+            )
+    engine.dispose()
+
+
+async def _run(url: str, args: argparse.Namespace) -> None:
+    engine = create_async_engine(url.replace("sqlite:", "sqlite+aiosqlite:"))
+    factory = _async_sessionmaker(engine)
+    depths = [
+        depth for depth in (0, 1_000, 10_000, 100_000, args.models - args.limit) if depth >= 0
+    ]
+    print(f"{'depth':>9} {'offset':>12} {'keyset':>12}")
+    async with factory() as db:
+        for depth in depths:
+            offset_query = (
+                select(*HandModel.__table__.c)
+                .where(HandModel.session_id == "s")
+                .order_by(HandModel.created_at.desc(), HandModel.id.desc())
+                .limit(args.limit)
+            )
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                rows = (await db.execute(offset_query.offset(depth))).mappings().all()
+            offset_us = (time.perf_counter() - started) / args.repeat * 1e6
+
+            after = None
+            if depth:
+                # The cursor a client would hold after paging down to ``depth``.
+                previous = (
+                    (await db.execute(offset_query.offset(depth - 1).limit(1))).mappings().one()
+                )
+                after = HandModelCursor(created_at=previous["created_at"], id=previous["id"])
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                page = await session_hand_models(db, "s", after=after, limit=args.limit)
+            keyset_us = (time.perf_counter() - started) / args.repeat * 1e6
+
+            # Both must agree.
+            assert page is not None and [row["id"] for row in page.rows] == [
+                row["id"] for row in rows
+            ]
+            print(f"{depth:>9} {offset_us:>9.0f} us {keyset_us:>9.0f} us")
+    await engine.dispose()
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        started = time.perf_counter()
+        _seed(url, args.models)
+        print(f"seeded {args.models} hand models ({time.perf_counter() - started:.1f}s)")
+        asyncio.run(_run(url, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
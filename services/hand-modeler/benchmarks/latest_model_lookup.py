@@ -0,0 +1,139 @@
+"""Latest-model lookup for polling at millions of hand models.
+
+Seeds a temporary SQLite database, then times the poll lookup (session plus its
+newest model) two ways:
+
+- ``subquery``: ``ORDER BY created_at DESC LIMIT 1`` per session, through the
+  ``(session_id, created_at, id)`` index
+- ``pointer``: the denormalized ``sessions.latest_hand_model_id``, i.e. two
+  primary-key reads
+
+It also times backfilling the pointer for every session, as ``migrate`` does on an
+existing database.
+
+    python -m benchmarks.latest_model_lookup --models 2000000 --sessions 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import secrets
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import Select, create_engine, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import aliased
+
+from app.db.base import Base
+from app.db.migrations import backfill_latest_hand_models
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+from app.db.queries import latest_hand_model_id
+
+_BATCH = 50_000
+
+
+def _seed(connection: Connection, *, sessions: int, models: int) -> list[str]:
+    now = datetime.now(timezone.utc)
+    connection.execute(User.__table__.insert(), [{"id": "u", "display_name": "U"}])
+    session_ids = [secrets.token_hex(16) for _ in range(sessions)]
+    for start in range(0, sessions, _BATCH):
+        connection.execute(
+            PairSession.__table__.insert(),
+            [
+                {"id": session_id, "share_code": session_id[:12], "inviter_user_id": "u"}
+                for session_id in session_ids[start : start + _BATCH]
+            ],
+        )
+    for start in range(0, models, _BATCH):
+        connection.execute(
+            HandModel.__table__.insert(),
+            [
+                {
+                    "id": secrets.token_hex(16),
+                    "session_id": random.choice(session_ids),
+                    "owner_user_id": "u",
+                    "storage_key": "blobs/sha256/00/0",
+                    "created_at": now - timedelta(seconds=random.randrange(10**7)),
+                }
+                for _ in range(start, min(start + _BATCH, models))
+            ],
+        )
+    return session_ids
+
+
+def _subquery_lookup(session_id: str) -> Select:
+    latest = aliased(HandModel)
+    return (
+        select(PairSession, latest)
+        .outerjoin(latest, latest.id == latest_hand_model_id(PairSession.id))
+        .where(PairSession.id == session_id)
+    )
+
+
+def _pointer_lookup(session_id: str) -> Select:
+    return (
+        select(PairSession, HandModel)
+        .outerjoin(HandModel, HandModel.id == PairSession.latest_hand_model_id)
+        .where(PairSession.id == session_id)
+    )
+
+
+def _time_lookups(
+    connection: Connection, name: str, lookup: Callable[[str], Select], sample: list[str]
+) -> None:
+    started = time.perf_counter()
+    for session_id in sample:
+        connection.execute(lookup(session_id)).first()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<9} {len(sample) / elapsed:9.0f} lookups/s"
+        f"  {elapsed / len(sample) * 1e6:8.1f} us/lookup"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(engine)
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            session_ids = _seed(connection, sessions=args.sessions, models=args.models)
+        print(
+            f"seeded {args.models} hand models in {args.sessions} sessions "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+        started = time.perf_counter()
+        backfilled = backfill_latest_hand_models(engine, batch_size=args.batch_size)
+        print(f"backfill  {backfilled} sessions in {time.perf_counter() - started:.1f}s")
+
+        sample = random.choices(session_ids, k=args.lookups)
+        with engine.connect() as connection:
+            # Warm the page cache so both variants read from memory.
+            _time_lookups(connection, "warmup", _pointer_lookup, sample[:1000])
+            _time_lookups(connection, "subquery", _subquery_lookup, sample)
+            _time_lookups(connection, "pointer", _pointer_lookup, sample)
+
+            # Both must agree.
+            for session_id in sample[:1000]:
+                a = connection.execute(_subquery_lookup(session_id)).first()
+                b = connection.execute(_pointer_lookup(session_id)).first()
+                assert a is not None and b is not None and a[1] == b[1]
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    main(parser.parse_args())
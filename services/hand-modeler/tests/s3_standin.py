@@ -0,0 +1,246 @@
+"""A minimal S3-compatible server for exercising the S3 storage backend.
+
+It implements just enough of the S3 REST API (object PUT/GET/HEAD/DELETE, ranged
+GET, multipart upload and presigned GET) and checks every request's SigV4
+signature, so client-side signing and encoding mistakes fail the tests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from calendar import timegm
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import strptime
+from urllib.parse import parse_qsl, urlsplit
+from uuid import uuid4
+
+from app.storage.s3 import SigV4Signer
+
+ACCESS_KEY_ID = "standin-access-key"
+SECRET_ACCESS_KEY = "standin-secret-key"
+REGION = "us-east-1"
+
+
+@dataclass
+class StandinState:
+    objects: dict[str, tuple[bytes, str]] = field(default_factory=dict)
+    uploads: dict[str, dict[int, bytes]] = field(default_factory=dict)
+    completed_parts: dict[str, int] = field(default_factory=dict)
+    modified: dict[str, float] = field(default_factory=dict)
+    connections: set[int] = field(default_factory=set)
+    requests: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _amz_time(amz_date: str) -> float:
+    return float(timegm(strptime(amz_date, "%Y%m%dT%H%M%SZ")))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _StandinServer
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    @property
+    def state(self) -> StandinState:
+        return self.server.state
+
+    def _reply(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _authorized(self, path: str, query: dict[str, str], body: bytes) -> bool:
+        signer = SigV4Signer(
+            access_key_id=ACCESS_KEY_ID, secret_access_key=SECRET_ACCESS_KEY, region=REGION
+        )
+        url = f"http://{self.headers['host']}{path}"
+
+        if "X-Amz-Signature" in query:
+            params = dict(query)
+            signature = params.pop("X-Amz-Signature")
+            expected = signer.presign(
+                self.command,
+                url,
+                expires_in=int(params["X-Amz-Expires"]),
+                now=_amz_time(params["X-Amz-Date"]),
+            )
+            return expected.endswith(f"X-Amz-Signature={signature}")
+
+        payload_hash = self.headers.get("x-amz-content-sha256", "")
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        expected_headers = signer.sign_headers(
+            self.command,
+            url,
+            query,
+            payload_hash,
+            now=_amz_time(self.headers.get("x-amz-date", "19700101T000000Z")),
+        )
+        return expected_headers["authorization"] == self.headers.get("authorization")
+
+    def _handle(self) -> None:
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.connections.add(self.client_address[1])
+
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        length = int(self.headers.get("content-length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if not self._authorized(parts.path, query, body):
+            self._reply(403, b"<Error><Code>SignatureDoesNotMatch</Code></Error>")
+            return
+
+        _, bucket, *rest = parts.path.split("/", 2)
+        if not rest or not rest[0]:
+            self._list(bucket, query)
+            return
+        key = f"{bucket}/{rest[0]}"
+        handler = getattr(self, f"_do_{self.command.lower()}")
+        handler(key, query, body)
+
+    do_GET = do_PUT = do_POST = do_HEAD = do_DELETE = _handle
+
+    def _do_put(self, key: str, query: dict[str, str], body: bytes) -> None:
+        if "uploadId" in query:
+            upload = self.state.uploads.get(query["uploadId"])
+            if upload is None:
+                self._reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                return
+            upload[int(query["partNumber"])] = body
+            self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+            return
+
+        content_type = self.headers.get("content-type", "application/octet-stream")
+        self.state.objects[key] = (body, content_type)
+        self.state.modified[key] = time.time()
+        self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _do_post(self, key: str, query: dict[str, str], body: bytes) -> None:
+        if "uploads" in query:
+            upload_id = uuid4().hex
+            self.state.uploads[upload_id] = {}
+            xml = (
+                "<InitiateMultipartUploadResult>"
+                f"<UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            )
+            self._reply(200, xml.encode("utf-8"))
+            return
+
+        upload = self.state.uploads.pop(query["uploadId"])
+        data = b"".join(upload[number] for number in sorted(upload))
+        self.state.objects[key] = (data, "application/octet-stream")
+        self.state.modified[key] = time.time()
+        self.state.completed_parts[key] = len(upload)
+        self._reply(200, b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>")
+
+    def _list(self, bucket: str, query: dict[str, str]) -> None:
+        prefix = f"{bucket}/{query.get('prefix', '')}"
+        start_after = f"{bucket}/{query['start-after']}" if "start-after" in query else ""
+        keys = sorted(k for k in self.state.objects if k.startswith(prefix) and k > start_after)
+        contents = []
+        for key in keys[: int(query.get("max-keys", "1000"))]:
+            modified = datetime.fromtimestamp(self.state.modified.get(key, 0.0), tz=timezone.utc)
+            contents.append(
+                f"<Contents><Key>{key.split('/', 1)[1]}</Key>"
+                f"<Size>{len(self.state.objects[key][0])}</Size>"
+                f"<LastModified>{modified.strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+                "</Contents>"
+            )
+        xml = f"<ListBucketResult>{''.join(contents)}</ListBucketResult>"
+        self._reply(200, xml.encode("utf-8"))
+
+    def _do_get(self, key: str, query: dict[str, str], body: bytes) -> None:
+        stored = self.state.objects.get(key)
+        if stored is None:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+            return
+
+        data, content_type = stored
+        range_header = self.headers.get("range")
+        if range_header:
+            first, _, last = range_header.removeprefix("bytes=").partition("-")
+            start = int(first)
+            end = int(last) if last else len(data) - 1
+            self._reply(
+                206,
+                data[start : end + 1],
+                headers={
+                    "Content-Type": content_type,
+                    "Content-Range": f"bytes {start}-{end}/{len(data)}",
+                },
+            )
+            return
+        self._reply(200, data, headers={"Content-Type": content_type})
+
+    def _do_head(self, key: str, query: dict[str, str], body: bytes) -> None:
+        stored = self.state.objects.get(key)
+        if stored is None:
+            self._reply(404)
+            return
+        data, content_type = stored
+        self._reply(
+            200,
+            headers={
+                "Content-Type": content_type,
+                "Content-Length": str(len(data)),
+                "ETag": f'"{hashlib.md5(data).hexdigest()}"',
+                "Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT",
+            },
+        )
+
+    def _do_delete(self, key: str, query: dict[str, str], body: bytes) -> None:
+        if "uploadId" in query:
+            self.state.uploads.pop(query["uploadId"], None)
+        else:
+            self.state.objects.pop(key, None)
+        self._reply(204)
+
+
+class _StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.state = StandinState()
+
+
+class S3Standin:
+    """Run the stand-in server on a background thread."""
+
+    def __init__(self) -> None:
+        self._server = _StandinServer()
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self) -> StandinState:
+        return self._server.state
+
+    def __enter__(self) -> S3Standin:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
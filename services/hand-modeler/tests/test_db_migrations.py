@@ -0,0 +1,149 @@
+"""Tests for upgrading databases created by earlier versions."""
+
+from __future__ import annotations
+
+import secrets
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.engine import Engine
+
+from app.db.base import Base
+from app.db.migrations import migrate
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+# The schema ``create_all`` produced before any migration existed.
+BASELINE_SCHEMA = (
+    """
+    CREATE TABLE users (
+        id VARCHAR(36) NOT NULL,
+        display_name VARCHAR(120) NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE sessions (
+        id VARCHAR(36) NOT NULL,
+        share_code VARCHAR(16) NOT NULL,
+        inviter_user_id VARCHAR(36) NOT NULL,
+        partner_user_id VARCHAR(36),
+        created_at DATETIME NOT NULL,
+        paired_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(inviter_user_id) REFERENCES users (id),
+        FOREIGN KEY(partner_user_id) REFERENCES users (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX ix_sessions_share_code ON sessions (share_code)",
+    "CREATE INDEX ix_sessions_inviter_user_id ON sessions (inviter_user_id)",
+    """
+    CREATE TABLE hand_models (
+        id VARCHAR(36) NOT NULL,
+        session_id VARCHAR(36) NOT NULL,
+        owner_user_id VARCHAR(36) NOT NULL,
+        storage_key VARCHAR(512) NOT NULL,
+        file_size_bytes INTEGER NOT NULL,
+        content_type VARCHAR(128) NOT NULL,
+        created_at DATETIME NOT NULL,
+        retrieved_at DATETIME,
+        confirmed_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(session_id) REFERENCES sessions (id),
+        FOREIGN KEY(owner_user_id) REFERENCES users (id)
+    )
+    """,
+    "CREATE INDEX ix_hand_models_owner_user_id ON hand_models (owner_user_id)",
+    "CREATE INDEX ix_hand_models_created_at ON hand_models (created_at)",
+    "CREATE INDEX ix_hand_models_session_id ON hand_models (session_id)",
+)
+
+
+def _schema(engine: Engine) -> dict[str, tuple[set[str], set[str]]]:
+    inspector = inspect(engine)
+    return {
+        table: (
+            {column["name"] for column in inspector.get_columns(table)},
+            {str(index["name"]) for index in inspector.get_indexes(table)},
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def test_an_upgraded_baseline_database_matches_a_fresh_one(tmp_path: Path) -> None:
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    Base.metadata.create_all(fresh)
+
+    upgraded = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with upgraded.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+    # What init_db does on startup.
+    Base.metadata.create_all(upgraded)
+    migrate(upgraded)
+
+    assert _schema(upgraded) == _schema(fresh)
+    fresh.dispose()
+    upgraded.dispose()
+
+
+def test_migrate_upgrades_the_schema_and_backfills_the_latest_model_pointer(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(engine)
+    # Roll the schema back to before the pointer and the keyset indexes existed.
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_sessions_latest_hand_model_id")
+        connection.exec_driver_sql("DROP INDEX ix_hand_models_session_id_created_at_id")
+        connection.exec_driver_sql("DROP INDEX ix_hand_models_owner_user_id_created_at_id")
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_hand_models_owner_user_id ON hand_models (owner_user_id)"
+        )
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_hand_models_session_id_created_at"
+            " ON hand_models (session_id, created_at)"
+        )
+        connection.exec_driver_sql("ALTER TABLE sessions DROP COLUMN latest_hand_model_id")
+
+    user = {"id": "u", "display_name": "A", "created_at": T0}
+    sessions = [
+        {"id": f"s{idx:02d}", "share_code": f"C{idx:02d}", "inviter_user_id": "u"}
+        for idx in range(7)
+    ]
+    models = [
+        {
+            "id": secrets.token_hex(16),
+            "session_id": session["id"],
+            "owner_user_id": "u",
+            "storage_key": "k",
+            "created_at": T0 + timedelta(minutes=idx),
+        }
+        for session in sessions[:-1]
+        for idx in range(3)
+    ]
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [user])
+        connection.execute(PairSession.__table__.insert(), sessions)
+        connection.execute(HandModel.__table__.insert(), models)
+
+    migrate(engine, batch_size=2)
+    migrate(engine, batch_size=2)  # idempotent
+
+    inspector = inspect(engine)
+    assert "latest_hand_model_id" in {c["name"] for c in inspector.get_columns("sessions")}
+    assert {index["name"] for index in inspector.get_indexes("hand_models")} == {
+        "ix_hand_models_created_at",
+        "ix_hand_models_session_id_created_at_id",
+        "ix_hand_models_owner_user_id_created_at_id",
+    }
+    expected = {session["id"]: None for session in sessions}
+    for model in models:
+        expected[model["session_id"]] = model["id"]  # the last one is the newest
+    with engine.connect() as connection:
+        rows = connection.execute(select(PairSession.id, PairSession.latest_hand_model_id))
+        actual = dict(rows.tuples().all())
+    assert actual == expected
+    engine.dispose()
@@ -0,0 +1,155 @@
+"""Tests for database engine setup, profiles and read routing."""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Connection, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.delivery_marks import delivery_marks
+from app.db.profiles import engine_options, get_engine_profile
+from app.db.session import (
+    async_database_url,
+    create_profiled_async_engine,
+    create_sync_engine,
+    get_db,
+    get_read_db,
+)
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("sqlite:////data/hand_modeler.db", "sqlite+aiosqlite:////data/hand_modeler.db"),
+        ("sqlite+aiosqlite:///rel.db", "sqlite+aiosqlite:///rel.db"),
+        ("postgresql://u:p@db/hands", "postgresql+asyncpg://u:p@db/hands"),
+        ("postgresql+psycopg2://u@db/hands", "postgresql+asyncpg://u@db/hands"),
+    ],
+)
+def test_async_database_url_swaps_in_an_async_driver(url: str, expected: str) -> None:
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_rejects_backends_without_a_known_driver() -> None:
+    with pytest.raises(ValueError, match="DATABASE_ASYNC_URL"):
+        async_database_url("mysql://u@db/hands")
+
+
+async def test_get_db_yields_an_async_session() -> None:
+    dependency = get_db()
+    db = await anext(dependency)
+    assert isinstance(db, AsyncSession)
+    await dependency.aclose()
+
+
+def test_profiles_set_sqlite_pragmas_on_sync_and_async_connections(tmp_path: Path) -> None:
+    profile = get_engine_profile("production", {"sqlite_busy_timeout_ms": 1234})
+    url = f"sqlite:///{tmp_path / 'profiled.db'}"
+
+    def pragmas(connection: Connection) -> tuple[object, ...]:
+        return tuple(
+            connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")
+        )
+
+    expected = ("wal", 1, 1234, 256 * 1024 * 1024)
+    engine = create_sync_engine(url, profile)
+    with engine.connect() as connection:
+        assert pragmas(connection) == expected
+    engine.dispose()
+
+    async def check_async() -> None:
+        async_engine = create_profiled_async_engine(async_database_url(url), profile)
+        async with async_engine.connect() as connection:
+            assert await connection.run_sync(pragmas) == expected
+        await async_engine.dispose()
+
+    asyncio.run(check_async())
+
+
+def test_engine_options_follow_the_profile() -> None:
+    profile = get_engine_profile("production")
+    options = engine_options("postgresql+asyncpg://u@db/hands", profile)
+    assert options["pool_size"] == 20 and options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"prepared_statement_cache_size": 256}
+
+    # In-memory SQLite keeps a single connection, so pool sizing does not apply.
+    assert "pool_size" not in engine_options("sqlite://", profile)
+
+    with pytest.raises(ValueError, match="Unknown database profile"):
+        get_engine_profile("fastest")
+    with pytest.raises(ValueError, match="pool_sise"):
+        get_engine_profile("default", {"pool_sise": 3})
+
+
+def test_read_only_endpoints_use_the_read_engine(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Write delivery marks in the request, rather than behind it.
+    monkeypatch.setattr(delivery_marks, "flush_interval_seconds", 0)
+    primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+    for path in (primary_path, replica_path):
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        engine.dispose()
+
+    def override(path: Path) -> Callable[[], AsyncIterator[AsyncSession]]:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+        async def get_test_db() -> AsyncIterator[AsyncSession]:
+            async with factory() as db:
+                yield db
+
+        return get_test_db
+
+    def replicate() -> None:
+        with sqlite3.connect(primary_path) as src, sqlite3.connect(replica_path) as dst:
+            src.backup(dst)
+
+    backend = LocalDiskBackend(tmp_path / "storage")
+    app.dependency_overrides[get_db] = override(primary_path)
+    app.dependency_overrides[get_read_db] = override(replica_path)
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    try:
+        client = TestClient(app)
+        user_a = client.post("/api/users", json={"display_name": "A"}).json()
+        user_b = client.post("/api/users", json={"display_name": "B"}).json()
+        session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+        client.post(
+            "/api/sessions/join",
+            json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+        )
+
+        # Polling reads the replica, which has not caught up yet.
+        assert client.get(f"/api/sessions/{session['id']}/poll").status_code == 404
+        replicate()
+        assert client.get(f"/api/sessions/{session['id']}/poll").json()["latest_model"] is None
+
+        model = client.post(
+            f"/api/sessions/{session['id']}/hand-models",
+            data={"owner_user_id": user_a["id"]},
+            files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+        ).json()
+
+        # A fresh upload falls back to the primary; the retrieval is recorded there.
+        viewed = client.get(
+            f"/api/hand-models/{model['id']}", params={"viewer_user_id": user_b["id"]}
+        ).json()
+        assert viewed["retrieved_at"] is not None
+        with sqlite3.connect(primary_path) as primary:
+            assert primary.execute("SELECT retrieved_at FROM hand_models").fetchone()[0]
+        with sqlite3.connect(replica_path) as replica:
+            assert replica.execute("SELECT COUNT(*) FROM hand_models").fetchone()[0] == 0
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,215 @@
+"""Tests for write-behind of retrieved_at and confirmed_at."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import NullPool
+
+import app.routers.hand_models as hand_models_router
+import app.routers.sessions as sessions_router
+from app.db.base import Base
+from app.db.delivery_marks import DeliveryMarkBuffer, flush_delivery_marks
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+from app.db.session import get_db, get_read_db
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+MODEL_IDS = [f"m{idx}" for idx in range(5)]
+
+
+@pytest.fixture
+def db_url(tmp_path: Path) -> str:
+    url = f"sqlite:///{tmp_path / 'marks.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{"id": "u", "display_name": "U"}])
+        connection.execute(
+            PairSession.__table__.insert(),
+            [{"id": "s", "share_code": "S", "inviter_user_id": "u", "partner_user_id": None}],
+        )
+        connection.execute(
+            HandModel.__table__.insert(),
+            [
+                {
+                    "id": model_id,
+                    "session_id": "s",
+                    "owner_user_id": "u",
+                    "storage_key": "k",
+                    "created_at": T0,
+                    "retrieved_at": T0 if model_id == "m4" else None,
+                }
+                for model_id in MODEL_IDS
+            ],
+        )
+        connection.execute(update(PairSession.__table__).values(latest_hand_model_id="m0"))
+    engine.dispose()
+    return url.replace("sqlite:", "sqlite+aiosqlite:")
+
+
+@pytest.fixture
+async def engine(db_url: str) -> AsyncIterator[AsyncEngine]:
+    engine = create_async_engine(db_url, poolclass=NullPool)
+    yield engine
+    await engine.dispose()
+
+
+async def _marks(engine: AsyncEngine) -> dict[str, tuple[datetime | None, datetime | None]]:
+    async with engine.connect() as connection:
+        rows = await connection.execute(
+            select(HandModel.id, HandModel.retrieved_at, HandModel.confirmed_at)
+        )
+        return {
+            model_id: tuple(
+                value.replace(tzinfo=timezone.utc) if value is not None else None
+                for value in (retrieved, confirmed)
+            )
+            for model_id, retrieved, confirmed in rows
+        }
+
+
+async def test_marks_are_written_in_one_batch_and_the_first_mark_wins(
+    engine: AsyncEngine,
+) -> None:
+    buffer = DeliveryMarkBuffer(flush_interval_seconds=1.0, max_pending=100)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    for offset, model_id in enumerate(MODEL_IDS):
+        assert buffer.mark("retrieved_at", model_id, T0 + timedelta(minutes=offset + 1)) == (
+            T0 + timedelta(minutes=offset + 1)
+        )
+    # Viewing again keeps the first timestamp.
+    assert buffer.mark("retrieved_at", "m0", T0 + timedelta(days=1)) == T0 + timedelta(minutes=1)
+    buffer.mark("confirmed_at", "m0", T0 + timedelta(hours=1))
+    assert not buffer.should_flush() and len(buffer) == 6
+
+    statements: list[str] = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    assert await flush_delivery_marks(factory, buffer) == 6
+    assert len(statements) == 2  # one executemany per column
+    assert len(buffer) == 0 and buffer.pending("retrieved_at", "m0") is None
+
+    marks = await _marks(engine)
+    assert marks["m0"] == (T0 + timedelta(minutes=1), T0 + timedelta(hours=1))
+    assert marks["m3"] == (T0 + timedelta(minutes=4), None)
+    # Already set in the database: the row keeps its value.
+    assert marks["m4"] == (T0, None)
+
+    # Flushing the same marks again changes nothing.
+    buffer.mark("retrieved_at", "m0", T0 + timedelta(days=2))
+    await flush_delivery_marks(factory, buffer)
+    assert await _marks(engine) == marks
+
+
+async def test_a_failed_flush_puts_its_batch_back_ahead_of_newer_marks(
+    engine: AsyncEngine,
+) -> None:
+    buffer = DeliveryMarkBuffer(flush_interval_seconds=1.0, max_pending=100)
+    buffer.mark("retrieved_at", "m0", T0)
+    buffer.mark("retrieved_at", "m1", T0)
+
+    class FailingSession:
+        async def execute(self, *_args: object) -> None:
+            # A mark recorded while the batch is in flight joins the next batch.
+            assert buffer.mark("retrieved_at", "m1", T0 + timedelta(days=1)) == T0
+            buffer.mark("retrieved_at", "m2", T0 + timedelta(days=1))
+            raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        await buffer.flush(FailingSession())  # type: ignore[arg-type]
+    assert buffer.pending("retrieved_at", "m1") == T0
+
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    assert await flush_delivery_marks(factory, buffer) == 3
+    marks = await _marks(engine)
+    assert [marks[model_id][0] for model_id in ("m0", "m1", "m2")] == [
+        T0,
+        T0,
+        T0 + timedelta(days=1),
+    ]
+
+
+@pytest.fixture
+def client(
+    db_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[tuple[TestClient, DeliveryMarkBuffer]]:
+    engine = create_async_engine(db_url, poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    buffer = DeliveryMarkBuffer(flush_interval_seconds=1.0, max_pending=3)
+    for router in (hand_models_router, sessions_router):
+        monkeypatch.setattr(router, "delivery_marks", buffer)
+    backend = LocalDiskBackend(tmp_path / "storage")
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    yield TestClient(app), buffer
+    app.dependency_overrides.clear()
+
+
+def test_views_show_buffered_marks_and_a_full_buffer_is_flushed(
+    client: tuple[TestClient, DeliveryMarkBuffer]
+) -> None:
+    api, buffer = client
+    partner = api.post("/api/users", json={"display_name": "P"}).json()
+    api.post("/api/sessions/join", json={"share_code": "S", "partner_user_id": partner["id"]})
+    viewer = {"viewer_user_id": partner["id"]}
+
+    viewed = api.get("/api/hand-models/m0", params=viewer).json()
+    assert viewed["retrieved_at"] is not None
+    assert api.get("/api/hand-models/m0").json()["retrieved_at"] == viewed["retrieved_at"]
+    confirmed = api.post("/api/hand-models/m0/confirm", data={"partner_user_id": partner["id"]})
+    assert confirmed.json()["confirmed_at"] is not None
+    assert len(buffer) == 2
+
+    # The third mark fills the buffer; that request writes all three.
+    api.get("/api/hand-models/m1", params=viewer).raise_for_status()
+    assert len(buffer) == 0 and buffer.flushed == 3
+    # Now read back from the row (SQLite returns naive UTC).
+    stored = api.get("/api/hand-models/m0").json()["retrieved_at"]
+    assert stored == viewed["retrieved_at"].removesuffix("Z")
+
+
+def test_every_read_of_a_model_shows_its_buffered_marks(
+    client: tuple[TestClient, DeliveryMarkBuffer]
+) -> None:
+    api, buffer = client
+    partner = api.post("/api/users", json={"display_name": "P"}).json()
+    api.post("/api/sessions/join", json={"share_code": "S", "partner_user_id": partner["id"]})
+    polled = api.get("/api/sessions/s/poll")
+    assert polled.json()["latest_model"]["confirmed_at"] is None
+
+    confirmed = api.post("/api/hand-models/m0/confirm", data={"partner_user_id": partner["id"]})
+    confirmed_at = confirmed.json()["confirmed_at"]
+    assert confirmed_at is not None and len(buffer) == 1
+
+    # The poll body changed, so its ETag must too, before the mark is written.
+    repolled = api.get("/api/sessions/s/poll", headers={"If-None-Match": polled.headers["etag"]})
+    assert repolled.status_code == 200
+    assert repolled.json()["latest_model"]["confirmed_at"] == confirmed_at
+    assert api.get("/api/sessions/s/hand-models/latest").json()["confirmed_at"] == confirmed_at
+    for url in ("/api/sessions/s/hand-models", "/api/users/u/hand-models"):
+        items = {item["id"]: item for item in api.get(url).json()["items"]}
+        assert items["m0"]["confirmed_at"] == confirmed_at
+        assert items["m1"]["confirmed_at"] is None
+    with api.websocket_connect("/api/sessions/s/events") as websocket:
+        assert websocket.receive_json()["hand_model"]["confirmed_at"] == confirmed_at
+    assert len(buffer) == 1
@@ -0,0 +1,134 @@
+"""Tests for the keyset-paginated hand model history endpoints."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.models import HandModel, User
+from app.db.models import Session as PairSession
+from app.db.queries import HandModelCursor
+from app.db.session import get_db, get_read_db
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> Iterator[TestClient]:
+    url = f"sqlite:///{tmp_path / 'history.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [{"id": user_id, "display_name": user_id} for user_id in ("a", "b", "c")],
+        )
+        connection.execute(
+            PairSession.__table__.insert(),
+            [
+                {"id": "s1", "share_code": "S1", "inviter_user_id": "a", "partner_user_id": "b"},
+                {"id": "s2", "share_code": "S2", "inviter_user_id": "a", "partner_user_id": None},
+            ],
+        )
+        # Pairs of models share a timestamp, so pages must break ties on id. Every
+        # model stores the same blob.
+        connection.execute(
+            HandModel.__table__.insert(),
+            [
+                {
+                    "id": f"m{idx:02d}",
+                    "session_id": "s1" if idx % 3 else "s2",
+                    "owner_user_id": "a" if idx % 2 else "b",
+                    "storage_key": "blobs/sha256/ab/abc",
+                    "created_at": T0 + timedelta(minutes=idx // 2),
+                }
+                for idx in range(25)
+            ],
+        )
+    sync_engine.dispose()
+
+    engine = create_async_engine(url.replace("sqlite:", "sqlite+aiosqlite:"), poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    backend = LocalDiskBackend(tmp_path / "storage")
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _walk(client: TestClient, url: str, limit: int) -> list[dict[str, object]]:
+    items: list[dict[str, object]] = []
+    cursor = None
+    while True:
+        params: dict[str, object] = {"limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        page = client.get(url, params=params).json()
+        assert len(page["items"]) <= limit
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def _newest_first(ids: list[int]) -> list[str]:
+    return [f"m{idx:02d}" for idx in sorted(ids, key=lambda idx: (idx // 2, idx), reverse=True)]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 50])
+def test_pages_walk_the_whole_history_newest_first(client: TestClient, limit: int) -> None:
+    session_items = _walk(client, "/api/sessions/s1/hand-models", limit)
+    assert [item["id"] for item in session_items] == _newest_first(
+        [idx for idx in range(25) if idx % 3]
+    )
+    user_items = _walk(client, "/api/users/a/hand-models", limit)
+    assert [item["id"] for item in user_items] == _newest_first(
+        [idx for idx in range(25) if idx % 2]
+    )
+    assert all(item["download_url"] for item in session_items + user_items)
+
+
+def test_uploads_during_a_walk_do_not_shift_later_pages(client: TestClient) -> None:
+    first = client.get("/api/sessions/s2/hand-models", params={"limit": 2}).json()
+    client.post(
+        "/api/sessions/s2/hand-models",
+        data={"owner_user_id": "a"},
+        files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+    ).raise_for_status()
+    rest = client.get(
+        "/api/sessions/s2/hand-models", params={"limit": 50, "cursor": first["next_cursor"]}
+    ).json()
+    ids = [item["id"] for item in first["items"] + rest["items"]]
+    assert ids == _newest_first([idx for idx in range(25) if not idx % 3])
+    assert rest["next_cursor"] is None
+
+
+def test_empty_missing_and_invalid_requests(client: TestClient) -> None:
+    assert client.get("/api/users/c/hand-models").json() == {"items": [], "next_cursor": None}
+    assert client.get("/api/sessions/missing/hand-models").status_code == 404
+    assert client.get("/api/users/missing/hand-models").status_code == 404
+    bad = client.get("/api/sessions/s1/hand-models", params={"cursor": "not a cursor"})
+    assert bad.status_code == 400
+    assert client.get("/api/sessions/s1/hand-models", params={"limit": 0}).status_code == 422
+
+
+def test_cursors_round_trip() -> None:
+    cursor = HandModelCursor(created_at=T0, id="m01")
+    assert HandModelCursor.decode(cursor.encode()) == cursor
+    with pytest.raises(ValueError):
+        HandModelCursor.decode(HandModelCursor(created_at=T0, id="").encode())
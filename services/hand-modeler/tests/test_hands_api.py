@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 
@@ -11,9 +13,11 @@ from fastapi.testclient import TestClient
 from PIL import Image  # type: ignore[import-untyped]
 
 from app.config import settings
+from app.jobs import store
 from app.main import app
 from app.routers.hands import get_landmark_detector
 from app.services.hands.detector import Landmark, LandmarkDetector
+from app.services.hands.job_processor import resume_unfinished_jobs
 
 
 class FakeDetector(LandmarkDetector):
@@ -47,6 +51,22 @@ def _png_bytes(color: tuple[int, int, int]) -> bytes:
     return buf.getvalue()
 
 
+def _jpeg_bytes(color: tuple[int, int, int]) -> bytes:
+    img = Image.new("RGB", (32, 32), color=color)
+    buf = BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _zip_bytes(count: int) -> bytes:
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for idx in range(count):
+            archive.writestr(f"scan/frame{idx:02d}.png", _png_bytes((idx * 40, 0, 0)))
+        archive.writestr("scan/notes.txt", "ignored")
+    return buf.getvalue()
+
+
 def test_scan_endpoint_creates_and_processes_job(client: TestClient) -> None:
     files = [
         ("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png")),
@@ -66,3 +86,285 @@ def test_scan_endpoint_creates_and_processes_job(client: TestClient) -> None:
     assert status_data["status"] == "completed"
     assert status_data["metadata"] is not None
     assert status_data["glb_base64"] is not None
+
+
+def test_scan_status_includes_stage_timings_when_debug_requested(client: TestClient) -> None:
+    files = [
+        ("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png")),
+        ("frames", ("frame2.png", _png_bytes((0, 255, 0)), "image/png")),
+    ]
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    plain = client.get(f"/api/hands/{job_id}").json()
+    assert plain["debug"] is None
+
+    debug = client.get(f"/api/hands/{job_id}", params={"debug": True}).json()["debug"]
+    assert debug["frame_count"] == 2
+    assert debug["stage_calls"]["frame_read"] == 2
+    assert debug["stage_calls"]["detection"] == 2
+    for stage in ("smoothing", "aggregation", "normalization", "metadata", "meshing"):
+        assert debug["stage_timings_ms"][stage] >= 0.0
+    assert "glb_export" in debug["stage_timings_ms"]
+    assert "persistence" in debug["stage_timings_ms"]
+
+    metrics = client.get("/api/hands/metrics/stages").json()
+    assert metrics["meshing"]["count"] >= 1
+
+
+def test_a_new_scan_is_never_claimed_by_another_worker(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    jobs_dir = tmp_path / "jobs"
+    update_job = store.update_job
+    claimed: list[str] = []
+
+    def queue_then_run_claim_loop(*args: object, **kwargs: object) -> store.HandScanJobRecord:
+        record = update_job(*args, **kwargs)  # type: ignore[arg-type]
+        if kwargs.get("status") == "queued":
+            # Another worker's claim loop runs right after the job becomes visible.
+            claimed.extend(
+                resume_unfinished_jobs(jobs_dir=jobs_dir, detector=FakeDetector(), max_attempts=3)
+            )
+        return record
+
+    monkeypatch.setattr(store, "update_job", queue_then_run_claim_loop)
+    files = [("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png"))]
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    assert claimed == []
+    result = client.get(f"/api/hands/{job_id}", params={"debug": True}).json()
+    assert result["status"] == "completed"
+    assert result["debug"]["attempts"] == 1
+
+
+def test_scan_rejects_oversized_frame_while_streaming(client: TestClient, tmp_path: Path) -> None:
+    original = settings.max_image_size_mb
+    settings.max_image_size_mb = 1
+    try:
+        files = [
+            ("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png")),
+            ("frames", ("frame2.png", b"\0" * (1024 * 1024 + 1), "image/png")),
+        ]
+        response = client.post("/api/hands/scan", files=files)
+    finally:
+        settings.max_image_size_mb = original
+
+    assert response.status_code == 413
+    jobs_dir = tmp_path / "jobs"
+    assert [p.name for p in jobs_dir.iterdir() if p.name != "_queue"] == []
+
+
+def test_scan_enforces_total_upload_limit(client: TestClient) -> None:
+    original = settings.max_scan_upload_mb
+    settings.max_scan_upload_mb = 1
+    try:
+        files = [("frames", (f"frame{i}.png", b"\0" * (600 * 1024), "image/png")) for i in range(2)]
+        response = client.post("/api/hands/scan", files=files)
+    finally:
+        settings.max_scan_upload_mb = original
+
+    assert response.status_code == 413
+
+
+def test_resumable_upload_session_overlaps_detection_with_upload(client: TestClient) -> None:
+    session = client.post("/api/hands/scan/uploads").json()
+    job_id = session["job_id"]
+    assert session["status"] == "uploading"
+
+    def put(index: int) -> dict[str, object]:
+        response = client.put(
+            f"/api/hands/scan/uploads/{job_id}/frames/{index}",
+            files={"frame": (f"frame{index}.png", _png_bytes((index * 40, 0, 0)), "image/png")},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    put(1)
+    put(0)
+    put(0)  # retried frame index is a no-op
+
+    status = client.get(f"/api/hands/scan/uploads/{job_id}").json()
+    assert status["received_frames"] == [0, 1]
+    assert status["detected_frames"] == 2
+
+    incomplete = client.post(f"/api/hands/scan/uploads/{job_id}/finalize", data={"frame_count": 3})
+    assert incomplete.status_code == 409
+    assert incomplete.json()["detail"]["missing_frames"] == [2]
+
+    put(2)
+    finalized = client.post(f"/api/hands/scan/uploads/{job_id}/finalize", data={"frame_count": 3})
+    assert finalized.status_code == 200
+
+    result = client.get(f"/api/hands/{job_id}", params={"debug": True}).json()
+    assert result["status"] == "completed"
+    assert result["glb_base64"] is not None
+    assert result["debug"]["frame_count"] == 3
+    assert result["debug"]["resumed_frames"] == 3
+
+    late = client.put(
+        f"/api/hands/scan/uploads/{job_id}/frames/3",
+        files={"frame": ("frame3.png", _png_bytes((0, 0, 255)), "image/png")},
+    )
+    assert late.status_code == 409
+
+
+def test_upload_session_frames_share_the_scan_upload_limit(client: TestClient) -> None:
+    job_id = client.post("/api/hands/scan/uploads").json()["job_id"]
+
+    def put(index: int) -> int:
+        return client.put(
+            f"/api/hands/scan/uploads/{job_id}/frames/{index}",
+            files={"frame": (f"frame{index}.png", b"\0" * (600 * 1024), "image/png")},
+        ).status_code
+
+    original = settings.max_scan_upload_mb
+    settings.max_scan_upload_mb = 1
+    try:
+        assert put(0) == 200
+        assert put(1) == 413
+    finally:
+        settings.max_scan_upload_mb = original
+
+    status = client.get(f"/api/hands/scan/uploads/{job_id}").json()
+    assert status["received_frames"] == [0]
+    out_of_range = client.put(
+        f"/api/hands/scan/uploads/{job_id}/frames/{settings.max_scan_frames}",
+        files={"frame": ("frame.png", b"\0", "image/png")},
+    )
+    assert out_of_range.status_code == 400
+
+
+def test_scan_accepts_zip_archive_without_writing_frames(
+    client: TestClient, tmp_path: Path
+) -> None:
+    files = {"frames": ("scan.zip", _zip_bytes(3), "application/zip")}
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    result = client.get(f"/api/hands/{job_id}", params={"debug": True}).json()
+    assert result["status"] == "completed"
+    assert result["debug"]["frame_count"] == 3
+    assert not (tmp_path / "jobs" / job_id / "frames").exists()
+
+
+def test_scan_accepts_mjpeg_stream(client: TestClient) -> None:
+    boundary = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+    stream = b"".join(boundary + _jpeg_bytes((0, idx * 50, 0)) + b"\r\n" for idx in range(4))
+    files = {"frames": ("scan.mjpeg", stream, "video/x-motion-jpeg")}
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    result = client.get(f"/api/hands/{job_id}", params={"debug": True}).json()
+    assert result["status"] == "completed"
+    assert result["debug"]["frame_count"] == 4
+
+
+def test_scan_source_is_bounded_by_max_frames(client: TestClient) -> None:
+    original = settings.max_scan_frames
+    settings.max_scan_frames = 2
+    try:
+        files = {"frames": ("scan.zip", _zip_bytes(3), "application/zip")}
+        job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+    finally:
+        settings.max_scan_frames = original
+
+    result = client.get(f"/api/hands/{job_id}").json()
+    assert result["status"] == "failed"
+    assert "more than 2 frames" in result["error"]
+
+
+def test_mesh_download_supports_etag_and_range(client: TestClient) -> None:
+    files = [("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png"))]
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    status = client.get(f"/api/hands/{job_id}", params={"fields": "status,glb_url"})
+    assert status.json().keys() == {"job_id", "status", "glb_url"}
+    glb_url = status.json()["glb_url"]
+    assert glb_url.endswith(f"/api/hands/{job_id}/mesh.glb")
+
+    full = client.get(glb_url)
+    assert full.status_code == 200
+    assert full.headers["content-type"] == "model/gltf-binary"
+    assert full.content[:4] == b"glTF"
+    assert "immutable" in full.headers["cache-control"]
+    etag = full.headers["etag"]
+    assert etag.startswith('"') and len(etag) == 66
+
+    cached = client.get(glb_url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    partial = client.get(glb_url, headers={"Range": "bytes=4-11"})
+    assert partial.status_code == 206
+    assert partial.content == full.content[4:12]
+    assert partial.headers["content-range"] == f"bytes 4-11/{len(full.content)}"
+
+    suffix = client.get(glb_url, headers={"Range": "bytes=-4"})
+    assert suffix.content == full.content[-4:]
+
+    stale = client.get(glb_url, headers={"Range": "bytes=0-3", "If-Range": '"other"'})
+    assert stale.status_code == 200
+
+    beyond = client.get(glb_url, headers={"Range": f"bytes={len(full.content)}-"})
+    assert beyond.status_code == 416
+
+
+def test_status_field_selection_rejects_unknown_fields(client: TestClient) -> None:
+    files = [("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png"))]
+    job_id = client.post("/api/hands/scan", files=files).json()["job_id"]
+
+    assert client.get(f"/api/hands/{job_id}", params={"fields": "nope"}).status_code == 400
+    assert client.get(f"/api/hands/{job_id}/mesh.glb").status_code == 200
+    assert client.get("/api/hands/missing/mesh.glb").status_code == 404
+
+
+def test_duplicate_scan_submission_returns_existing_job(client: TestClient, tmp_path: Path) -> None:
+    def files() -> list[tuple[str, tuple[str, bytes, str]]]:
+        return [
+            ("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png")),
+            ("frames", ("frame2.png", _png_bytes((0, 255, 0)), "image/png")),
+        ]
+
+    first = client.post("/api/hands/scan", files=files()).json()
+    retry = client.post("/api/hands/scan", files=files()).json()
+    assert retry == {"job_id": first["job_id"], "status": "completed", "duplicate": True}
+
+    reordered = list(reversed(files()))
+    assert client.post("/api/hands/scan", files=reordered).json()["job_id"] != first["job_id"]
+
+    keyed = client.post("/api/hands/scan", files=files(), headers={"Idempotency-Key": "a"})
+    keyed_retry = client.post("/api/hands/scan", files=files(), headers={"Idempotency-Key": "a"})
+    assert keyed.json()["job_id"] != first["job_id"]
+    assert keyed_retry.json()["job_id"] == keyed.json()["job_id"]
+
+    job_dirs = [p for p in (tmp_path / "jobs").iterdir() if p.name not in store.INDEX_DIRNAMES]
+    assert len(job_dirs) == 3
+
+
+def test_failed_or_deleted_job_releases_its_dedup_key(client: TestClient, tmp_path: Path) -> None:
+    jobs_dir = tmp_path / "jobs"
+    files = [("frames", ("frame1.png", _png_bytes((255, 0, 0)), "image/png"))]
+
+    first = client.post("/api/hands/scan", files=files).json()["job_id"]
+    store.update_job(jobs_dir, first, status="failed", error="boom")
+    second = client.post("/api/hands/scan", files=files).json()
+    assert second["job_id"] != first and second["duplicate"] is False
+
+    store.delete_job(jobs_dir, second["job_id"])
+    third = client.post("/api/hands/scan", files=files).json()
+    assert third["job_id"] != second["job_id"] and third["duplicate"] is False
+
+
+def test_concurrent_dedup_claims_have_one_winner(tmp_path: Path) -> None:
+    job_ids = [f"job-{idx}" for idx in range(8)]
+    for job_id in job_ids:
+        store.create_job(tmp_path, job_id, [], status="uploading", dedup_key="k")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(
+            pool.map(lambda job_id: store.claim_dedup_key(tmp_path, "k", job_id), job_ids)
+        )
+
+    winners = [
+        job_id for job_id, existing in zip(job_ids, results, strict=True) if existing is None
+    ]
+    assert len(winners) == 1
+    assert {existing.job_id for existing in results if existing is not None} == set(winners)
@@ -0,0 +1,121 @@
+"""Tests for per-frame landmark checkpoints and crash recovery."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.jobs import store
+from app.jobs.checkpoints import CheckpointWriter, get_checkpoint_path, load_checkpoints
+from app.services.hands import job_processor
+from app.services.hands.detector import Landmark
+from app.services.hands.job_processor import process_hand_scan_job, resume_unfinished_jobs
+from app.services.hands.processing import HAND_LANDMARK_COUNT
+
+
+def _landmarks(offset: float) -> list[Landmark]:
+    return [
+        Landmark(
+            x=offset + i * 0.01,
+            y=(i % 5) * 0.02,
+            z=(i % 3) * 0.015,
+            confidence=None if i % 2 else 0.5,
+        )
+        for i in range(HAND_LANDMARK_COUNT)
+    ]
+
+
+class CountingDetector:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def detect(self, image_bytes: bytes) -> list[Landmark]:
+        self.calls += 1
+        return _landmarks(0.0)
+
+
+def _make_job(jobs_dir: Path, job_id: str, frame_count: int) -> list[Path]:
+    frames_dir = store.get_job_dir(jobs_dir, job_id) / "frames"
+    frames_dir.mkdir(parents=True)
+    paths = []
+    for idx in range(frame_count):
+        path = frames_dir / f"frame_{idx:05d}.png"
+        path.write_bytes(b"frame")
+        paths.append(path)
+    store.create_job(jobs_dir, job_id, frame_files=[str(p) for p in paths])
+    return paths
+
+
+def test_checkpoint_roundtrip_ignores_torn_tail(tmp_path: Path) -> None:
+    with CheckpointWriter(tmp_path, "job") as writer:
+        writer.append(0, _landmarks(0.0))
+        writer.append(3, _landmarks(0.3))
+
+    path = get_checkpoint_path(tmp_path, "job")
+    with path.open("ab") as f:
+        f.write(b"\x05\x00\x00\x00\x15\x00partial")
+
+    frames = load_checkpoints(tmp_path, "job")
+    assert sorted(frames) == [0, 3]
+    assert frames[3][0].x == 0.30000001192092896
+    assert frames[3][0].confidence == 0.5
+    assert frames[3][1].confidence is None
+
+    # Reopening for append drops the torn record so later records stay readable.
+    with CheckpointWriter(tmp_path, "job") as writer:
+        writer.append(5, _landmarks(0.5))
+    assert sorted(load_checkpoints(tmp_path, "job")) == [0, 3, 5]
+
+
+def test_resumed_job_only_detects_frames_without_checkpoint(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job", frame_count=4)
+    with CheckpointWriter(tmp_path, "job") as writer:
+        writer.append(0, _landmarks(0.0))
+        writer.append(1, _landmarks(0.0))
+    store.update_job(tmp_path, "job", status="processing", attempts=1)
+
+    detector = CountingDetector()
+    resumed = resume_unfinished_jobs(jobs_dir=tmp_path, detector=detector, max_attempts=3)
+
+    assert resumed == ["job"]
+    assert detector.calls == 2
+
+    record = store.read_job_record(tmp_path, "job")
+    assert record is not None
+    assert record.status == "completed"
+    assert record.attempts == 2
+    assert record.resumed_frames == 2
+
+
+def test_jobs_out_of_attempts_are_failed_instead_of_resumed(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job", frame_count=2)
+    store.update_job(tmp_path, "job", status="processing", attempts=3)
+
+    detector = CountingDetector()
+    assert resume_unfinished_jobs(jobs_dir=tmp_path, detector=detector, max_attempts=3) == []
+    assert detector.calls == 0
+
+    record = store.read_job_record(tmp_path, "job")
+    assert record is not None
+    assert record.status == "failed"
+
+
+def test_a_job_whose_checkpoints_cannot_be_loaded_is_failed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    paths = _make_job(tmp_path, "job", frame_count=2)
+
+    def unreadable(jobs_dir: Path, job_id: str) -> dict[int, list[Landmark]]:
+        raise OSError("checkpoint file unreadable")
+
+    monkeypatch.setattr(job_processor, "load_checkpoints", unreadable)
+    detector = CountingDetector()
+    process_hand_scan_job(jobs_dir=tmp_path, job_id="job", frame_paths=paths, detector=detector)
+
+    record = store.read_job_record(tmp_path, "job")
+    assert record is not None
+    assert record.status == "failed"
+    assert record.error == "checkpoint file unreadable"
+    assert record.frame_count == 0
+    assert detector.calls == 0
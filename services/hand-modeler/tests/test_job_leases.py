@@ -0,0 +1,148 @@
+"""Tests for lease-based job claiming across worker processes."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.jobs import store
+from app.jobs.leases import JobLease, LeaseLostError, get_lease_path, read_lease_owner
+from app.services.hands.detector import Landmark
+from app.services.hands.job_processor import detect_landed_frames, resume_unfinished_jobs
+from app.services.hands.processing import HAND_LANDMARK_COUNT
+
+
+class SlowDetector:
+    def detect(self, image_bytes: bytes) -> list[Landmark]:
+        time.sleep(0.01)
+        return [
+            Landmark(x=(i - 10) * 0.01, y=(i % 5) * 0.02, z=(i % 3) * 0.015)
+            for i in range(HAND_LANDMARK_COUNT)
+        ]
+
+
+def _make_job(jobs_dir: Path, job_id: str) -> None:
+    frames_dir = store.get_job_dir(jobs_dir, job_id) / "frames"
+    frames_dir.mkdir(parents=True)
+    paths = []
+    for idx in range(3):
+        path = frames_dir / f"frame_{idx:05d}.png"
+        path.write_bytes(b"frame")
+        paths.append(str(path))
+    store.create_job(jobs_dir, job_id, frame_files=paths)
+
+
+def _expire(jobs_dir: Path, job_id: str) -> None:
+    stale = time.time() - 3600
+    os.utime(get_lease_path(jobs_dir, job_id), (stale, stale))
+
+
+def test_only_one_worker_can_hold_a_live_lease(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job")
+
+    first = JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="worker-a")
+    assert first is not None
+    assert read_lease_owner(tmp_path, "job") == "worker-a"
+    assert JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="worker-b") is None
+
+    first.heartbeat()
+    first.release()
+
+    second = JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="worker-b")
+    assert second is not None
+    second.release()
+
+
+def test_expired_lease_is_taken_over_and_old_owner_notices(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job")
+    dead = JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="dead-worker")
+    assert dead is not None
+    _expire(tmp_path, "job")
+
+    taker = JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="new-worker")
+    assert taker is not None
+    assert read_lease_owner(tmp_path, "job") == "new-worker"
+
+    with pytest.raises(LeaseLostError):
+        dead.heartbeat()
+
+    # Releasing a lost lease must not delete the new owner's lease.
+    dead.release()
+    assert read_lease_owner(tmp_path, "job") == "new-worker"
+    taker.release()
+
+
+def test_abandoned_processing_job_is_taken_over(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job")
+    store.update_job(tmp_path, "job", status="processing", attempts=1)
+    dead = JobLease.try_acquire(tmp_path, "job", ttl_seconds=30, owner="dead-worker")
+    assert dead is not None
+
+    assert resume_unfinished_jobs(jobs_dir=tmp_path, detector=SlowDetector(), max_attempts=3) == []
+
+    _expire(tmp_path, "job")
+    processed = resume_unfinished_jobs(jobs_dir=tmp_path, detector=SlowDetector(), max_attempts=3)
+    assert processed == ["job"]
+
+    record = store.read_job_record(tmp_path, "job")
+    assert record is not None
+    assert record.status == "completed"
+    assert not get_lease_path(tmp_path, "job").exists()
+
+
+def test_a_finalize_racing_the_detect_pass_release_is_still_processed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _make_job(tmp_path, "job")
+    record = store.update_job(tmp_path, "job", status="uploading")
+    release = JobLease.release
+
+    def finalize_then_release(lease: JobLease) -> None:
+        # The finalize request lands after the detect pass's last read: it queues the
+        # job but cannot claim it while the detect pass still holds the lease.
+        if store.read_job_record(tmp_path, "job").status == "uploading":  # type: ignore[union-attr]
+            store.update_job(tmp_path, "job", status="queued", frame_files=record.frame_files)
+            assert JobLease.try_acquire(tmp_path, "job", ttl_seconds=30) is None
+        release(lease)
+
+    monkeypatch.setattr(JobLease, "release", finalize_then_release)
+    assert detect_landed_frames(jobs_dir=tmp_path, job_id="job", detector=SlowDetector()) == 3
+
+    finished = store.read_job_record(tmp_path, "job")
+    assert finished is not None
+    assert finished.status == "completed"
+    assert finished.resumed_frames == 3
+
+
+def _worker(jobs_dir: str, results: multiprocessing.Queue) -> None:  # type: ignore[type-arg]
+    processed = resume_unfinished_jobs(
+        jobs_dir=Path(jobs_dir), detector=SlowDetector(), max_attempts=3
+    )
+    results.put(processed)
+
+
+def test_several_processes_share_one_jobs_dir(tmp_path: Path) -> None:
+    job_ids = [f"job-{idx:02d}" for idx in range(12)]
+    for job_id in job_ids:
+        _make_job(tmp_path, job_id)
+
+    ctx = multiprocessing.get_context("fork")
+    results: multiprocessing.Queue = ctx.Queue()  # type: ignore[type-arg]
+    workers = [ctx.Process(target=_worker, args=(str(tmp_path), results)) for _ in range(4)]
+    for proc in workers:
+        proc.start()
+    processed = [job_id for _ in workers for job_id in results.get(timeout=60)]
+    for proc in workers:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    assert sorted(processed) == job_ids
+    for job_id in job_ids:
+        record = store.read_job_record(tmp_path, job_id)
+        assert record is not None
+        assert record.status == "completed"
+        assert record.attempts == 1
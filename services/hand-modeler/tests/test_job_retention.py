@@ -0,0 +1,138 @@
+"""Unit tests for job retention and disk garbage collection."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from app.jobs import store
+from app.jobs.retention import JobRetention, RetentionPolicy
+
+
+def _make_job(jobs_dir: Path, job_id: str, *, frame_bytes: int, status: str) -> None:
+    frames_dir = store.get_job_dir(jobs_dir, job_id) / "frames"
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    frame_path = frames_dir / "frame_00000.png"
+    frame_path.write_bytes(b"x" * frame_bytes)
+
+    store.create_job(jobs_dir, job_id, frame_files=[str(frame_path)])
+    store.write_glb(jobs_dir, job_id, b"glTF" + b"\0" * 96)
+    store.update_job(jobs_dir, job_id, status=status, glb_file="hand.glb")  # type: ignore[arg-type]
+
+
+def test_completed_job_frames_are_dropped_and_reported(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job-a", frame_bytes=4096, status="completed")
+    retention = JobRetention(jobs_dir=tmp_path)
+
+    report = retention.on_job_finished("job-a")
+
+    assert report.frames_purged == 1
+    assert report.reclaimed_bytes == 4096
+    assert not (tmp_path / "job-a" / "frames").exists()
+    assert (tmp_path / "job-a" / "hand.glb").exists()
+
+    record = store.read_job_record(tmp_path, "job-a")
+    assert record is not None
+    assert record.frames_purged is True
+    assert retention.totals.reclaimed_bytes == 4096
+
+
+def test_frames_are_kept_when_policy_disables_dropping(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job-a", frame_bytes=4096, status="completed")
+    retention = JobRetention(
+        jobs_dir=tmp_path, policy=RetentionPolicy(drop_frames_on_complete=False)
+    )
+
+    report = retention.on_job_finished("job-a")
+
+    assert report.reclaimed_bytes == 0
+    assert (tmp_path / "job-a" / "frames").exists()
+
+
+def test_jobs_expire_after_ttl(tmp_path: Path) -> None:
+    _make_job(tmp_path, "job-a", frame_bytes=128, status="completed")
+    _make_job(tmp_path, "job-b", frame_bytes=128, status="failed")
+    retention = JobRetention(jobs_dir=tmp_path, policy=RetentionPolicy(ttl_seconds=60))
+    retention.on_job_finished("job-a")
+    retention.on_job_finished("job-b")
+
+    now = store.utc_now().timestamp()
+    assert retention.run_once(now=now).jobs_expired == 0
+
+    report = retention.run_once(now=now + 61)
+    assert report.jobs_expired == 2
+    assert report.reclaimed_bytes > 0
+    assert not (tmp_path / "job-a").exists()
+    assert not (tmp_path / "job-b").exists()
+    assert retention.indexed_bytes == 0
+
+
+def test_high_water_mark_evicts_oldest_finished_jobs_first(tmp_path: Path) -> None:
+    policy = RetentionPolicy(
+        drop_frames_on_complete=False, max_disk_bytes=5000, low_water_ratio=0.6
+    )
+    retention = JobRetention(jobs_dir=tmp_path, policy=policy)
+    for job_id in ("job-1", "job-2", "job-3"):
+        _make_job(tmp_path, job_id, frame_bytes=2000, status="completed")
+        retention.on_job_finished(job_id)
+
+    # In-flight jobs are never evicted.
+    _make_job(tmp_path, "job-running", frame_bytes=2000, status="processing")
+
+    report = retention.run_once()
+
+    assert report.jobs_evicted == 2
+    assert not (tmp_path / "job-1").exists()
+    assert not (tmp_path / "job-2").exists()
+    assert (tmp_path / "job-3").exists()
+    assert (tmp_path / "job-running").exists()
+    assert retention.indexed_bytes <= 3000
+
+
+def test_startup_scan_is_incremental(tmp_path: Path) -> None:
+    for idx in range(5):
+        _make_job(tmp_path, f"job-{idx}", frame_bytes=256, status="completed")
+
+    retention = JobRetention(jobs_dir=tmp_path, policy=RetentionPolicy(batch_size=2))
+
+    first = retention.run_once()
+    assert first.frames_purged == 2
+    assert not retention.bootstrap_done
+
+    retention.run_once()
+    retention.run_once()
+    assert retention.bootstrap_done
+    assert retention.totals.frames_purged == 5
+    assert retention.totals.reclaimed_bytes == 5 * 256
+
+
+def test_uploads_never_queued_expire_once_idle(tmp_path: Path) -> None:
+    # Left "uploading" by a crash between creating the record and queueing it.
+    _make_job(tmp_path, "crashed", frame_bytes=256, status="uploading")
+    store.update_job(tmp_path, "crashed", status="uploading")
+    store.claim_dedup_key(tmp_path, "scan-hash", "crashed")
+    # A resumable session whose last frame landed later, and one that was finalized.
+    store.create_job(tmp_path, "session", [], status="uploading")
+    store.create_job(tmp_path, "finalized", [], status="uploading")
+
+    retention = JobRetention(jobs_dir=tmp_path, policy=RetentionPolicy(upload_ttl_seconds=60))
+    retention.on_upload_started("session")
+    retention.on_upload_started("finalized")
+    now = store.utc_now().timestamp()
+    assert retention.run_once(now=now).uploads_expired == 0
+
+    frames_dir = store.get_job_dir(tmp_path, "session") / "frames"
+    frames_dir.mkdir()
+    os.utime(frames_dir, (now + 30, now + 30))
+    store.update_job(tmp_path, "finalized", status="queued")
+
+    report = retention.run_once(now=now + 61)
+    assert report.uploads_expired == 1
+    assert report.reclaimed_bytes > 0
+    assert not (tmp_path / "crashed").exists()
+    assert store.claim_dedup_key(tmp_path, "scan-hash", "resubmitted") is None
+    assert (tmp_path / "session").exists() and (tmp_path / "finalized").exists()
+
+    assert retention.run_once(now=now + 91).uploads_expired == 1
+    assert not (tmp_path / "session").exists()
+    assert (tmp_path / "finalized").exists()
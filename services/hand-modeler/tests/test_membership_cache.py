@@ -0,0 +1,149 @@
+"""Tests for the in-process membership cache."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.membership import MembershipCache, TTLCache, membership_cache
+from app.db.models import HandModel, StorageBlob
+from app.db.models import Session as PairSession
+from app.db.session import get_db, get_read_db
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_their_ttl() -> None:
+    clock = FakeClock()
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=10, max_entries=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.snapshot()["size"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_at_the_size_bound() -> None:
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    snapshot = cache.snapshot()
+    assert snapshot["size"] == 2 and snapshot["evictions"] == 1
+    assert snapshot["hits"] == 3 and snapshot["misses"] == 1
+    assert snapshot["hit_rate"] == 0.75
+
+
+def test_a_zero_ttl_disables_the_cache() -> None:
+    cache = MembershipCache(ttl_seconds=0, max_entries=10)
+    cache.remember_user("u")
+    assert not cache.user_exists("u")
+
+
+def test_membership_is_positive_only_and_invalidated_per_session() -> None:
+    cache = MembershipCache(ttl_seconds=60, max_entries=10)
+    cache.remember_session("s", inviter_user_id="a", partner_user_id=None)
+    assert cache.is_member("s", "a")
+    assert not cache.is_member("s", "b")
+    cache.remember_session("s", inviter_user_id="a", partner_user_id="b")
+    assert cache.is_member("s", "b")
+    cache.invalidate_sessions(["s"])
+    assert not cache.is_member("s", "a")
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> Iterator[TestClient]:
+    url = f"sqlite:///{tmp_path / 'membership.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    engine = create_async_engine(url.replace("sqlite:", "sqlite+aiosqlite:"), poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    backend = LocalDiskBackend(tmp_path / "storage")
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    membership_cache.reset()
+    yield TestClient(app)
+    membership_cache.reset()
+    app.dependency_overrides.clear()
+
+
+def test_a_stale_entry_never_refuses_a_member(client: TestClient) -> None:
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    user_b = client.post("/api/users", json={"display_name": "B"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    client.post(
+        "/api/sessions/join",
+        json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+    ).raise_for_status()
+    # As if another process served the join: this one still has no partner cached.
+    membership_cache.remember_session(
+        session["id"], inviter_user_id=user_a["id"], partner_user_id=None
+    )
+
+    response = client.post(
+        f"/api/sessions/{session['id']}/hand-models",
+        data={"owner_user_id": user_b["id"]},
+        files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+    )
+    assert response.status_code == 200
+    assert membership_cache.is_member(session["id"], user_b["id"])
+
+    metrics = client.get("/api/sessions/metrics/membership-cache").json()
+    assert metrics["users"]["hits"] >= 1
+    assert metrics["sessions"]["misses"] == 0
+    assert 0 < metrics["sessions"]["hit_rate"] <= 1
+
+
+def test_an_upload_to_a_session_deleted_elsewhere_is_rolled_back(
+    client: TestClient, tmp_path: Path
+) -> None:
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    upload_url = f"/api/sessions/{session['id']}/hand-models"
+    form = {"owner_user_id": user_a["id"]}
+    client.post(
+        upload_url, data=form, files={"file": ("hand.glb", b"old", "model/gltf-binary")}
+    ).raise_for_status()
+
+    # Retention in another process deletes the session; this one still caches it.
+    engine = create_engine(f"sqlite:///{tmp_path / 'membership.db'}")
+    with engine.begin() as connection:
+        connection.execute(delete(HandModel))
+        connection.execute(delete(PairSession))
+    assert membership_cache.is_member(session["id"], user_a["id"])
+
+    response = client.post(
+        upload_url, data=form, files={"file": ("hand.glb", b"new", "model/gltf-binary")}
+    )
+    assert response.status_code == 404
+    assert not membership_cache.is_member(session["id"], user_a["id"])
+    with engine.connect() as connection:
+        assert connection.scalar(select(func.count()).select_from(HandModel)) == 0
+        assert connection.scalar(select(func.count()).select_from(StorageBlob)) == 1
+    engine.dispose()
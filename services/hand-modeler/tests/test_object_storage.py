@@ -0,0 +1,600 @@
+"""Tests for the object storage backends and the routers that use them."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import AsyncIterator, Callable, Iterator
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from app import main
+from app.config import settings
+from app.db.base import Base
+from app.db.models import StorageBlob
+from app.db.session import get_db, get_read_db
+from app.main import app
+from app.responses import cacheable_file_response
+from app.storage import (
+    InvalidStorageKeyError,
+    LocalDiskBackend,
+    ObjectNotFoundError,
+    ObjectTooLargeError,
+    S3Backend,
+    StorageBackend,
+    blob_key,
+    delete_blob_if_unreferenced,
+    generate_signed_download_url,
+    get_storage_backend,
+    release_blob,
+    sign_storage_key,
+    stage_base64_json,
+)
+from app.storage.blobs import stage_stream, store_blob
+from app.storage.signing import url_validity
+from tests.s3_standin import ACCESS_KEY_ID, REGION, SECRET_ACCESS_KEY, S3Standin
+
+
+@pytest.fixture
+def standin() -> Iterator[S3Standin]:
+    with S3Standin() as server:
+        yield server
+
+
+def _s3_backend(standin: S3Standin, *, part_size: int = 1024) -> S3Backend:
+    return S3Backend(
+        endpoint_url=standin.endpoint_url,
+        bucket="hands",
+        access_key_id=ACCESS_KEY_ID,
+        secret_access_key=SECRET_ACCESS_KEY,
+        region=REGION,
+        part_size=part_size,
+        max_connections=4,
+    )
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request: pytest.FixtureRequest, tmp_path: Path) -> Iterator[StorageBackend]:
+    if request.param == "local":
+        yield LocalDiskBackend(tmp_path / "storage")
+        return
+
+    with S3Standin() as server:
+        s3 = _s3_backend(server)
+        yield s3
+        s3.close()
+
+
+def test_backend_roundtrip(backend: StorageBackend) -> None:
+    key = "hand-models/session/model one.glb"
+    data = bytes(range(256)) * 10
+
+    assert backend.head(key) is None
+    assert backend.put(key, BytesIO(data), max_bytes=len(data), content_type="model/gltf-binary")
+
+    info = backend.head(key)
+    assert info is not None
+    assert info.size == len(data)
+    assert b"".join(backend.get(key)) == data
+    assert b"".join(backend.get(key, start=10, end=19)) == data[10:20]
+
+    backend.delete(key)
+    backend.delete(key)
+    assert backend.head(key) is None
+    with pytest.raises(ObjectNotFoundError):
+        b"".join(backend.get(key))
+
+
+def test_backend_rejects_oversized_objects_and_bad_keys(backend: StorageBackend) -> None:
+    with pytest.raises(ObjectTooLargeError):
+        backend.put("big.glb", BytesIO(b"x" * 5000), max_bytes=4999)
+    assert backend.head("big.glb") is None
+
+    for key in ("/abs.glb", "../escape.glb", "a/../../b.glb", ""):
+        with pytest.raises(InvalidStorageKeyError):
+            backend.put(key, BytesIO(b"x"), max_bytes=10)
+
+
+def test_s3_uses_multipart_upload_for_large_objects(standin: S3Standin) -> None:
+    s3 = _s3_backend(standin, part_size=1024)
+    data = b"0123456789" * 300
+
+    assert s3.put("large.glb", BytesIO(data), max_bytes=len(data)) == len(data)
+    assert standin.state.completed_parts["hands/large.glb"] == 3
+    assert b"".join(s3.get("large.glb")) == data
+
+    # An oversized multipart upload is aborted instead of left dangling.
+    with pytest.raises(ObjectTooLargeError):
+        s3.put("too-large.glb", BytesIO(data), max_bytes=2048)
+    assert standin.state.uploads == {}
+    assert s3.head("too-large.glb") is None
+    s3.close()
+
+
+def test_s3_reuses_pooled_connections(standin: S3Standin) -> None:
+    s3 = _s3_backend(standin)
+    for idx in range(20):
+        s3.put(f"small-{idx}.glb", BytesIO(b"glb"), max_bytes=10)
+        assert s3.head(f"small-{idx}.glb") is not None
+
+    assert standin.state.requests == 40
+    assert len(standin.state.connections) == 1
+    s3.close()
+
+
+def test_s3_presigned_urls_are_verified(standin: S3Standin) -> None:
+    s3 = _s3_backend(standin)
+    s3.put("shared.glb", BytesIO(b"glb-bytes"), max_bytes=100)
+
+    url = s3.presign("shared.glb", expires_at=int(time.time()) + 60, base_url="unused")
+    assert httpx.get(url).content == b"glb-bytes"
+    assert httpx.get(url.replace("shared.glb", "other.glb")).status_code == 403
+    s3.close()
+
+
+@pytest.fixture
+def blob_db(tmp_path: Path) -> Iterator[sessionmaker[Session]]:
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'blobs.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def api_db(
+    blob_db: sessionmaker[Session], tmp_path: Path
+) -> Callable[[], AsyncIterator[AsyncSession]]:
+    """A ``get_db`` override using the same database as ``blob_db``."""
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'blobs.db'}", poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    return get_test_db
+
+
+@pytest.fixture
+def s3_client(
+    standin: S3Standin,
+    api_db: Callable[[], AsyncIterator[AsyncSession]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[TestClient]:
+    settings.jobs_dir = str(tmp_path / "jobs")
+    s3 = _s3_backend(standin)
+
+    # Startup builds the backend for the background tasks from the factory.
+    monkeypatch.setattr(main, "get_storage_backend", lambda: s3)
+    app.dependency_overrides[get_storage_backend] = lambda: s3
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = api_db
+
+    with TestClient(app) as client:
+        yield client
+
+    app.dependency_overrides.clear()
+    s3.close()
+
+
+def test_hand_models_are_stored_through_the_backend(
+    s3_client: TestClient, standin: S3Standin
+) -> None:
+    user_a = s3_client.post("/api/users", json={"display_name": "Alice"}).json()
+    user_b = s3_client.post("/api/users", json={"display_name": "Bob"}).json()
+    session = s3_client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    s3_client.post(
+        "/api/sessions/join",
+        json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+    )
+
+    uploaded = s3_client.post(
+        f"/api/sessions/{session['id']}/hand-models",
+        data={"owner_user_id": user_a["id"]},
+        files={"file": ("hand.glb", b"glb-from-s3", "model/gltf-binary")},
+    ).json()
+
+    assert standin.state.objects[f"hands/{uploaded['storage_key']}"][0] == b"glb-from-s3"
+    assert httpx.get(uploaded["download_url"]).content == b"glb-from-s3"
+
+    # Re-sharing identical bytes references the same blob instead of writing it again.
+    puts_before = standin.state.requests
+    again = s3_client.post(
+        f"/api/sessions/{session['id']}/hand-models/base64",
+        json={
+            "owner_user_id": user_b["id"],
+            "glb_base64": base64.b64encode(b"glb-from-s3").decode("ascii"),
+        },
+    ).json()
+    assert again["id"] != uploaded["id"]
+    assert again["storage_key"] == uploaded["storage_key"]
+    assert standin.state.requests == puts_before
+    assert len(standin.state.objects) == 1
+
+    # The API's own download endpoint streams through the backend too.
+    expires = int(time.time()) + 60
+    response = s3_client.get(
+        "/api/storage/download",
+        params={
+            "key": uploaded["storage_key"],
+            "expires": expires,
+            "sig": sign_storage_key(key=uploaded["storage_key"], expires=expires),
+        },
+    )
+    assert response.status_code == 200
+    assert response.content == b"glb-from-s3"
+    assert response.headers["content-type"] == "model/gltf-binary"
+
+
+def _store(factory: sessionmaker[Session], backend: StorageBackend, data: bytes) -> StorageBlob:
+    staged = stage_stream(BytesIO(data), max_bytes=len(data), staging_dir=backend.staging_dir())
+    url = factory.kw["bind"].url.set(drivername="sqlite+aiosqlite")
+
+    async def store() -> StorageBlob:
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                blob = await store_blob(db, backend, staged, content_type="model/gltf-binary")
+                await db.commit()
+                return blob
+        finally:
+            await engine.dispose()
+
+    blob = asyncio.run(store())
+    staged.path.unlink()
+    return blob
+
+
+def test_identical_uploads_share_one_refcounted_blob(
+    blob_db: sessionmaker[Session], tmp_path: Path
+) -> None:
+    backend = LocalDiskBackend(tmp_path / "storage")
+    first = _store(blob_db, backend, b"same-glb")
+    second = _store(blob_db, backend, b"same-glb")
+    other = _store(blob_db, backend, b"other-glb")
+
+    assert first.key == second.key == blob_key(hashlib.sha256(b"same-glb").hexdigest())
+    assert other.key != first.key
+    blobs = sorted(p.name for p in (tmp_path / "storage" / "blobs").rglob("*") if p.is_file())
+    assert len(blobs) == 2
+    assert not any((tmp_path / "storage" / ".staging").iterdir())
+
+    with blob_db() as db:
+        assert db.get(StorageBlob, first.key).ref_count == 2  # type: ignore[union-attr]
+        assert release_blob(db, first.key)
+        db.commit()
+        assert not delete_blob_if_unreferenced(db, backend, first.key)
+
+        assert release_blob(db, first.key)
+        assert not release_blob(db, "hand-models/legacy.glb")
+        db.commit()
+        assert delete_blob_if_unreferenced(db, backend, first.key)
+
+    assert backend.head(first.key) is None
+    assert backend.head(other.key) is not None
+
+
+def test_upload_racing_a_blob_deletion_rewrites_the_object(
+    blob_db: sessionmaker[Session], tmp_path: Path
+) -> None:
+    backend = LocalDiskBackend(tmp_path / "storage")
+    blob = _store(blob_db, backend, b"glb")
+    with blob_db() as db:
+        release_blob(db, blob.key)
+        db.execute(update(StorageBlob).where(StorageBlob.key == blob.key).values(deleting=True))
+        db.commit()
+
+    def finish_deletion() -> None:
+        time.sleep(0.1)
+        backend.delete(blob.key)
+        with blob_db() as db:
+            db.execute(delete(StorageBlob).where(StorageBlob.key == blob.key))
+            db.commit()
+
+    deleter = threading.Thread(target=finish_deletion)
+    deleter.start()
+    again = _store(blob_db, backend, b"glb")
+    deleter.join()
+
+    assert again.key == blob.key
+    assert again.ref_count == 1
+    assert b"".join(backend.get(blob.key)) == b"glb"
+
+
+class _SlowDiskBackend(LocalDiskBackend):
+    """A local backend whose writes block like a slow or contended disk."""
+
+    writer_threads: list[int]
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str = "application/octet-stream"
+    ) -> None:
+        self.writer_threads.append(threading.get_ident())
+        time.sleep(0.2)
+        super().put_file(key, path, content_type=content_type)
+
+
+async def test_concurrent_uploads_do_not_stall_the_event_loop(
+    api_db: Callable[[], AsyncIterator[AsyncSession]], tmp_path: Path
+) -> None:
+    backend = _SlowDiskBackend(tmp_path / "storage", chunk_size=64 * 1024, fsync="full")
+    backend.writer_threads = []
+
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = api_db
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            user_a = (await client.post("/api/users", json={"display_name": "A"})).json()
+            user_b = (await client.post("/api/users", json={"display_name": "B"})).json()
+            session = (
+                await client.post("/api/sessions", json={"inviter_user_id": user_a["id"]})
+            ).json()
+            await client.post(
+                "/api/sessions/join",
+                json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+            )
+
+            loop = asyncio.get_running_loop()
+            stop = asyncio.Event()
+            stalls: list[float] = []
+
+            async def measure_stalls(interval: float = 0.005) -> None:
+                last = loop.time()
+                while not stop.is_set():
+                    await asyncio.sleep(interval)
+                    now = loop.time()
+                    stalls.append(now - last - interval)
+                    last = now
+
+            ticker = asyncio.create_task(measure_stalls())
+            responses = await asyncio.gather(
+                *(
+                    client.post(
+                        f"/api/sessions/{session['id']}/hand-models",
+                        data={"owner_user_id": user_a["id"]},
+                        files={"file": ("hand.glb", os.urandom(512 * 1024), "model/gltf-binary")},
+                    )
+                    for _ in range(4)
+                )
+            )
+            stop.set()
+            await ticker
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len({r.json()["storage_key"] for r in responses}) == 4
+    # Each write blocks for 200ms; every one must have run off the event loop thread,
+    # and nothing else in the upload path (spooling, hashing) may block it either.
+    assert len(backend.writer_threads) == 4
+    assert threading.get_ident() not in backend.writer_threads
+    # Well below the injected block, so a loaded machine does not trip it.
+    assert max(stalls) < 0.15
+
+
+def test_download_endpoint_supports_etags_and_ranges(
+    backend: StorageBackend, blob_db: sessionmaker[Session]
+) -> None:
+    data = bytes(range(256)) * 64
+    blob = _store(blob_db, backend, data)
+    digest = hashlib.sha256(data).hexdigest()
+    expires = int(time.time()) + 120
+    params = {
+        "key": blob.key,
+        "expires": expires,
+        "sig": sign_storage_key(key=blob.key, expires=expires),
+    }
+
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    try:
+        client = TestClient(app)
+        full = client.get("/api/storage/download", params=params)
+        assert full.status_code == 200
+        assert full.content == data
+        assert full.headers["etag"] == f'"{digest}"'
+        assert full.headers["accept-ranges"] == "bytes"
+        cache_control = full.headers["cache-control"]
+        assert cache_control.startswith("private, max-age=") and "immutable" in cache_control
+        assert 0 < int(cache_control.split("max-age=")[1].split(",")[0]) <= 120
+
+        cached = client.get(
+            "/api/storage/download", params=params, headers={"If-None-Match": f'"{digest}"'}
+        )
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        resumed = client.get(
+            "/api/storage/download",
+            params=params,
+            headers={"Range": "bytes=1000-", "If-Range": f'"{digest}"'},
+        )
+        assert resumed.status_code == 206
+        assert resumed.content == data[1000:]
+        assert resumed.headers["content-range"] == f"bytes 1000-{len(data) - 1}/{len(data)}"
+
+        stale = client.get(
+            "/api/storage/download",
+            params=params,
+            headers={"Range": "bytes=0-9", "If-Range": '"other"'},
+        )
+        assert stale.status_code == 200
+        assert stale.content == data
+
+        beyond = client.get(
+            "/api/storage/download", params=params, headers={"Range": f"bytes={len(data)}-"}
+        )
+        assert beyond.status_code == 416
+    finally:
+        app.dependency_overrides.clear()
+
+
+async def test_file_responses_use_zerocopysend_when_the_server_offers_it(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "model.glb"
+    path.write_bytes(b"0123456789")
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"range", b"bytes=2-5")],
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    response = cacheable_file_response(
+        Request(scope), path, etag='"abc"', media_type="model/gltf-binary"
+    )
+
+    messages: list[dict[str, object]] = []
+
+    async def send(message: dict[str, object]) -> None:
+        if message["type"] == "http.response.zerocopysend":
+            file = message["file"]
+            assert hasattr(file, "fileno")
+            file.seek(message["offset"])  # type: ignore[attr-defined]
+            message = {**message, "body": file.read(message["count"])}  # type: ignore[attr-defined]
+        messages.append(message)
+
+    await response(scope, None, send)  # type: ignore[arg-type]
+
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert messages[1]["body"] == b"2345"
+
+
+def test_signed_urls_are_stable_within_a_bucket(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "signed_url_ttl_seconds", 900)
+    monkeypatch.setattr(settings, "signed_url_bucket_seconds", 300)
+
+    assert url_validity(1_000_000) == (999_900, 1_001_100)
+    assert url_validity(1_000_199) == (999_900, 1_001_100)
+    assert url_validity(1_000_200) == (1_000_200, 1_001_400)
+
+    _, expires = url_validity()
+    assert expires - time.time() >= 900
+
+
+def test_download_urls_survive_signing_key_rotation(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    backend = LocalDiskBackend(tmp_path / "storage")
+    backend.put("models/hand.glb", BytesIO(b"glb"), max_bytes=10)
+    monkeypatch.setattr(settings, "storage_signing_keys", {"2026-09": "old", "2026-10": "new"})
+    monkeypatch.setattr(settings, "storage_signing_key_id", "2026-09")
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    try:
+        client = TestClient(app)
+        request = Request({"type": "http", "app": app, "router": app.router, "headers": []})
+        old_url = generate_signed_download_url(request=request, key="models/hand.glb")
+        assert old_url == generate_signed_download_url(request=request, key="models/hand.glb")
+        assert "kid=2026-09" in old_url
+
+        monkeypatch.setattr(settings, "storage_signing_key_id", "2026-10")
+        new_url = generate_signed_download_url(request=request, key="models/hand.glb")
+        assert "kid=2026-10" in new_url
+        assert client.get(old_url).content == b"glb"
+        assert client.get(new_url).content == b"glb"
+        assert client.get(new_url.replace("kid=2026-10", "kid=2026-09")).status_code == 403
+
+        # Once the old key is retired, its links stop working.
+        monkeypatch.setattr(settings, "storage_signing_keys", {"2026-10": "new"})
+        assert client.get(old_url).status_code == 403
+        assert client.get(new_url).status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_base64_uploads_are_decoded_as_they_stream(
+    s3_client: TestClient, standin: S3Standin, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user_a = s3_client.post("/api/users", json={"display_name": "Alice"}).json()
+    user_b = s3_client.post("/api/users", json={"display_name": "Bob"}).json()
+    session = s3_client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    s3_client.post(
+        "/api/sessions/join",
+        json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+    )
+    url = f"/api/sessions/{session['id']}/hand-models/base64"
+
+    data = os.urandom(200_000)
+    # MIME-style line breaks and escaped slashes are both valid JSON encodings.
+    encoded = base64.encodebytes(data).decode("ascii").replace("/", "\\/").replace("\n", "\\n")
+    body = (
+        f'{{"glb_base64": "{encoded}", "content_type": "model/gltf-binary", '
+        f'"owner_user_id": "{user_b["id"]}"}}'
+    ).encode("ascii")
+    chunks = (body[i : i + 4093] for i in range(0, len(body), 4093))
+    uploaded = s3_client.post(url, content=chunks, headers={"Content-Type": "application/json"})
+    assert uploaded.status_code == 200
+    assert uploaded.json()["file_size_bytes"] == len(data)
+    assert standin.state.objects[f"hands/{uploaded.json()['storage_key']}"][0] == data
+
+    glb = base64.b64encode(b"glb").decode("ascii")
+    assert s3_client.post(url, json={"glb_base64": glb}).status_code == 422
+    assert s3_client.post(url, json={"owner_user_id": user_a["id"]}).status_code == 422
+    bad = s3_client.post(url, json={"owner_user_id": user_a["id"], "glb_base64": "a*c="})
+    assert bad.status_code == 400
+    assert s3_client.post(url, content=b'{"glb_base64": "Z2xi"').status_code == 400
+
+    monkeypatch.setattr(settings, "max_model_size_mb", 1)
+    too_large = base64.b64encode(b"x" * (1024 * 1024 + 1)).decode("ascii")
+    response = s3_client.post(url, json={"owner_user_id": user_a["id"], "glb_base64": too_large})
+    assert response.status_code == 413
+
+
+async def _chunks(*chunks: bytes) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_streamed_base64_memory_is_bounded_by_the_buffer(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "storage_buffer_size_kb", 64)
+    backend = LocalDiskBackend(tmp_path / "storage")
+    block = os.urandom(48 * 1024)
+    encoded_block = base64.b64encode(block)
+    blocks = 256  # 12 MiB decoded, 16 MiB encoded
+
+    async def body() -> AsyncIterator[bytes]:
+        yield b'{"owner_user_id": "u", "glb_base64": "'
+        for _ in range(blocks):
+            yield encoded_block
+        yield b'"}'
+
+    # Warm up the threadpool first so that its setup is not counted.
+    warmup, _ = await stage_base64_json(
+        _chunks(b'{"glb_base64": "Z2xi"}'), field="glb_base64", max_size_bytes=3, backend=backend
+    )
+    warmup.path.unlink()
+
+    tracemalloc.start()
+    try:
+        staged, fields = await stage_base64_json(
+            body(), field="glb_base64", max_size_bytes=len(block) * blocks, backend=backend
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert fields == {"owner_user_id": "u"}
+    assert staged.size == len(block) * blocks
+    assert staged.sha256 == hashlib.sha256(block * blocks).hexdigest()
+    assert peak < 2 * 1024 * 1024
+    staged.path.unlink()
@@ -0,0 +1,44 @@
+"""Unit tests for pipeline stage timing and histograms."""
+
+from __future__ import annotations
+
+from app.services.hands.timing import PIPELINE_STAGES, StageHistograms, StageTimer
+
+
+def test_stage_timer_accumulates_durations_and_calls() -> None:
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.stage("detection"):
+            pass
+    timer.add("meshing", 2_000_000)
+
+    assert timer.calls() == {"detection": 3, "meshing": 1}
+    assert timer.durations_ms()["meshing"] == 2.0
+    assert timer.durations_ms()["detection"] >= 0.0
+
+
+def test_stage_histograms_bucket_per_job_durations() -> None:
+    histograms = StageHistograms()
+    for elapsed_ms in (0.5, 3, 40_000):
+        timer = StageTimer()
+        timer.add("meshing", int(elapsed_ms * 1e6))
+        histograms.observe(timer)
+
+    meshing = histograms.snapshot()["meshing"]
+    assert meshing["count"] == 3
+    assert meshing["max_ms"] == 40_000
+    buckets = meshing["buckets_ms"]
+    assert isinstance(buckets, dict)
+    assert buckets["1.0"] == 1
+    assert buckets["5.0"] == 1
+    assert buckets["+Inf"] == 1
+
+
+def test_stage_histograms_list_stages_in_pipeline_order() -> None:
+    histograms = StageHistograms()
+    timer = StageTimer()
+    for name in ("custom", *reversed(PIPELINE_STAGES)):
+        timer.add(name, 1)
+    histograms.observe(timer)
+
+    assert list(histograms.snapshot()) == [*PIPELINE_STAGES, "custom"]
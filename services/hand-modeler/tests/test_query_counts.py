@@ -0,0 +1,149 @@
+"""Statement budgets for the sharing routes, so query fan-out does not creep back."""
+
+from __future__ import annotations
+
+import base64
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.membership import membership_cache
+from app.db.session import get_db, get_read_db
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+
+class StatementCounter:
+    """Records the SQL statements an engine executes while :meth:`budget` is open."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.statements: list[str] | None = None
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, _conn: object, _cursor: object, statement: str, *_args: object) -> None:
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    @contextmanager
+    def budget(self, max_statements: int) -> Iterator[None]:
+        self.statements = []
+        try:
+            yield
+        finally:
+            statements, self.statements = self.statements, None
+        assert len(statements) <= max_statements, "\n\n".join(
+            [f"{len(statements)} statements (budget {max_statements}):", *statements]
+        )
+
+
+@pytest.fixture
+def counted(tmp_path: Path) -> Iterator[tuple[TestClient, StatementCounter]]:
+    url = f"sqlite:///{tmp_path / 'counted.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    engine = create_async_engine(url.replace("sqlite:", "sqlite+aiosqlite:"), poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    backend = LocalDiskBackend(tmp_path / "storage")
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    membership_cache.reset()
+    yield TestClient(app), StatementCounter(engine)
+    app.dependency_overrides.clear()
+    membership_cache.reset()
+
+
+def test_sharing_routes_stay_within_their_statement_budgets(
+    counted: tuple[TestClient, StatementCounter]
+) -> None:
+    client, counter = counted
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    user_b = client.post("/api/users", json={"display_name": "B"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    client.post(
+        "/api/sessions/join",
+        json={"share_code": session["share_code"], "partner_user_id": user_b["id"]},
+    )
+    models_url = f"/api/sessions/{session['id']}/hand-models"
+
+    with counter.budget(1):
+        assert client.get(f"/api/sessions/{session['id']}/poll").json()["latest_model"] is None
+
+    # Blob lookup, blob insert, model insert, latest-model pointer; creating the user
+    # and joining the session left the membership check in the cache.
+    with counter.budget(4):
+        model = client.post(
+            models_url,
+            data={"owner_user_id": user_a["id"]},
+            files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+        ).json()
+    # The same bytes again, with a cold cache: the membership check comes back, and the
+    # blob insert becomes a reference count update.
+    membership_cache.reset()
+    with counter.budget(5):
+        client.post(
+            f"{models_url}/base64",
+            json={"owner_user_id": user_a["id"], "glb_base64": base64.b64encode(b"glb").decode()},
+        ).raise_for_status()
+
+    with counter.budget(1):
+        assert client.get(f"/api/sessions/{session['id']}/poll").json()["latest_model"]
+    with counter.budget(1):
+        client.get(f"{models_url}/latest").raise_for_status()
+    with counter.budget(1):
+        assert len(client.get(models_url).json()["items"]) == 2
+    with counter.budget(1):
+        client.get(f"/api/users/{user_a['id']}/hand-models").raise_for_status()
+
+    # Delivery marks are written behind, in batches (tests/test_delivery_marks.py).
+    viewer = {"viewer_user_id": user_b["id"]}
+    with counter.budget(1):
+        client.get(f"/api/hand-models/{model['id']}", params=viewer).raise_for_status()
+    with counter.budget(1):
+        client.get(f"/api/hand-models/{model['id']}", params=viewer).raise_for_status()
+    with counter.budget(1):
+        client.post(
+            f"/api/hand-models/{model['id']}/confirm", data={"partner_user_id": user_b["id"]}
+        ).raise_for_status()
+
+
+def test_lookups_keep_their_error_responses(counted: tuple[TestClient, StatementCounter]) -> None:
+    client, _ = counted
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    outsider = client.post("/api/users", json={"display_name": "C"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    models_url = f"/api/sessions/{session['id']}/hand-models"
+    glb = {"file": ("hand.glb", b"glb", "model/gltf-binary")}
+
+    def upload(session_url: str, owner: str) -> int:
+        return client.post(session_url, data={"owner_user_id": owner}, files=glb).status_code
+
+    assert upload(models_url, "nobody") == 404
+    assert upload("/api/sessions/missing/hand-models", user_a["id"]) == 404
+    assert upload(models_url, outsider["id"]) == 403
+
+    model = client.post(models_url, data={"owner_user_id": user_a["id"]}, files=glb).json()
+    model_url = f"/api/hand-models/{model['id']}"
+    assert client.get("/api/hand-models/missing").status_code == 404
+    assert client.get(model_url, params={"viewer_user_id": "nobody"}).status_code == 404
+    assert client.get(model_url, params={"viewer_user_id": outsider["id"]}).status_code == 403
+    assert client.get("/api/sessions/missing/poll").status_code == 404
+    assert client.get("/api/sessions/missing/hand-models/latest").status_code == 404
@@ -0,0 +1,191 @@
+"""Tests for session event brokers, the session events WebSocket and long polling."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.websockets import WebSocketDisconnect
+
+from app.db.base import Base
+from app.db.session import get_db, get_read_db
+from app.events import (
+    Broker,
+    InProcessBroker,
+    SessionEvent,
+    SQLiteBroker,
+    Subscription,
+    get_broker,
+)
+from app.main import app
+from app.storage import LocalDiskBackend, get_storage_backend
+
+
+def _event(session_id: str, n: int) -> SessionEvent:
+    return SessionEvent(session_id=session_id, type="hand_model", data={"n": n})
+
+
+async def _next(subscription: Subscription) -> SessionEvent:
+    return await asyncio.wait_for(subscription.get(), timeout=5)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def broker(request: pytest.FixtureRequest, tmp_path: Path) -> Iterator[Broker]:
+    if request.param == "memory":
+        broker: Broker = InProcessBroker(max_pending=4)
+    else:
+        broker = SQLiteBroker(tmp_path / "events.db", poll_seconds=0.01, max_pending=4)
+    yield broker
+    broker.close()
+
+
+async def test_subscribers_receive_their_sessions_events_in_order(broker: Broker) -> None:
+    async with broker.subscribe("s1") as first, broker.subscribe("s1") as second:
+        async with broker.subscribe("s2") as other:
+            for n in range(3):
+                await broker.publish(_event("s1", n))
+            await broker.publish(_event("s2", 9))
+
+            for subscription in (first, second):
+                assert [(await _next(subscription)).data["n"] for _ in range(3)] == [0, 1, 2]
+            assert (await _next(other)).data == {"n": 9}
+
+
+async def test_slow_subscribers_lose_the_oldest_events(broker: Broker) -> None:
+    async with broker.subscribe("s") as subscription:
+        for n in range(6):
+            await broker.publish(_event("s", n))
+        await asyncio.sleep(0.2)  # let the sqlite feed catch up
+        received = [(await _next(subscription)).data["n"] for _ in range(4)]
+    assert received == [2, 3, 4, 5]
+    assert subscription.dropped == 2
+
+
+def _publish_from_another_process(path: Path) -> None:
+    asyncio.run(SQLiteBroker(path).publish(_event("s", 42)))
+
+
+async def test_the_sqlite_broker_delivers_across_processes(tmp_path: Path) -> None:
+    broker = SQLiteBroker(tmp_path / "events.db", poll_seconds=0.01)
+    try:
+        async with broker.subscribe("s") as subscription:
+            process = multiprocessing.get_context("spawn").Process(
+                target=_publish_from_another_process, args=(tmp_path / "events.db",)
+            )
+            process.start()
+            await asyncio.get_running_loop().run_in_executor(None, process.join, 30)
+            assert process.exitcode == 0
+            assert (await _next(subscription)).data == {"n": 42}
+    finally:
+        broker.close()
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> Iterator[TestClient]:
+    url = f"sqlite:///{tmp_path / 'events_api.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    engine = create_async_engine(url.replace("sqlite:", "sqlite+aiosqlite:"), poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def get_test_db() -> AsyncIterator[AsyncSession]:
+        async with factory() as db:
+            yield db
+
+    backend = LocalDiskBackend(tmp_path / "storage")
+    broker = InProcessBroker()
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_storage_backend] = lambda: backend
+    app.dependency_overrides[get_broker] = lambda: broker
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_uploads_are_pushed_to_the_sessions_websocket(client: TestClient) -> None:
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+
+    with client.websocket_connect(f"/api/sessions/{session['id']}/events") as websocket:
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["session"]["id"] == session["id"] and snapshot["hand_model"] is None
+
+        model = client.post(
+            f"/api/sessions/{session['id']}/hand-models",
+            data={"owner_user_id": user_a["id"]},
+            files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+        ).json()
+        pushed = websocket.receive_json()
+        assert pushed["type"] == "hand_model" and pushed["session_id"] == session["id"]
+        assert pushed["hand_model"]["id"] == model["id"]
+        assert client.get(pushed["hand_model"]["download_url"]).content == b"glb"
+
+    with client.websocket_connect(f"/api/sessions/{session['id']}/events") as websocket:
+        assert websocket.receive_json()["hand_model"]["id"] == model["id"]
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/sessions/missing/events") as websocket:
+            websocket.receive_json()
+
+
+def test_polls_revalidate_with_etags(client: TestClient) -> None:
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    poll_url = f"/api/sessions/{session['id']}/poll"
+
+    first = client.get(poll_url)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    unchanged = client.get(poll_url, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+
+    client.post(
+        f"/api/sessions/{session['id']}/hand-models",
+        data={"owner_user_id": user_a["id"]},
+        files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+    ).raise_for_status()
+    changed = client.get(poll_url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["has_new_model"]
+    assert changed.headers["etag"] != etag
+
+
+def test_long_polls_return_when_a_model_is_uploaded(client: TestClient) -> None:
+    user_a = client.post("/api/users", json={"display_name": "A"}).json()
+    session = client.post("/api/sessions", json={"inviter_user_id": user_a["id"]}).json()
+    poll_url = f"/api/sessions/{session['id']}/poll"
+
+    started = time.monotonic()
+    timed_out = client.get(poll_url, params={"wait": 0.2})
+    assert time.monotonic() - started >= 0.2
+    assert timed_out.status_code == 200 and not timed_out.json()["has_new_model"]
+    etag = timed_out.headers["etag"]
+    revalidated = client.get(poll_url, params={"wait": 0.2}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        waiting = pool.submit(
+            client.get, poll_url, params={"wait": 10}, headers={"If-None-Match": etag}
+        )
+        time.sleep(0.3)
+        assert not waiting.done()
+        model = client.post(
+            f"/api/sessions/{session['id']}/hand-models",
+            data={"owner_user_id": user_a["id"]},
+            files={"file": ("hand.glb", b"glb", "model/gltf-binary")},
+        ).json()
+        woken = waiting.result(timeout=5)
+    assert woken.status_code == 200
+    assert woken.json()["latest_model"]["id"] == model["id"]
+    assert time.monotonic() - started < 5
@@ -0,0 +1,305 @@
+"""Tests for retention of sessions, shared hand models and their blobs."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from sqlalchemy import URL, create_engine, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.membership import membership_cache
+from app.db.models import HandModel, StorageBlob, User
+from app.db.models import Session as PairSession
+from app.db.queries import advance_latest_hand_model
+from app.db.retention import SharingRetention, SharingRetentionPolicy
+from app.storage import LocalDiskBackend
+from app.storage.blobs import StagedObject, stage_stream, store_blob
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+DAY = timedelta(days=1)
+
+
+@pytest.fixture
+def factory(tmp_path: Path) -> Iterator[sessionmaker[Session]]:
+    engine = create_engine(f"sqlite:///{tmp_path / 'sharing.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def backend(tmp_path: Path) -> LocalDiskBackend:
+    return LocalDiskBackend(tmp_path / "storage")
+
+
+def _session(db: Session, *, created_at: datetime, paired: bool = True) -> PairSession:
+    inviter = User(id=secrets.token_hex(8), display_name="A", created_at=created_at)
+    partner = User(id=secrets.token_hex(8), display_name="B", created_at=created_at)
+    session = PairSession(
+        id=secrets.token_hex(8),
+        share_code=secrets.token_hex(4),
+        inviter_user_id=inviter.id,
+        partner_user_id=partner.id if paired else None,
+        created_at=created_at,
+        paired_at=created_at if paired else None,
+    )
+    db.add_all([inviter, partner, session])
+    db.commit()
+    return session
+
+
+async def _store_blob(url: URL, backend: LocalDiskBackend, staged: StagedObject) -> StorageBlob:
+    # Takes its reference in its own transaction, committed before the model is added.
+    engine = create_async_engine(url.set(drivername="sqlite+aiosqlite"), poolclass=NullPool)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            blob = await store_blob(db, backend, staged, content_type="model/gltf-binary")
+            await db.commit()
+            return blob
+    finally:
+        await engine.dispose()
+
+
+def _model(
+    db: Session,
+    backend: LocalDiskBackend,
+    session: PairSession,
+    data: bytes,
+    *,
+    created_at: datetime,
+    confirmed_at: datetime | None = None,
+) -> HandModel:
+    staged = stage_stream(BytesIO(data), max_bytes=len(data), staging_dir=backend.staging_dir())
+    blob = asyncio.run(_store_blob(db.get_bind().url, backend, staged))
+    staged.path.unlink()
+    model = HandModel(
+        id=secrets.token_hex(8),
+        session_id=session.id,
+        owner_user_id=session.inviter_user_id,
+        storage_key=blob.key,
+        file_size_bytes=blob.size_bytes,
+        created_at=created_at,
+        confirmed_at=confirmed_at,
+    )
+    db.add(model)
+    db.execute(advance_latest_hand_model(model))
+    db.commit()
+    return model
+
+
+def _count(db: Session, model: type[Base]) -> int:
+    return db.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def test_confirmed_and_stale_models_expire_and_release_their_blobs(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    policy = SharingRetentionPolicy(
+        confirmed_model_ttl_seconds=int(DAY.total_seconds()),
+        stale_model_ttl_seconds=int(7 * DAY.total_seconds()),
+    )
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+    with factory() as db:
+        session = _session(db, created_at=T0)
+        confirmed = _model(db, backend, session, b"shared", created_at=T0, confirmed_at=T0)
+        reshared = _model(db, backend, session, b"shared", created_at=T0 + 3 * DAY)
+        stale = _model(db, backend, session, b"stale", created_at=T0)
+
+    report = retention.run_once(now=T0 + 2 * DAY)
+    assert report.models_expired == 1
+    # The re-shared model still references the blob, so its bytes stay.
+    assert report.blobs_deleted == 0
+    assert backend.head(confirmed.storage_key) is not None
+
+    report = retention.run_once(now=T0 + 8 * DAY)
+    assert report.models_expired == 1
+    assert report.blobs_deleted == 1
+    assert report.reclaimed_bytes == len(b"stale")
+    assert backend.head(stale.storage_key) is None
+
+    report = retention.run_once(now=T0 + 11 * DAY)
+    assert report.blobs_deleted == 1
+    assert backend.head(reshared.storage_key) is None
+    with factory() as db:
+        assert _count(db, HandModel) == 0
+        assert _count(db, StorageBlob) == 0
+
+
+def test_expiring_the_latest_model_repoints_its_session(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    policy = SharingRetentionPolicy(
+        confirmed_model_ttl_seconds=int(DAY.total_seconds()), stale_model_ttl_seconds=0
+    )
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+    with factory() as db:
+        session = _session(db, created_at=T0)
+        older = _model(db, backend, session, b"older", created_at=T0)
+        newer = _model(db, backend, session, b"newer", created_at=T0 + DAY, confirmed_at=T0)
+        # A slow upload committing late does not displace the newer model.
+        _model(db, backend, session, b"late", created_at=T0 - DAY, confirmed_at=T0 - DAY)
+
+    def latest() -> str | None:
+        with factory() as db:
+            return db.get(PairSession, session.id).latest_hand_model_id  # type: ignore[union-attr]
+
+    assert latest() == newer.id
+    retention.run_once(now=T0 + 2 * DAY)
+    assert latest() == older.id
+
+
+def test_unpaired_and_idle_sessions_expire_with_their_models(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    policy = SharingRetentionPolicy(
+        confirmed_model_ttl_seconds=0,
+        stale_model_ttl_seconds=0,
+        unpaired_session_ttl_seconds=int(DAY.total_seconds()),
+        idle_session_ttl_seconds=int(7 * DAY.total_seconds()),
+    )
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+    with factory() as db:
+        unpaired = _session(db, created_at=T0, paired=False)
+        model = _model(db, backend, unpaired, b"early upload", created_at=T0)
+        idle = _session(db, created_at=T0)
+        active = _session(db, created_at=T0)
+        _model(db, backend, active, b"kept", created_at=T0)
+    for session in (unpaired, active):
+        membership_cache.remember_session(
+            session.id, inviter_user_id=session.inviter_user_id, partner_user_id=None
+        )
+
+    report = retention.run_once(now=T0 + 2 * DAY)
+    assert report.sessions_expired == 1
+    # Deleted sessions leave the membership cache with them.
+    assert not membership_cache.is_member(unpaired.id, unpaired.inviter_user_id)
+    assert membership_cache.is_member(active.id, active.inviter_user_id)
+    assert report.models_expired == 1
+    assert backend.head(model.storage_key) is None
+
+    report = retention.run_once(now=T0 + 8 * DAY)
+    assert report.sessions_expired == 1
+    with factory() as db:
+        remaining = set(db.execute(select(PairSession.id)).scalars())
+    assert remaining == {active.id}
+    assert unpaired.id not in remaining and idle.id not in remaining
+
+
+def test_a_session_is_idle_from_its_last_upload_or_confirm_not_its_pairing(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    policy = SharingRetentionPolicy(
+        confirmed_model_ttl_seconds=int(7 * DAY.total_seconds()),
+        stale_model_ttl_seconds=0,
+        idle_session_ttl_seconds=int(30 * DAY.total_seconds()),
+    )
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+    with factory() as db:
+        session = _session(db, created_at=T0)
+        _model(db, backend, session, b"m", created_at=T0 + 23 * DAY, confirmed_at=T0 + 23 * DAY)
+
+    # Paired 31 days ago, active 8 days ago: the model expires, the session stays.
+    report = retention.run_once(now=T0 + 31 * DAY)
+    assert (report.models_expired, report.sessions_expired) == (1, 0)
+
+    report = retention.run_once(now=T0 + 52 * DAY)
+    assert report.sessions_expired == 0
+    report = retention.run_once(now=T0 + 53 * DAY)
+    assert report.sessions_expired == 1
+
+
+def test_orphan_sweep_is_incremental_and_spares_young_and_referenced_objects(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    policy = SharingRetentionPolicy(orphan_grace_seconds=3600, batch_size=2)
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+    with factory() as db:
+        session = _session(db, created_at=datetime.now(timezone.utc))
+        kept = _model(db, backend, session, b"referenced", created_at=session.created_at)
+
+    orphans = [f"blobs/sha256/{idx:02x}/orphan-{idx}" for idx in range(5)]
+    for key in orphans:
+        backend.put(key, BytesIO(b"x" * 10), max_bytes=10)
+    backend.put("hand-models/legacy/old.glb", BytesIO(b"legacy"), max_bytes=10)
+    stale_staging = backend.staging_dir() / "tmp1234.part"  # type: ignore[operator]
+    stale_staging.write_bytes(b"partial")
+
+    # Nothing is old enough yet.
+    now = datetime.now(timezone.utc)
+    for _ in range(6):
+        assert retention.run_once(now=now).orphans_deleted == 0
+
+    later = now + timedelta(hours=2)
+    first = retention.run_once(now=later)
+    assert 0 < first.orphans_deleted <= 2
+
+    deleted = first.orphans_deleted
+    for _ in range(8):
+        deleted += retention.run_once(now=later).orphans_deleted
+    assert deleted == len(orphans) + 2
+    assert all(backend.head(key) is None for key in orphans)
+    assert not stale_staging.exists()
+    assert backend.head(kept.storage_key) is not None
+
+
+def test_interrupted_blob_deletions_are_finished(
+    factory: sessionmaker[Session], backend: LocalDiskBackend
+) -> None:
+    retention = SharingRetention(session_factory=factory, backend=backend)
+    with factory() as db:
+        session = _session(db, created_at=datetime.now(timezone.utc))
+        model = _model(db, backend, session, b"glb", created_at=session.created_at)
+        db.execute(
+            update(StorageBlob)
+            .where(StorageBlob.key == model.storage_key)
+            .values(ref_count=0, deleting=True, released_at=None)
+        )
+        db.execute(update(HandModel).values(storage_key="hand-models/gone.glb"))
+        db.commit()
+
+    report = retention.run_once()
+    assert report.blobs_deleted == 1
+    assert backend.head(model.storage_key) is None
+    with factory() as db:
+        assert _count(db, StorageBlob) == 0
+
+
+def test_storage_stays_flat_under_steady_traffic(
+    factory: sessionmaker[Session], backend: LocalDiskBackend, tmp_path: Path
+) -> None:
+    policy = SharingRetentionPolicy(
+        confirmed_model_ttl_seconds=int(DAY.total_seconds()),
+        stale_model_ttl_seconds=int(3 * DAY.total_seconds()),
+        unpaired_session_ttl_seconds=int(DAY.total_seconds()),
+        idle_session_ttl_seconds=int(DAY.total_seconds()),
+    )
+    retention = SharingRetention(session_factory=factory, backend=backend, policy=policy)
+
+    sizes = []
+    for day in range(12):
+        now = T0 + day * DAY
+        with factory() as db:
+            for idx in range(5):
+                session = _session(db, created_at=now, paired=idx != 0)
+                confirmed_at = now if idx % 2 else None
+                data = os.urandom(64)
+                _model(db, backend, session, data, created_at=now, confirmed_at=confirmed_at)
+        retention.run_once(now=now)
+        with factory() as db:
+            sizes.append((_count(db, PairSession), _count(db, HandModel), _count(db, StorageBlob)))
+
+    # After the longest TTL has passed once, the tables stop growing.
+    assert sizes[-1] == sizes[-4]
+    assert len(list((tmp_path / "storage" / "blobs").rglob("*.*"))) == 0
+    files = [p for p in (tmp_path / "storage" / "blobs").rglob("*") if p.is_file()]
+    assert len(files) == sizes[-1][2]